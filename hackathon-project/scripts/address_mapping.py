@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+offline address-mapping decoder
+decodes every address of a trace into channel/rank/bankgroup/bank/row/column
+with the bit assignments of a dramsys addressmapping json, then predicts the
+row-buffer locality an open-page controller would see. ranking mappings this
+way takes milliseconds, so hopeless ones can be dropped before any simulation.
+
+supported json layouts: {"addressmapping": {...}} and the older {"CONGEN": {...}},
+with <FIELD>_BIT lists (bit i of the list is bit i of the field) and optional
+XOR pairs {"FIRST": a, "SECOND": b} that fold address bit b into bit a.
+"""
+
+import os
+import json
+import argparse
+
+import numpy as np
+
+from trace_format import load_trace
+
+DEFAULT_CONFIG_DIR = os.path.expanduser("~/DRAMSys/configs")
+
+# fields that together select one bank, outermost first
+BANK_FIELDS = ('channel', 'rank', 'bankgroup', 'bank')
+
+
+def _runs(bits):
+    """(address bit, field bit, length) runs of consecutive bits"""
+    runs = []
+    for i, bit in enumerate(bits):
+        if runs and bit == runs[-1][0] + runs[-1][2] and i == runs[-1][1] + runs[-1][2]:
+            runs[-1][2] += 1
+        else:
+            runs.append([bit, i, 1])
+    return runs
+
+
+class AddressMapping:
+    def __init__(self, fields, xor=(), name=None):
+        """fields: name -> list of address bits, least significant first"""
+        self.fields = {k: list(v) for k, v in fields.items() if v}
+        self.xor = list(xor)
+        self.name = name
+
+        used = [bit for bits in self.fields.values() for bit in bits]
+        if len(used) != len(set(used)):
+            raise ValueError(f"{name}: an address bit is assigned to more than one field")
+        self.address_bits = max(used) + 1 if used else 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        body = data.get('addressmapping') or data.get('CONGEN') or data
+        fields = {key[:-4].lower(): bits for key, bits in body.items()
+                  if key.endswith('_BIT') and isinstance(bits, list)}
+        if not fields:
+            raise ValueError(f"{path}: no *_BIT assignments found")
+        xor = [(pair['FIRST'], pair['SECOND']) for pair in body.get('XOR', [])]
+        return cls(fields, xor, name=os.path.basename(path))
+
+    def size(self, field):
+        return 1 << len(self.fields.get(field, []))
+
+    def num_banks(self):
+        return int(np.prod([self.size(f) for f in BANK_FIELDS]))
+
+    def decode(self, addresses):
+        """field name -> uint64 array of that field for every address"""
+        addresses = np.asarray(addresses, dtype=np.uint64)
+        for first, second in self.xor:
+            addresses = addresses ^ (((addresses >> np.uint64(second)) & np.uint64(1)) << np.uint64(first))
+
+        decoded = {}
+        for field, bits in self.fields.items():
+            value = np.zeros(len(addresses), dtype=np.uint64)
+            for bit, offset, length in _runs(bits):
+                value |= ((addresses >> np.uint64(bit)) & np.uint64((1 << length) - 1)) << np.uint64(offset)
+            decoded[field] = value
+        return decoded
+
+    def bank_ids(self, decoded):
+        """global bank index (channel, rank, bankgroup, bank) of every decoded address"""
+        ids = np.zeros(len(next(iter(decoded.values()))), dtype=np.int64)
+        for field in BANK_FIELDS:
+            if field in decoded:
+                ids = ids * self.size(field) + decoded[field].astype(np.int64)
+        return ids
+
+    def out_of_range(self, addresses):
+        """number of addresses with bits above the mapped span (they wrap around)"""
+        if self.address_bits >= 64:
+            return 0
+        return int((np.asarray(addresses, dtype=np.uint64) >> np.uint64(self.address_bits)).astype(bool).sum())
+
+
+def row_buffer_stats(banks, rows):
+    """
+    open-page outcome of every access, in trace order: a hit finds its row
+    open, a miss finds the bank idle (its first access) and a conflict has to
+    close another row first
+    """
+    # bank ids are small, so a 16-bit key lets the stable sort use radix sort
+    order = np.argsort(banks.astype(np.uint16) if banks.max(initial=0) < 1 << 16 else banks, kind='stable')
+    sorted_banks, sorted_rows = banks[order], rows[order]
+    first = np.concatenate(([True], sorted_banks[1:] != sorted_banks[:-1]))
+    same_row = np.concatenate(([False], sorted_rows[1:] == sorted_rows[:-1]))
+
+    hits = int((~first & same_row).sum())
+    misses = int(first.sum())
+    return hits, misses, len(banks) - hits - misses
+
+
+def locality(mapping, addresses):
+    """predicted bank balance and row-buffer locality of a trace under a mapping"""
+    n = len(addresses)
+    decoded = mapping.decode(addresses)
+    banks = mapping.bank_ids(decoded)
+    rows = decoded.get('row', np.zeros(n, dtype=np.uint64))
+
+    per_bank = np.bincount(banks, minlength=mapping.num_banks())
+    mean = n / len(per_bank)
+    hits, misses, conflicts = row_buffer_stats(banks, rows)
+
+    # back-to-back requests to one bank but different rows serialize on trp + trcd
+    adjacent = int(((banks[1:] == banks[:-1]) & (rows[1:] != rows[:-1])).sum())
+
+    return {
+        'mapping': mapping.name,
+        'accesses': n,
+        'banks': len(per_bank),
+        'banks_used': int((per_bank > 0).sum()),
+        'imbalance': float(per_bank.max() / mean) if n else 0.0,
+        'bank_cv': float(per_bank.std() / mean) if n else 0.0,
+        'row_hits': hits,
+        'row_misses': misses,
+        'row_conflicts': conflicts,
+        'row_hit_rate': hits / n if n else 0.0,
+        'adjacent_conflicts': adjacent,
+        'out_of_range': mapping.out_of_range(addresses),
+        'per_bank': per_bank.tolist(),
+    }
+
+
+def rank_mappings(addresses, mapping_files, config_dir=DEFAULT_CONFIG_DIR):
+    """locality stats of every mapping (relative to config_dir), best predicted first"""
+    stats = []
+    for name in mapping_files:
+        mapping = AddressMapping.load(os.path.join(config_dir, name))
+        stats.append({**locality(mapping, addresses), 'mapping': name})
+    # fewer row conflicts first, then the more even spread over banks
+    stats.sort(key=lambda s: (s['row_conflicts'] + s['adjacent_conflicts'], s['imbalance']))
+    return stats
+
+
+def screen_mappings(trace_file, mapping_files, keep, config_dir=DEFAULT_CONFIG_DIR):
+    """the `keep` mappings predicted best for a trace, with the table of all of them printed"""
+    _, _, addresses = load_trace(os.path.join(config_dir, trace_file))
+    stats = rank_mappings(addresses, mapping_files, config_dir)
+    print_ranking(stats)
+    kept = [s['mapping'] for s in stats[:keep]]
+    if len(kept) < len(stats):
+        print(f"screening keeps {len(kept)} of {len(stats)} address mappings")
+    return kept
+
+
+def print_ranking(stats):
+    print(f"{'address mapping':<48} {'row hit':>8} {'conflicts':>10} {'b2b conf':>9} "
+          f"{'banks':>7} {'imbalance':>10}")
+    for s in stats:
+        print(f"{os.path.basename(s['mapping']):<48} {s['row_hit_rate']:>8.2%} {s['row_conflicts']:>10} "
+              f"{s['adjacent_conflicts']:>9} {s['banks_used']:>3}/{s['banks']:<3} {s['imbalance']:>10.2f}")
+    wrapped = max((s['out_of_range'] for s in stats), default=0)
+    if wrapped:
+        print(f"note: up to {wrapped} addresses exceed a mapping's span and wrap around")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="predict row-buffer locality of a trace per address mapping")
+    parser.add_argument("trace", help="trace path relative to --config-dir (.stl or binary)")
+    parser.add_argument("mappings", nargs="*",
+                        help="addressmapping jsons relative to --config-dir (default: all of addressmapping/)")
+    parser.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR)
+    parser.add_argument("--output", default=None, help="also save the stats as json")
+    args = parser.parse_args()
+
+    mappings = args.mappings or sorted(
+        f"addressmapping/{f}" for f in os.listdir(os.path.join(args.config_dir, "addressmapping"))
+        if f.endswith(".json"))
+
+    _, _, addresses = load_trace(os.path.join(args.config_dir, args.trace))
+    stats = rank_mappings(addresses, mappings, args.config_dir)
+    print_ranking(stats)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(stats, f, indent=2)
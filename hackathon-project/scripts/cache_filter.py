@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+set-associative cache hierarchy filter
+turns a cpu access trace into the traffic that actually reaches dram: only
+last-level misses (line fills, as reads) and dirty evictions (writebacks)
+come out, aligned to the line size. every level is lru, write-back and
+write-allocate; levels are non-inclusive, each one sees the misses and
+writebacks of the level above.
+
+simulation is exact but batched with numpy:
+- sets are independent, so accesses are grouped by set and each step
+  simulates the next access of every set in the batch at once
+- an access to the same line as the previous access of its set is always
+  an mru hit that leaves the lru order alone, so such runs are folded first
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from trace_format import Trace, TraceWriter, format_stl, is_binary_trace, load_trace
+
+LINE_SIZE = 64
+
+# typical server core: 32k 8-way l1d, 1m 16-way l2, 8m 16-way llc slice
+DEFAULT_LEVELS = "32K:8,1M:16,8M:16"
+
+SIZE_SUFFIXES = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def _small(keys):
+    """narrow integer keys to 16 bits when they fit, so stable sorts use radix sort"""
+    return keys.astype(np.uint16) if keys.max() < 1 << 16 else keys
+
+
+class CacheLevel:
+    def __init__(self, name, size, ways, line_size=LINE_SIZE):
+        self.name = name
+        self.size = size
+        self.ways = ways
+        self.line_size = line_size
+        self.sets = size // (ways * line_size)
+        if self.sets < 1 or self.sets * ways * line_size != size:
+            raise ValueError(f"{name}: {size} bytes is not a whole number of {ways}-way sets of {line_size}b lines")
+
+        # (set, way) arrays; a stamp is the position of the last access
+        self.tags = np.full((self.sets, ways), -1, dtype=np.int64)
+        self.stamps = np.zeros((self.sets, ways), dtype=np.int64)
+        self.dirty = np.zeros((self.sets, ways), dtype=bool)
+        self.clock = 0
+
+        self.accesses = 0
+        self.hits = 0
+        self.writebacks = 0
+
+    @property
+    def misses(self):
+        return self.accesses - self.hits
+
+    def hit_rate(self):
+        return self.hits / self.accesses if self.accesses else 0.0
+
+    def access(self, lines, is_write):
+        """
+        run a batch of line accesses through the cache. returns (missed,
+        evicting, victims): input positions that missed, input positions whose
+        fill evicted a dirty line, and the evicted line numbers
+        """
+        n = len(lines)
+        self.accesses += n
+        if n == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+
+        # group by set, keeping trace order inside each set
+        sets = lines % self.sets
+        order = np.argsort(_small(sets), kind='stable')
+        sorted_sets, sorted_lines = sets[order], lines[order]
+        new_set = np.concatenate(([True], sorted_sets[1:] != sorted_sets[:-1]))
+
+        # a repeat of the previous line of the same set is an mru hit that
+        # leaves the lru order alone: fold it into the first access of its run
+        run = np.flatnonzero(new_set | np.concatenate(([True], sorted_lines[1:] != sorted_lines[:-1])))
+        self.hits += n - len(run)
+        position = order[run]
+        hit, evicted = self._simulate(sorted_sets[run], sorted_lines[run],
+                                      np.logical_or.reduceat(is_write[order], run),
+                                      self.clock + position + 1, new_set[run])
+        self.clock += n
+
+        evicting = np.flatnonzero(evicted >= 0)
+        self.writebacks += len(evicting)
+        return position[~hit], position[evicting], evicted[evicting]
+
+    def _simulate(self, sets, lines, is_write, stamps, new_set):
+        """
+        exact lru simulation of accesses grouped by set (in trace order within
+        a set); the k-th access of every set is simulated in step k.
+        returns (hit, evicted dirty line or -1) per access
+        """
+        m = len(lines)
+        group_start = np.flatnonzero(new_set)
+        group_size = np.diff(np.append(group_start, m))
+        rank = np.arange(m) - np.repeat(group_start, group_size)
+        by_step = np.argsort(_small(rank), kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(rank))))
+
+        # in step order, so every step works on slices
+        sets, lines, is_write, stamps = sets[by_step], lines[by_step], is_write[by_step], stamps[by_step]
+        hit = np.zeros(m, dtype=bool)
+        evicted = np.full(m, -1, dtype=np.int64)
+
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            row = sets[lo:hi]
+            line = lines[lo:hi]
+
+            match = self.tags[row] == line[:, None]
+            found = match.any(axis=1)
+            way = match.argmax(axis=1)
+            hit[lo:hi] = found
+
+            missing = np.flatnonzero(~found)
+            if len(missing):
+                # invalid ways have stamp 0, so they are filled before anything is evicted
+                miss_row = row[missing]
+                victim = self.stamps[miss_row].argmin(axis=1)
+                way[missing] = victim
+                dirty_victim = self.dirty[miss_row, victim]
+                evicted[lo + missing[dirty_victim]] = self.tags[miss_row[dirty_victim], victim[dirty_victim]]
+                self.dirty[miss_row, victim] = False
+                self.tags[miss_row, victim] = line[missing]
+
+            self.dirty[row, way] |= is_write[lo:hi]
+            self.stamps[row, way] = stamps[lo:hi]
+
+        self.hits += int(hit.sum())
+        unsorted_hit = np.empty(m, dtype=bool)
+        unsorted_hit[by_step] = hit
+        unsorted_evicted = np.empty(m, dtype=np.int64)
+        unsorted_evicted[by_step] = evicted
+        return unsorted_hit, unsorted_evicted
+
+
+class CacheHierarchy:
+    def __init__(self, levels):
+        self.levels = levels
+        self.line_size = levels[0].line_size
+        self.inputs = 0
+        self.outputs = 0
+
+    @classmethod
+    def parse(cls, spec=DEFAULT_LEVELS, line_size=LINE_SIZE):
+        """levels from "size:ways,..." outermost last, e.g. "32K:8,1M:16,8M:16" """
+        levels = []
+        for i, level in enumerate(spec.split(',')):
+            size, ways = level.split(':')
+            levels.append(CacheLevel(f"l{i + 1}", parse_size(size), int(ways), line_size))
+        return cls(levels)
+
+    def filter(self, timestamps, is_write, addresses, sizes=None):
+        """
+        (timestamps, is_write, line addresses) of the memory traffic caused by
+        a batch of cpu accesses, in trace order; a dirty eviction is written
+        back just before the fill that caused it
+        """
+        timestamps = np.asarray(timestamps, dtype=np.uint64)
+        addresses = np.asarray(addresses, dtype=np.uint64)
+        is_write = np.asarray(is_write, dtype=bool)
+        self.inputs += len(addresses)
+
+        # an access that straddles a line boundary touches every line it covers
+        first = addresses // np.uint64(self.line_size)
+        if sizes is not None:
+            span = np.maximum(np.asarray(sizes, dtype=np.uint64), 1)
+            last = (addresses + span - np.uint64(1)) // np.uint64(self.line_size)
+            count = (last - first + np.uint64(1)).astype(np.int64)
+            if (count > 1).any():
+                base = np.repeat(np.cumsum(count) - count, count)
+                first = np.repeat(first, count) + (np.arange(count.sum()) - base).astype(np.uint64)
+                timestamps = np.repeat(timestamps, count)
+                is_write = np.repeat(is_write, count)
+
+        lines = first.astype(np.int64)
+        # each event is ordered by (source access, writeback before fill)
+        order_key = np.arange(len(lines), dtype=np.int64) * 2 + 1
+
+        for level in self.levels:
+            missed, evicting, victims = level.access(lines, is_write)
+            lines = np.concatenate((lines[missed], victims))
+            is_write = np.concatenate((np.zeros(len(missed), dtype=bool), np.ones(len(victims), dtype=bool)))
+            timestamps = np.concatenate((timestamps[missed], timestamps[evicting]))
+            order_key = np.concatenate((order_key[missed], order_key[evicting] - 1))
+
+            order = np.argsort(order_key, kind='stable')
+            lines, is_write, timestamps = lines[order], is_write[order], timestamps[order]
+            order_key = np.arange(len(lines), dtype=np.int64) * 2 + 1
+
+        self.outputs += len(lines)
+        return timestamps, is_write, lines.astype(np.uint64) * np.uint64(self.line_size)
+
+    def filtered(self, write):
+        """wrap a write(timestamps, is_write, addresses, sizes) sink so it only sees memory traffic"""
+        def write_misses(timestamps, is_write, addresses, sizes=None):
+            timestamps, is_write, addresses = self.filter(timestamps, is_write, addresses, sizes)
+            if len(addresses):
+                write(timestamps, is_write, addresses, np.full(len(addresses), self.line_size))
+        return write_misses
+
+    def summary(self):
+        lines = [f"{'level':<6} {'size':>8} {'ways':>5} {'accesses':>12} {'hits':>12} "
+                 f"{'hit rate':>9} {'writebacks':>11}"]
+        for level in self.levels:
+            lines.append(f"{level.name:<6} {level.size // 1024:>7}k {level.ways:>5} {level.accesses:>12} "
+                         f"{level.hits:>12} {level.hit_rate():>9.2%} {level.writebacks:>11}")
+        reduction = self.inputs / self.outputs if self.outputs else float('inf')
+        lines.append(f"cpu accesses: {self.inputs}  memory ops: {self.outputs}  reduction: {reduction:.1f}x")
+        return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="filter a cpu trace through a cache hierarchy")
+    parser.add_argument("input", help=".stl or binary trace of cpu accesses")
+    parser.add_argument("output")
+    parser.add_argument("--levels", default=DEFAULT_LEVELS,
+                        help=f"size:ways per level, innermost first (default {DEFAULT_LEVELS})")
+    parser.add_argument("--line-size", type=int, default=LINE_SIZE)
+    parser.add_argument("--format", choices=["stl", "binary"], default="stl")
+    args = parser.parse_args()
+
+    hierarchy = CacheHierarchy.parse(args.levels, args.line_size)
+    timestamps, is_write, addresses = load_trace(args.input)
+    # binary traces from lackey_to_stl.py keep access sizes; .stl does not
+    sizes = Trace(args.input).sizes if is_binary_trace(args.input) else np.ones(len(addresses))
+
+    start = time.perf_counter()
+    if args.format == "binary":
+        writer = TraceWriter(args.output)
+        write = writer.write
+    else:
+        out = open(args.output, "wb")
+
+        def write(timestamps, is_write, addresses, sizes):
+            out.write(format_stl(timestamps, is_write, addresses))
+
+    sink = hierarchy.filtered(write)
+    batch = 1 << 20
+    for i in range(0, len(addresses), batch):
+        sink(timestamps[i:i + batch], is_write[i:i + batch], addresses[i:i + batch], sizes[i:i + batch])
+
+    (writer if args.format == "binary" else out).close()
+    elapsed = time.perf_counter() - start
+
+    print("\n".join(hierarchy.summary()))
+    print(f"filtered {len(addresses)} accesses in {elapsed:.2f}s "
+          f"({len(addresses) / max(elapsed, 1e-9):,.0f} accesses/sec): {args.output}")
@@ -7,54 +7,41 @@ echo "------------------------------------------------------------------------"
 
 cd ~/hackathon-project/scripts
 
-echo "running resnet50 under valgrind..."
-valgrind --tool=lackey --trace-mem=yes --log-file=/tmp/resnet50_valgrind_raw.txt \
-    python3 resnet50_inference.py cpu 1
-
-echo ""
-echo "converting trace to dramsys format..."
-
-python3 << 'PYEOF'
-import re
-
-print("processing valgrind output...")
-timestamp = 0
-count = 0
-max_ops = 100000  # limit for manageable simulation time
-
-input_file = "/tmp/resnet50_valgrind_raw.txt"
-output_file = "/root/DRAMSys/configs/traces/resnet50_real.stl"
-
-with open(input_file, 'r') as fin, open(output_file, 'w') as fout:
-    for line in fin:
-        if count >= max_ops:
-            break
-
-        match = re.match(r'^\s+([LSM])\s+([0-9a-f]+),(\d+)', line)
-        if match:
-            op_type = match.group(1)
-            address = int(match.group(2), 16)
-
-            if op_type in ['L', 'M']:
-                fout.write(f"{timestamp}:\tread\t0x{address:x}\n")
-                timestamp += 5
-                count += 1
-
-            if op_type in ['S', 'M']:
-                fout.write(f"{timestamp}:\twrite\t0x{address:x}\n")
-                timestamp += 5
-                count += 1
-
-        if count % 10000 == 0 and count > 0:
-            print(f"  processed {count} operations...")
-
-print(f"\ncreated trace with {count} memory operations")
-print(f"total simulated time: {timestamp} cycles")
-print(f"output: {output_file}")
-PYEOF
+# MAX_OPS: limit for manageable simulation time (0 for the whole roi)
+# TRACE_FORMAT=binary writes the columnar format of trace_format.py instead
+# CONVERTER_ARGS: extra lackey_to_stl.py options, e.g. "--skip 1000000"
+MAX_OPS=${MAX_OPS:-100000}
+FORMAT=${TRACE_FORMAT:-stl}
+OUTPUT=/root/DRAMSys/configs/traces/resnet50_real.stl
+if [ "$FORMAT" = "binary" ]; then
+    OUTPUT=${OUTPUT%.stl}.trace
+fi
+
+LIMIT=""
+if [ "$MAX_OPS" -gt 0 ]; then
+    LIMIT="--max-ops $MAX_OPS"
+fi
+
+# lackey output streams through a named pipe into the converter, so the
+# raw log is never written to disk
+FIFO=$(mktemp -u /tmp/resnet50_lackey.XXXXXX)
+mkfifo "$FIFO"
+trap 'rm -f "$FIFO"' EXIT
+
+echo "running resnet50 under valgrind, converting to dramsys format as it runs..."
+echo "only the inference iterations (between the roi markers) are recorded"
+python3 lackey_to_stl.py "$FIFO" "$OUTPUT" --format "$FORMAT" --interval 5 --roi $LIMIT $CONVERTER_ARGS &
+CONVERTER=$!
+
+# lackey and the program share stdout so the roi markers arrive in order;
+# once the op limit is reached the converter closes the pipe and valgrind stops
+valgrind --tool=lackey --trace-mem=yes --log-fd=1 \
+    python3 resnet50_inference.py cpu 1 > "$FIFO"
+
+wait $CONVERTER
 
 echo ""
 echo "------------------------------------------------------------------------"
 echo "real resnet50 trace created"
-echo "location: ~/dramsys/configs/traces/resnet50_real.stl"
+echo "location: $OUTPUT"
 echo "------------------------------------------------------------------------"
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+analytical dram timing model
+a low-fidelity stand-in for dramsys that scores a configuration in well
+under a second. it reads the same memspec timings, addressmapping and
+mcconfig scheduler a simulation would use and treats the data bus, the
+activate window and every bank as fifo servers:
+
+- each request is a row hit, miss (bank idle) or conflict under open page;
+  fifo sees rows in trace order, fr-fcfs also hits a row that was requested
+  within the last RequestBufferSize requests of its bank
+- a server's completion time for arrivals a and service times s is
+  max over k of a_k + sum(s[k:]), so every server drains in one numpy pass
+- total time is the slowest server plus the read latency of the last
+  request, stretched by the refresh overhead
+
+usage:
+  dram_model.py run SIM.json                 estimate one dramsys simulation json
+  dram_model.py validate [RESULTS.json ...]  rank correlation against stored dramsys results
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+import numpy as np
+
+from address_mapping import AddressMapping
+import profiler
+from results_store import record_config, stored_results
+from successive_halving import spearman
+from trace_format import load_trace
+
+DEFAULT_CONFIG_DIR = os.path.expanduser("~/DRAMSys/configs")
+DEFAULT_RESULTS_DIR = os.path.expanduser("~/hackathon-project/results")
+
+HIT, MISS, CONFLICT = 0, 1, 2
+
+
+def _body(path, key):
+    with open(path) as f:
+        data = json.load(f)
+    return data.get(key, data)
+
+
+class MemSpec:
+    """timings in memory clock cycles, tck in ps"""
+
+    def __init__(self, path):
+        spec = _body(path, 'memspec')
+        arch, timing = spec['memarchitecturespec'], spec['memtimingspec']
+
+        self.name = spec.get('memoryId', os.path.basename(path))
+        self.tck = 1e6 / timing['clkMhz']
+        self.burst = arch['burstLength'] / arch['dataRate']
+        self.burst_bytes = arch['burstLength'] * arch['width'] * arch.get('nbrOfDevices', 1) // 8
+
+        self.cl = timing['CL']
+        self.rcd = timing['RCD']
+        self.rp = timing['RP']
+        self.ras = timing['RAS']
+        self.rc = timing.get('RC', self.ras + self.rp)
+        self.wl = timing.get('WL', self.cl)
+        self.ccd_s = max(timing.get('CCD_S', timing.get('CCD', self.burst)), self.burst)
+        self.ccd_l = max(timing.get('CCD_L', self.ccd_s), self.burst)
+        self.rrd = timing.get('RRD_S', timing.get('RRD', 0))
+        self.faw = timing.get('FAW', 0)
+        self.wtr = timing.get('WTR_S', timing.get('WTR', 0))
+        refi, rfc = timing.get('REFI', 0), timing.get('RFC', 0)
+        self.refresh_stretch = refi / (refi - rfc) if refi > rfc > 0 else 1.0
+
+
+class Controller:
+    def __init__(self, path):
+        config = _body(path, 'mcconfig')
+        scheduler = config.get('Scheduler')
+        if scheduler is None:
+            # a bare config file: go by its name (fifo.json, fr_fcfs.json)
+            scheduler = 'FrFcfs' if 'fcfs' in os.path.basename(path).lower() else 'Fifo'
+        self.scheduler = scheduler
+        self.reorders = scheduler.lower().startswith('frfcfs')
+        self.open_page = config.get('PagePolicy', 'Open').lower().startswith('open')
+        self.buffer = config.get('RequestBufferSize', 8)
+
+
+def row_outcomes(banks, rows, controller):
+    """HIT, MISS or CONFLICT per request"""
+    n = len(banks)
+    by_bank = np.argsort(banks, kind='stable')
+    first = np.ones(n, dtype=bool)
+    first[by_bank[1:]] = banks[by_bank[1:]] != banks[by_bank[:-1]]
+    if not controller.open_page:
+        return np.full(n, MISS, dtype=np.int8)
+
+    outcome = np.where(first, MISS, CONFLICT).astype(np.int8)
+    if not controller.reorders:
+        previous_row = np.empty(n, dtype=rows.dtype)
+        previous_row[by_bank[1:]] = rows[by_bank[:-1]]
+        outcome[~first & (previous_row == rows)] = HIT
+        return outcome
+
+    # position of every request among the requests to its bank
+    position = np.empty(n, dtype=np.int64)
+    starts = np.flatnonzero(first[by_bank])
+    position[by_bank] = np.arange(n) - np.repeat(starts, np.diff(np.append(starts, n)))
+
+    # a request hits when its row was requested recently enough to still be buffered
+    by_row = np.lexsort((np.arange(n), rows, banks))
+    same = (banks[by_row[1:]] == banks[by_row[:-1]]) & (rows[by_row[1:]] == rows[by_row[:-1]])
+    near = position[by_row[1:]] - position[by_row[:-1]] <= controller.buffer
+    outcome[by_row[1:][same & near]] = HIT
+    return outcome
+
+
+def drain(arrivals, service, groups=None):
+    """completion time of the last request through one fifo server per group"""
+    if groups is not None:
+        order = np.argsort(groups, kind='stable')
+        arrivals, service, groups = arrivals[order], service[order], groups[order]
+        starts = np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+    else:
+        starts = np.array([0])
+    done = np.cumsum(service)
+    latest = np.maximum.reduceat(arrivals - (done - service), starts)
+    return float((latest + done[np.append(starts[1:], len(done)) - 1]).max())
+
+
+def estimate(spec, mapping, controller, arrivals, is_write, addresses):
+    """(total_time ps, bandwidth gb/s) of a request stream"""
+    n = len(addresses)
+    if n == 0:
+        return 0.0, 0.0
+
+    decoded = mapping.decode(addresses)
+    banks = mapping.bank_ids(decoded)
+    rows = decoded.get('row', np.zeros(n, dtype=np.uint64))
+    outcome = row_outcomes(banks, rows, controller)
+    stretch = spec.tck * spec.refresh_stretch
+
+    # bank: column access, plus activate, plus precharge first on a conflict (at least trc apart)
+    bank = np.choose(outcome, [spec.ccd_l, spec.rcd + spec.burst, max(spec.rp + spec.rcd + spec.burst, spec.rc)])
+
+    # data bus: bursts, ccd_l within a bank group, and read/write turnarounds
+    group = decoded.get('bankgroup', banks)
+    bus = np.full(n, spec.ccd_s, dtype=np.float64)
+    bus[1:][group[1:] == group[:-1]] = spec.ccd_l
+    switch = np.concatenate(([False], is_write[1:] != is_write[:-1]))
+    bus[switch & ~is_write] += spec.wl + spec.wtr
+    bus[switch & is_write] += max(spec.cl - spec.wl + 2, 0)
+
+    # activates: trrd apart and at most four per tfaw
+    activate = np.where(outcome == HIT, 0.0, max(spec.rrd, spec.faw / 4))
+
+    busiest = max(drain(arrivals, bus * stretch),
+                  drain(arrivals, activate * stretch),
+                  drain(arrivals, bank * stretch, banks))
+    total = busiest + (spec.cl + spec.burst) * spec.tck
+    return total, n * spec.burst_bytes * 8 / (total / 1000)
+
+
+def generator_requests(setup, burst_bytes):
+    """(arrivals in generator cycles, is_write, addresses) of a dramsys traffic generator"""
+    n = int(setup.get('numRequests', 0))
+    rng = np.random.default_rng(setup.get('seed', 0))
+    low, high = int(setup.get('minAddress', 0)), int(setup.get('maxAddress', (1 << 32) - 1))
+    slots = max(1, (high - low + 1) // burst_bytes)
+
+    if setup.get('addressDistribution', 'random') == 'sequential':
+        index = np.arange(n, dtype=np.uint64) % np.uint64(slots)
+    else:
+        index = rng.integers(0, slots, size=n, dtype=np.uint64)
+    addresses = np.uint64(low) + index * np.uint64(burst_bytes)
+    is_write = rng.random(n) >= setup.get('rwRatio', 1.0)
+    return np.arange(n, dtype=np.float64), is_write, addresses
+
+
+class DRAMModel:
+    """
+    evaluates dramsys simulation jsons analytically; returns the same result
+    dict as dramsys_runner.run_dramsys. loaded configs and traces are kept,
+    so repeated evaluations only pay for the model itself.
+    """
+
+    def __init__(self, config_dir=DEFAULT_CONFIG_DIR):
+        self.config_dir = config_dir
+        self._loaded = {}
+
+    def _load(self, kind, name):
+        key = (kind, name)
+        if key not in self._loaded:
+            path = os.path.join(self.config_dir, name)
+            if kind == 'memspec':
+                self._loaded[key] = MemSpec(path)
+            elif kind == 'addressmapping':
+                self._loaded[key] = AddressMapping.load(path)
+            elif kind == 'mcconfig':
+                self._loaded[key] = Controller(path)
+            else:
+                self._loaded[key] = load_trace(path)
+        return self._loaded[key]
+
+    def run(self, config_dict, recorder=None):
+        with profiler.span("model"):
+            result = self._run(config_dict)
+        if recorder:
+            with profiler.span("store"):
+                recorder.record(config_dict, result, evaluator='model')
+        return result
+
+    def _run(self, config_dict):
+        sim = config_dict['simulation']
+        try:
+            spec = self._load('memspec', sim['memspec'])
+            mapping = self._load('addressmapping', sim['addressmapping'])
+            controller = self._load('mcconfig', sim['mcconfig'])
+
+            setup = sim['tracesetup'][0]
+            cycle = 1e6 / setup.get('clkMhz', 1000)
+            if setup.get('type') == 'generator':
+                arrivals, is_write, addresses = generator_requests(setup, spec.burst_bytes)
+            else:
+                timestamps, is_write, addresses = self._load('trace', setup['name'])
+                arrivals = timestamps.astype(np.float64)
+
+            total_time, bandwidth = estimate(spec, mapping, controller, arrivals * cycle,
+                                             np.asarray(is_write, dtype=bool), addresses)
+            return {'total_time': int(total_time), 'bandwidth': round(bandwidth, 2), 'success': True}
+        except (OSError, KeyError, ValueError) as e:
+            print(f"model: {sim.get('simulationid')}: {e}")
+            return {'total_time': None, 'bandwidth': None, 'success': False}
+
+
+def validate(model, paths, trace_file="traces/resnet50_synthetic.stl"):
+    """spearman rank correlation between model and dramsys, per results file and overall"""
+    groups = {}
+    for name, record, total_time in stored_results(paths):
+        start = time.perf_counter()
+        result = model.run(record_config(record, trace_file))
+        elapsed = time.perf_counter() - start
+        if result['success']:
+            groups.setdefault(name, []).append((total_time, result['total_time'], record.get('bandwidth',
+                                                record.get('avg_bandwidth_gbps')), result['bandwidth'], elapsed))
+
+    report = {}
+    print(f"{'results file':<40} {'runs':>5} {'time rho':>9} {'bw rho':>7} {'median err':>11} {'ms/run':>7}")
+    for name, rows in sorted(groups.items()):
+        real, predicted, real_bw, predicted_bw, seconds = (list(c) for c in zip(*rows))
+        bw_pairs = [(r, p) for r, p in zip(real_bw, predicted_bw) if r]
+        errors = sorted(abs(p - r) / r for r, p in zip(real, predicted))
+        report[name] = {
+            'runs': len(rows),
+            'time_spearman': spearman(real, predicted),
+            'bandwidth_spearman': spearman(*zip(*bw_pairs)) if bw_pairs else None,
+            'median_time_error': errors[len(errors) // 2],
+            'ms_per_run': 1000 * sum(seconds) / len(seconds),
+        }
+        r = report[name]
+        fmt = lambda v: f"{v:.3f}" if v is not None else "-"
+        print(f"{name:<40} {r['runs']:>5} {fmt(r['time_spearman']):>9} {fmt(r['bandwidth_spearman']):>7} "
+              f"{r['median_time_error']:>11.1%} {r['ms_per_run']:>7.1f}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="analytical dram timing model")
+    parser.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="estimate a dramsys simulation json")
+    p.add_argument("config")
+
+    p = sub.add_parser("validate", help="rank correlation against dramsys results")
+    p.add_argument("results", nargs="*", help=f"result jsons (default: all of {DEFAULT_RESULTS_DIR})")
+    p.add_argument("--trace", default="traces/resnet50_synthetic.stl",
+                   help="trace the player-based results were simulated with")
+    p.add_argument("--output", default=None, help="also save the report as json")
+
+    args = parser.parse_args()
+    model = DRAMModel(args.config_dir)
+
+    if args.command == "run":
+        with open(args.config) as f:
+            config = json.load(f)
+        start = time.perf_counter()
+        result = model.run(config)
+        if not result['success']:
+            sys.exit(1)
+        print(f"Total Time: {result['total_time']} ps")
+        print(f"AVG BW: {result['bandwidth']:.2f} Gb/s")
+        print(f"model time: {(time.perf_counter() - start) * 1000:.1f} ms")
+    else:
+        paths = args.results or sorted(glob.glob(os.path.join(DEFAULT_RESULTS_DIR, "*.json")))
+        report = validate(model, paths, args.trace)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
@@ -9,10 +9,19 @@ import sys
 import json
 import subprocess
 import random
-import re
+import argparse
 from dataclasses import dataclass
 from typing import List, Tuple
 
+from dramsys_runner import run_dramsys
+from fitness_cache import FitnessCache
+from search_driver import SearchDriver
+from address_mapping import screen_mappings
+from dram_model import DRAMModel
+from results_store import ResultsStore
+import profiler
+import live_metrics
+
 @dataclass
 class DRAMConfig:
     """represents a dram configuration"""
@@ -24,17 +33,24 @@ class DRAMConfig:
     def to_dict(self):
         return {
             'memspec': self.memspec,
-            'addressmapping': self.addressmappings,
+            'addressmapping': self.addressmapping,
             'mcconfig': self.mcconfig,
             'fitness': self.fitness
         }
 
 class DRAMOptimizer:
-    def __init__(self, dramsys_path, trace_file, population_size=20, generations=10):
+    def __init__(self, dramsys_path, trace_file, population_size=20, generations=10, workers=1,
+                 cache=None, budget=None, patience=None, model=None, recorder=None):
         self.dramsys_path = dramsys_path
         self.trace_file = trace_file
         self.population_size = population_size
         self.generations = generations
+        self.workers = workers
+        self.cache = cache
+        self.budget = budget
+        self.patience = patience
+        self.model = model
+        self.recorder = recorder
         self.config_base_path = os.path.join(dramsys_path, 'configs')
 
         # available configurations
@@ -68,6 +84,7 @@ class DRAMOptimizer:
             mcconfig=random.choice(self.mcconfigs)
         )
 
+    @profiler.timed("evaluate", label="simulation_id")
     def evaluate_config(self, config: DRAMConfig, simulation_id: str) -> float:
         """evaluate a configuration by running dramsys simulation"""
         config_dict = {
@@ -85,25 +102,15 @@ class DRAMOptimizer:
             }
         }
 
-        config_file = f"/tmp/dramsys_config_{simulation_id}.json"
-        with open(config_file, 'w') as f:
-            json.dump(config_dict, f, indent=2)
+        config_file = f"dramsys_config_{simulation_id}.json"
 
         try:
-            result = subprocess.run(
-                [os.path.join(self.dramsys_path, 'build/bin/DRAMSys'), config_file],
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-
-            for line in result.stdout.split('\n'):
-                if 'Total Time:' in line:
-                    match = re.search(r'Total Time:\s+(\d+)', line)
-                    if match:
-                        return int(match.group(1))
-
-            return float('inf')
+            if self.model:
+                result = self.model.run(config_dict, recorder=self.recorder)
+            else:
+                result = run_dramsys(self.dramsys_path, config_dict, config_file,
+                                     timeout=300, cache=self.cache, recorder=self.recorder)
+            return result['total_time'] if result['success'] else float('inf')
 
         except subprocess.TimeoutExpired:
             print(f"  simulation timeout for {simulation_id}")
@@ -111,9 +118,6 @@ class DRAMOptimizer:
         except Exception as e:
             print(f"  error running simulation: {e}")
             return float('inf')
-        finally:
-            if os.path.exists(config_file):
-                os.remove(config_file)
 
     def crossover(self, parent1: DRAMConfig, parent2: DRAMConfig) -> Tuple[DRAMConfig, DRAMConfig]:
         """perform crossover between two parents"""
@@ -148,18 +152,31 @@ class DRAMOptimizer:
         print("dram configuration optimization: genetic algorithm")
         print("-" * 70)
 
-        population = [self.create_random_config() for _ in range(self.population_size)]
+        space = {'memspec': self.memspecs, 'addressmapping': self.addressmappings, 'mcconfig': self.mcconfigs}
+        driver = SearchDriver(space, budget=self.budget, patience=self.patience,
+                              planned=self.population_size * self.generations)
+        generations = self.generations
+
+        if driver.fits_budget():
+            print(f"space of {driver.space_size()} fits the budget of {self.budget}: enumerating it")
+            population = [DRAMConfig(memspec=c['memspec'], addressmapping=c['addressmapping'],
+                                     mcconfig=c['mcconfig']) for c in driver.enumerate()]
+            generations = 1
+        else:
+            population = [self.create_random_config() for _ in range(self.population_size)]
         best_configs = []
 
-        for generation in range(self.generations):
-            print(f"\n--- generation {generation + 1}/{self.generations} ---")
+        for generation in profiler.iterate("generation", range(generations)):
+            if driver.should_stop():
+                print(f"\nstopping: {driver.stop_reason}")
+                break
+
+            print(f"\n--- generation {generation + 1}/{generations} ---")
 
-            for i, config in enumerate(population):
-                sim_id = f"gen{generation}_ind{i}"
-                print(f"  evaluating individual {i+1}/{self.population_size}...", end=' ')
-                fitness = self.evaluate_config(config, sim_id)
+            jobs = [(config, f"gen{generation}_ind{i}") for i, config in enumerate(population)]
+            for config, sim_id, fitness in driver.evaluate(jobs, self.evaluate_config, self.workers):
                 config.fitness = fitness
-                print(f"fitness: {fitness if fitness != float('inf') else 'failed'}")
+                print(f"  {sim_id} fitness: {fitness if fitness != float('inf') else 'failed'}")
 
             population.sort(key=lambda x: x.fitness)
 
@@ -190,6 +207,10 @@ class DRAMOptimizer:
         print("\n" + "-" * 70)
         print("optimization complete")
         print("-" * 70)
+        for line in driver.summary():
+            print(line)
+        if self.cache:
+            print(self.cache.summary())
 
         best = min(best_configs, key=lambda x: x['fitness'])
         print("\nbest configuration found:")
@@ -199,7 +220,8 @@ class DRAMOptimizer:
         with open(results_file, 'w') as f:
             json.dump({
                 'best_config': best,
-                'all_generations': best_configs
+                'all_generations': best_configs,
+                'search': driver.stats()
             }, f, indent=2)
 
         print(f"\nresults saved to: {results_file}")
@@ -207,14 +229,56 @@ class DRAMOptimizer:
         return best
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="dram configuration optimizer")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of dramsys simulations to run concurrently")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always run dramsys instead of reusing cached results")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="maximum number of simulations; the space is enumerated if it fits")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="stop after this many simulations without improving the best fitness")
+    parser.add_argument("--trace", default="traces/resnet50_synthetic.stl",
+                        help="player trace relative to ~/DRAMSys/configs, e.g. a trace_mixer.py mix")
+    parser.add_argument("--evaluator", choices=["dramsys", "model"], default="dramsys",
+                        help="score with dramsys or the analytical timing model of dram_model.py")
+    parser.add_argument("--screen-mappings", type=int, default=None, metavar="KEEP",
+                        help="only search the KEEP address mappings with the best predicted row locality")
+    parser.add_argument("--no-store", action="store_true",
+                        help="do not append the evaluations to the results store (results_store.py)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every phase of every evaluation; prints a table and writes a chrome trace")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help="serve live prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enable()
     dramsys_path = os.path.expanduser("~/DRAMSys")
-    trace_file = "traces/resnet50_synthetic.stl"
+    trace_file = args.trace
+    recorder = None if args.no_store else ResultsStore().start_run("dram_optimizer.py", vars(args))
+    cache = None if args.no_cache else FitnessCache()
+    if args.metrics_port is not None:
+        live_metrics.serve(args.metrics_port, "dram_optimizer.py", cache)
 
     optimizer = DRAMOptimizer(
         dramsys_path=dramsys_path,
         trace_file=trace_file,
         population_size=10,
-        generations=5
+        generations=5,
+        workers=args.workers,
+        cache=cache,
+        budget=args.budget,
+        patience=args.patience,
+        model=DRAMModel(os.path.join(dramsys_path, 'configs')) if args.evaluator == "model" else None,
+        recorder=recorder
     )
+    if args.screen_mappings:
+        optimizer.addressmappings = screen_mappings(trace_file, optimizer.addressmappings,
+                                                    args.screen_mappings, optimizer.config_base_path)
 
     best_config = optimizer.optimize()
+    if recorder:
+        recorder.finish()
+        print(recorder.summary())
+    profiler.finish(os.path.expanduser('~/hackathon-project/results/dram_optimizer_profile.json'))
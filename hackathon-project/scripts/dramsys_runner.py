@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+shared helpers for running dramsys simulations from the optimizers
+"""
+
+import os
+import re
+import json
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import profiler
+import live_metrics
+
+# the progress line dramsys prints while running,
+#   Simulation progress: 40% (simulated time 1234000 ps)
+# is a lower bound on the run's total time. the final "Total Time:" summary
+# is deliberately not matched: it only appears once the run has finished, and
+# a finished run is kept even when it lands over the bound
+SIMULATED_TIME_PATTERN = re.compile(r'Simulation progress:.*\(simulated time (\d+) ps\)')
+
+# every run gets its own workspace under a ram-backed directory when available.
+# DRAMSYS_SCRATCH_DIR overrides the location; DRAMSYS_KEEP_FAILED=1 keeps the
+# workspace of failed runs for inspection
+SCRATCH_ROOT = os.environ.get('DRAMSYS_SCRATCH_DIR') or (
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+)
+KEEP_FAILED = os.environ.get('DRAMSYS_KEEP_FAILED', '') not in ('', '0')
+
+# dramsys processes currently running, so an abandoned population can kill them
+_running = set()
+_running_lock = threading.Lock()
+
+
+class ScratchWorkspace:
+    """
+    private working directory for one dramsys run. the dramsys config
+    subdirectories (memspec, addressmapping, mcconfig, simconfig, traces, ...)
+    are symlinked in, so relative paths resolve without copying anything, and
+    the output database lands in a directory no other run shares.
+    """
+
+    def __init__(self, dramsys_path, name, root=None, keep_failed=None):
+        self.config_dir = os.path.join(dramsys_path, 'configs')
+        self.name = name
+        self.root = root or SCRATCH_ROOT
+        self.keep_failed = KEEP_FAILED if keep_failed is None else keep_failed
+        self.failed = False
+        self.path = None
+
+    def __enter__(self):
+        with profiler.span("workspace"):
+            os.makedirs(self.root, exist_ok=True)
+            self.path = tempfile.mkdtemp(prefix=f"dramsys_{self.name}_", dir=self.root)
+            for entry in os.scandir(self.config_dir):
+                if entry.is_dir():
+                    os.symlink(entry.path, os.path.join(self.path, entry.name))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if (exc_type is not None or self.failed) and self.keep_failed:
+            print(f"  kept failed workspace: {self.path}")
+        else:
+            # rmtree unlinks the symlinks without following them
+            with profiler.span("cleanup"):
+                shutil.rmtree(self.path, ignore_errors=True)
+        return False
+
+
+def parse_dramsys_output(stdout):
+    """extract (total_time_ps, avg_bw_gbps) from dramsys stdout; missing values are none"""
+    total_time = None
+    avg_bw = None
+
+    for line in stdout.split('\n'):
+        if 'Total Time:' in line:
+            m = re.search(r'Total Time:\s+(\d+)', line)
+            if m:
+                total_time = int(m.group(1))
+        if 'AVG BW:' in line and 'IDLE' not in line:
+            m = re.search(r'AVG BW:\s+([\d.]+)', line)
+            if m:
+                avg_bw = float(m.group(1))
+
+    return total_time, avg_bw
+
+
+def parse_simulated_time(line):
+    """simulated time in ps reported on one line of dramsys output, or none"""
+    m = SIMULATED_TIME_PATTERN.search(line)
+    if not m:
+        return None
+    return int(m.group(1))
+
+
+def stream_dramsys(command, timeout, bound=None, cwd=None):
+    """
+    run dramsys, reading stdout line by line as it is produced.
+    when bound (ps) is given and the simulated time already exceeds it, the run
+    can no longer finish below the bound, so it is killed early.
+    returns (stdout, lower_bound_ps, pruned).
+    """
+    with profiler.span("spawn"):
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, bufsize=1, cwd=cwd)
+    with _running_lock:
+        _running.add(proc)
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+
+    lines = []
+    lower_bound = None
+    with profiler.span("simulate"):
+        started = profiler.now()
+        try:
+            for line in proc.stdout:
+                if not lines:
+                    profiler.interval("startup", started)
+                lines.append(line)
+                simulated = parse_simulated_time(line)
+                if simulated is None:
+                    continue
+
+                lower_bound = max(lower_bound or 0, simulated)
+                if bound is not None and lower_bound > bound:
+                    proc.kill()
+                    proc.wait()
+                    live_metrics.count('pruned')
+                    return ''.join(lines), lower_bound, True
+            proc.wait()
+        finally:
+            timer.cancel()
+            if proc.poll() is None:
+                # interrupted while reading: never leave the simulator behind
+                proc.kill()
+                proc.wait()
+            with _running_lock:
+                _running.discard(proc)
+            proc.stdout.close()
+
+    if timed_out.is_set():
+        live_metrics.count('timeouts')
+        raise subprocess.TimeoutExpired(command, timeout)
+    return ''.join(lines), lower_bound, False
+
+
+def run_dramsys(dramsys_path, config_dict, config_file, timeout=120, cache=None, bound=None, recorder=None):
+    """
+    run dramsys on config_dict inside a fresh scratch workspace, writing the
+    config there as config_file, and parse the summary. returns
+    {'total_time', 'bandwidth', 'success'}. when a FitnessCache is given,
+    a hit skips the subprocess entirely. when bound (ps) is given, a run whose
+    simulated time passes it is killed and returned with 'pruned' true and its
+    'lower_bound'. a results_store RunRecorder, when given, logs the result
+    of every run that simulated; cache hits are not new evaluations.
+    subprocess errors propagate to the caller.
+    """
+    name = os.path.splitext(os.path.basename(config_file))[0]
+    binary = f"{dramsys_path}/build/bin/DRAMSys"
+    ran = False
+
+    def simulate():
+        nonlocal ran
+        ran = True
+        with ScratchWorkspace(dramsys_path, name) as workspace:
+            run_config = os.path.join(workspace.path, os.path.basename(config_file))
+            with profiler.span("write_config"), open(run_config, 'w') as f:
+                json.dump(config_dict, f, indent=2)
+
+            stdout, lower_bound, pruned = stream_dramsys(
+                [binary, run_config], timeout, bound, cwd=workspace.path
+            )
+            if pruned:
+                return {
+                    'total_time': None,
+                    'bandwidth': None,
+                    'success': False,
+                    'pruned': True,
+                    'lower_bound': lower_bound
+                }
+
+            with profiler.span("parse"):
+                total_time, avg_bw = parse_dramsys_output(stdout)
+            workspace.failed = total_time is None
+            return {
+                'total_time': total_time,
+                'bandwidth': avg_bw,
+                'success': total_time is not None
+            }
+
+    if cache is None:
+        result = simulate()
+    else:
+        with profiler.span("cache_key"):
+            key = cache.key(config_dict, os.path.join(dramsys_path, 'configs'), binary)
+        result = cache.get_or_compute(key, simulate)
+
+    if recorder and ran:
+        with profiler.span("store"):
+            recorder.record(config_dict, result)
+    return result
+
+
+def kill_running():
+    """kill every dramsys process still running"""
+    with _running_lock:
+        running = list(_running)
+    for proc in running:
+        proc.kill()
+
+
+def apply_result(individual, result):
+    """
+    copy a run_dramsys (or DRAMModel) result onto a dict individual and return
+    its success. a pruned run was killed early and can only be worse than the
+    incumbent: it keeps the lower bound as its fitness and is marked 'pruned',
+    with no bandwidth, so selection and the reported bests leave it out.
+    """
+    if result.get('pruned'):
+        individual.update(fitness=result['lower_bound'], bandwidth=0, success=True, pruned=True)
+        return True
+
+    individual['fitness'] = result['total_time'] if result['total_time'] else float('inf')
+    individual['bandwidth'] = result['bandwidth'] if result['bandwidth'] else 0
+    individual['success'] = result['success']
+    return individual['success']
+
+
+def completed(individual):
+    """whether an individual ran to the end: a candidate for selection and the bests"""
+    return bool(individual.get('success')) and not individual.get('pruned')
+
+
+def evaluate_population(jobs, evaluate, workers=1):
+    """
+    evaluate (individual, sim_id) jobs with up to `workers` simulations in flight.
+
+    each dramsys run is a separate process, so a thread pool is enough to keep
+    all cores busy. results are yielded as (individual, sim_id, success) in
+    completion order; the caller must consume the whole generator before
+    advancing the ga, so a generation always finishes completely.
+    """
+    jobs = list(jobs)
+    evaluate = live_metrics.track(evaluate, len(jobs), workers)
+
+    with profiler.span("population", jobs=len(jobs)):
+        if workers <= 1 or len(jobs) <= 1:
+            for individual, sim_id in jobs:
+                yield individual, sim_id, evaluate(individual, sim_id)
+            return
+
+        pool = ThreadPoolExecutor(max_workers=min(workers, len(jobs)))
+        finished = False
+        try:
+            futures = {
+                pool.submit(evaluate, individual, sim_id): (individual, sim_id)
+                for individual, sim_id in jobs
+            }
+            for future in as_completed(futures):
+                individual, sim_id = futures[future]
+                yield individual, sim_id, future.result()
+            finished = True
+        finally:
+            # on ctrl-c or an abandoned generator, drop the queued jobs and kill
+            # the simulations already running instead of orphaning them
+            pool.shutdown(wait=False, cancel_futures=True)
+            if not finished:
+                kill_running()
@@ -4,13 +4,43 @@ dram optimizer: full parameter search using evolutionary sampling.
 searches both hardware and traffic generator parameters.
 """
 
-import os, json, subprocess, re, random
+import os, json, math, random, argparse
 from datetime import datetime
 
+from dramsys_runner import apply_result, completed, evaluate_population, run_dramsys
+from fitness_cache import FitnessCache
+from dram_model import DRAMModel
+from results_store import ResultsStore
+from search_driver import SearchDriver
+from racing import Racer
+from successive_halving import successive_halving, geometric_fidelities, fidelity_correlations, print_fidelity_report
+from surrogate_search import SurrogateSearch
+from pareto import ParetoArchive, time_bandwidth, rank_population, select_survivors
+import profiler
+import live_metrics
+
+# search parameter -> the option list attribute it is drawn from, in genome order
+SPACE_ATTRIBUTES = {
+    'memspec': 'memspecs',
+    'addressmapping': 'addressmappings',
+    'mcconfig': 'mcconfigs',
+    'clkMhz': 'clk_options',
+    'numRequests': 'num_req_options',
+    'rwRatio': 'rw_ratio_options',
+    'addressDistribution': 'addr_dist_options',
+}
+# the memory system being designed; the rest describes the workload
+DESIGN_PARAMS = ('memspec', 'addressmapping', 'mcconfig')
+
 class ExtensiveOptimizer:
-    def __init__(self):
+    def __init__(self, workers=1, cache=None, prune_margin=None, budget=None, patience=None,
+                 race_max_runs=None, model=None, recorder=None, verbose=True, checkpoint_every=1):
         self.dramsys_path = os.path.expanduser("~/DRAMSys")
         self.results_dir = os.path.expanduser("~/hackathon-project/results")
+        # dram_model.DRAMModel used instead of dramsys when set
+        self.model = model
+        # results_store.RunRecorder that every evaluation is appended to
+        self.recorder = recorder
 
         # Hardware parameter lists
         self.memspecs = [
@@ -47,14 +77,49 @@ class ExtensiveOptimizer:
                 * len(self.addr_dist_options)
         )
 
-        print("-" * 80)
-        print("extensive dram optimization")
-        print("-" * 80)
-        print(f"search space: {total_configs:,} configurations")
-        print("-" * 80)
+        if verbose:
+            print("-" * 80)
+            print("extensive dram optimization")
+            print("-" * 80)
+            print(f"search space: {total_configs:,} configurations")
+            print("-" * 80)
 
         self.all_results = []
         self.tested_configs = set()
+        self.workers = workers
+        self.cache = cache
+        self.prune_margin = prune_margin
+        self.prune_bound = None
+        self.budget = budget
+        self.patience = patience
+        self.race_max_runs = race_max_runs
+        self.checkpoint_file = f"{self.results_dir}/extensive_checkpoint.json"
+        # results between checkpoints: 1 loses nothing on a crash, larger
+        # values batch the writes (each one rewrites all_results)
+        self.checkpoint_every = checkpoint_every
+
+    def search_space(self):
+        """parameter name -> options, in genome order"""
+        return {param: getattr(self, attribute) for param, attribute in SPACE_ATTRIBUTES.items()}
+
+    def freeze(self, frozen):
+        """
+        pin design parameters to one value each; every strategy then searches
+        the smaller space. workload parameters cannot be frozen: that would
+        change the workload being optimized for, not shrink the design space
+        """
+        space = self.search_space()
+        for param, value in frozen.items():
+            if param not in DESIGN_PARAMS:
+                raise ValueError(f"{param} describes the workload; only {', '.join(DESIGN_PARAMS)} can be frozen")
+            if value not in space[param]:
+                raise ValueError(f"{param}: {value!r} is not one of {space[param]}")
+        for param, value in frozen.items():
+            # a new list, so option lists handed out earlier are left alone
+            setattr(self, SPACE_ATTRIBUTES[param], [value])
+        space = self.search_space()
+        print(f"frozen: {', '.join(f'{p}={v}' for p, v in frozen.items())}")
+        print(f"search space: {math.prod(len(o) for o in space.values()):,} configurations")
 
     def create_individual(self):
         """Random parameter sample."""
@@ -68,7 +133,9 @@ class ExtensiveOptimizer:
             random.choice(self.addr_dist_options)
         )
 
-        while str(cfg) in self.tested_configs:
+        # a frozen space can be smaller than the population: repeat once it is exhausted
+        space_size = math.prod(len(o) for o in self.search_space().values())
+        while str(cfg) in self.tested_configs and len(self.tested_configs) < space_size:
             cfg = (
                 random.choice(self.memspecs),
                 random.choice(self.addressmappings),
@@ -92,6 +159,7 @@ class ExtensiveOptimizer:
             'fitness': None
         }
 
+    @profiler.timed("evaluate", label="sim_id")
     def evaluate(self, ind, sim_id):
         """Run DRAMSys and extract timing/bandwidth."""
         config = {
@@ -109,34 +177,22 @@ class ExtensiveOptimizer:
                     "rwRatio": ind['rwRatio'],
                     "addressDistribution": ind['addressDistribution'],
                     "minAddress": 0,
-                    "maxAddress": 4294967295
+                    "maxAddress": 4294967295,
+                    **({"seed": ind['seed']} if 'seed' in ind else {})
                 }]
             }
         }
 
-        cfg_file = f"{self.dramsys_path}/configs/ext_{sim_id}.json"
-        with open(cfg_file, 'w') as f:
-            json.dump(config, f, indent=2)
+        cfg_file = f"ext_{sim_id}.json"
 
         try:
-            result = subprocess.run(
-                [f"{self.dramsys_path}/build/bin/DRAMSys", cfg_file],
-                capture_output=True, text=True, timeout=120
-            )
-
-            total_time, avg_bw = None, None
-            for line in result.stdout.split('\n'):
-                if 'Total Time:' in line:
-                    m = re.search(r'Total Time:\s+(\d+)', line)
-                    if m: total_time = int(m.group(1))
-                if 'AVG BW:' in line and 'IDLE' not in line:
-                    m = re.search(r'AVG BW:\s+([\d.]+)', line)
-                    if m: avg_bw = float(m.group(1))
+            if self.model:
+                result = self.model.run(config, recorder=self.recorder)
+            else:
+                result = run_dramsys(self.dramsys_path, config, cfg_file, timeout=120,
+                                     cache=self.cache, bound=self.prune_bound, recorder=self.recorder)
 
-            ind['fitness'] = total_time if total_time else float('inf')
-            ind['bandwidth'] = avg_bw if avg_bw else 0
-            ind['success'] = total_time is not None
-            return ind['success']
+            return apply_result(ind, result)
 
         except:
             ind['fitness'], ind['bandwidth'], ind['success'] = float('inf'), 0, False
@@ -160,33 +216,135 @@ class ExtensiveOptimizer:
         if random.random() < rate: ind['rwRatio'] = random.choice(self.rw_ratio_options)
         if random.random() < rate: ind['addressDistribution'] = random.choice(self.addr_dist_options)
 
-    def optimize(self, pop_size=15, generations=8):
+    def save_checkpoint(self, state):
+        """atomically write the run state so an interrupted run can --resume"""
+        tmp = f"{self.checkpoint_file}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_file)
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_file):
+            return None
+        with open(self.checkpoint_file) as f:
+            state = json.load(f)
+
+        version, internal, gauss_next = state['rng']
+        random.setstate((version, tuple(internal), gauss_next))
+        self.all_results = state['all_results']
+        self.tested_configs = set(state['tested_configs'])
+        return state
+
+    def optimize(self, pop_size=15, generations=8, resume=False):
         """optimization loop."""
 
-        print(f"population: {pop_size}, generations: {generations}")
+        state = self.load_checkpoint() if resume else None
+        if resume and state is None:
+            print(f"no checkpoint at {self.checkpoint_file}, starting a new run")
+        if state:
+            pop_size, generations = state['pop_size'], state['generations']
+
+        print(f"population: {pop_size}, generations: {generations}, workers: {self.workers}")
         print("-" * 80)
 
-        population = [self.create_individual() for _ in range(pop_size)]
-        best_ever = None
-        generation_bests = []
+        elite = max(2, pop_size // 5)
+        driver = SearchDriver(self.search_space(), budget=self.budget, patience=self.patience,
+                              planned=pop_size + (generations - 1) * (pop_size - elite))
+        racer = (Racer(self.evaluate, key=driver.genotype, workers=self.workers,
+                       top_k=elite, max_runs=self.race_max_runs, driver=driver)
+                 if self.race_max_runs else None)
+
+        if state:
+            population = state['population']
+            best_ever = state['best_ever']
+            generation_bests = state['progress']
+            start_gen = state['generation']
+            driver.load_state(state['driver'])
+            if racer and state.get('racer'):
+                racer.load_state(state['racer'])
+            print(f"resuming generation {start_gen+1} from {self.checkpoint_file}")
+        else:
+            if driver.fits_budget():
+                print(f"space of {driver.space_size()} fits the budget of {self.budget}: enumerating it")
+                population = driver.enumerate()
+                pop_size, generations = len(population), 1
+            else:
+                population = [self.create_individual() for _ in range(pop_size)]
+            best_ever = None
+            generation_bests = []
+            start_gen = 0
+
+        def checkpoint(gen, in_flight=()):
+            # individuals still being simulated are saved unevaluated, so a
+            # resumed run re-runs exactly those
+            self.save_checkpoint({
+                'generation': gen,
+                'pop_size': pop_size,
+                'generations': generations,
+                'population': [
+                    {k: v for k, v in ind.items() if k in self.search_space()} | {'fitness': None}
+                    if i in in_flight else ind
+                    for i, ind in enumerate(population)
+                ],
+                'best_ever': best_ever,
+                'progress': generation_bests,
+                'all_results': self.all_results,
+                'tested_configs': sorted(self.tested_configs),
+                'rng': random.getstate(),
+                'driver': driver.state(),
+                'racer': racer.state() if racer else None,
+            })
+
+        for gen in profiler.iterate("generation", range(start_gen, generations)):
+            checkpoint(gen)
+            if driver.should_stop():
+                print(f"\nstopping: {driver.stop_reason}")
+                break
 
-        for gen in range(generations):
             print(f"\ngeneration {gen+1}/{generations}")
             successful = 0
 
-            for i, ind in enumerate(population):
-                if ind['fitness'] is None:
-                    print(f"{i+1}/{pop_size} ", end='', flush=True)
-                    sim_id = f"g{gen}i{i}"
-
-                    if self.evaluate(ind, sim_id):
-                        print(f"ok   time={ind['fitness']:,}  bw={ind['bandwidth']:.2f}")
-                        successful += 1
-                        self.all_results.append({'gen': gen+1, **ind})
-                    else:
-                        print("fail")
-
-            valid = [i for i in population if i['success']]
+            self.prune_bound = (best_ever['fitness'] * (1 + self.prune_margin)
+                                if best_ever and self.prune_margin is not None else None)
+            pending = {f"g{gen}i{i}": i for i, ind in enumerate(population) if ind['fitness'] is None}
+            jobs = [(population[i], sim_id) for sim_id, i in pending.items()]
+
+            in_flight = set(pending.values())
+            recorded = 0
+
+            def on_record(ind, sim_id, outcome):
+                # after the driver has recorded the result, so a resumed run
+                # knows the genotype for dedup and patience
+                nonlocal recorded
+                recorded += 1
+                if recorded % self.checkpoint_every == 0:
+                    checkpoint(gen, in_flight)
+
+            for ind, sim_id, success in driver.evaluate(jobs, self.evaluate, self.workers, on_record):
+                i = pending[sim_id]
+                in_flight.discard(i)
+                if success and ind.get('pruned'):
+                    print(f"{i+1}/{pop_size} pruned, lower bound {ind['fitness']:,}")
+                    self.all_results.append({'gen': gen+1, **ind})
+                elif success:
+                    print(f"{i+1}/{pop_size} ok   time={ind['fitness']:,}  bw={ind['bandwidth']:.2f}")
+                    successful += 1
+                    self.all_results.append({'gen': gen+1, **ind})
+                else:
+                    print(f"{i+1}/{pop_size} fail")
+            checkpoint(gen)
+
+            if racer:
+                raced = [ind for ind in population if completed(ind)]
+                runs_before = [ind.get('runs', 1) for ind in raced]
+                extra_before = racer.extra_runs
+                racer.race(raced, f"g{gen}")
+                print(f"racing: {racer.extra_runs - extra_before} extra runs")
+                for ind, runs in zip(raced, runs_before):
+                    if ind['runs'] > runs:
+                        self.all_results.append({'gen': gen+1, 'raced': True, **ind})
+
+            valid = [i for i in population if completed(i)]
             if not valid:
                 print("no valid samples")
                 continue
@@ -200,7 +358,6 @@ class ExtensiveOptimizer:
             generation_bests.append(best_ever['fitness'])
 
             if gen < generations - 1:
-                elite = max(2, pop_size // 5)
                 next_gen = valid[:elite]
 
                 while len(next_gen) < pop_size:
@@ -225,20 +382,321 @@ class ExtensiveOptimizer:
                         'total_tested': len(self.all_results),
                         'unique_configs': len(self.tested_configs),
                         'generations': generations,
-                        'population_size': pop_size
+                        'population_size': pop_size,
+                        'search': driver.stats()
                     }
                 }, f, indent=2)
 
             print("\noptimization complete")
             print(f"best time: {best_ever['fitness']:,} ps")
+            for line in driver.summary():
+                print(line)
+            if self.cache:
+                print(self.cache.summary())
             print(f"results saved: {results_file}")
 
+            if os.path.exists(self.checkpoint_file):
+                os.remove(self.checkpoint_file)
             return best_ever
 
         print("no valid configuration found")
         return None
 
+    def optimize_nsga2(self, pop_size=12, generations=6):
+        """nsga-ii over (total time, bandwidth), keeping an archive of the pareto front"""
+        print(f"nsga-ii: population {pop_size}, generations {generations}, workers {self.workers}")
+        print("objectives: minimize total time, maximize bandwidth")
+        print("-" * 80)
+
+        driver = SearchDriver(self.search_space(), budget=self.budget)
+        archive = ParetoArchive()
+
+        def evaluate_all(individuals, gen, tag):
+            jobs = [(ind, f"{tag}{gen}i{i}") for i, ind in enumerate(individuals)]
+            for ind, sim_id, success in driver.evaluate(jobs, self.evaluate, self.workers):
+                if success:
+                    print(f"{sim_id} ok   time={ind['fitness']:,}  bw={ind['bandwidth']:.2f}")
+                    self.all_results.append({'gen': gen+1, **ind})
+                    archive.add(ind)
+                else:
+                    print(f"{sim_id} fail")
+
+        def objectives(individuals):
+            return [time_bandwidth(ind) if ind.get('success') else (float('inf'), float('inf'))
+                    for ind in individuals]
+
+        population = [self.create_individual() for _ in range(pop_size)]
+        print("\ngeneration 1")
+        evaluate_all(population, 0, "p")
+
+        for gen in profiler.iterate("generation", range(1, generations)):
+            if driver.should_stop():
+                print(f"\nstopping: {driver.stop_reason}")
+                break
+
+            print(f"\ngeneration {gen+1}/{generations}  (pareto front: {len(archive.members)})")
+            rank, crowding = rank_population(objectives(population))
+
+            def tournament():
+                a, b = random.sample(range(len(population)), 2)
+                better = a if (rank[a], -crowding[a]) <= (rank[b], -crowding[b]) else b
+                return population[better]
+
+            offspring = []
+            while len(offspring) < pop_size:
+                child = self.crossover(tournament(), tournament())
+                self.mutate(child)
+                offspring.append(child)
+            evaluate_all(offspring, gen, "q")
+
+            combined = population + offspring
+            population = [combined[i] for i in select_survivors(objectives(combined), pop_size)]
+
+        front = archive.front()
+        if not front:
+            print("no valid configuration found")
+            return None
+
+        print("\npareto front (time vs bandwidth):")
+        for ind in front:
+            print(f"  {ind['fitness']:>14,} ps  {ind['bandwidth']:>7.2f} gb/s  "
+                  f"{ind['memspec'].split('/')[-1]}, {ind['mcconfig'].split('/')[-1]}, "
+                  f"clk {ind['clkMhz']}, req {ind['numRequests']}, rw {ind['rwRatio']}, "
+                  f"{ind['addressDistribution']}")
+
+        results_file = f"{self.results_dir}/extensive_pareto_FINAL.json"
+        with open(results_file, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'objectives': ['minimize total_time', 'maximize bandwidth'],
+                'pareto_front': front,
+                'all_results': self.all_results,
+                'stats': {
+                    'total_tested': len(self.all_results),
+                    'front_size': len(front),
+                    'generations': generations,
+                    'population_size': pop_size,
+                    'search': driver.stats()
+                }
+            }, f, indent=2)
+
+        print(f"\nresults saved: {results_file}")
+        return front
+
+    def optimize_surrogate(self, budget=40, n_init=10, batch_size=None, warm_start=None):
+        """gaussian-process guided search: simulate only the highest expected-improvement candidates"""
+        space = self.search_space()
+        search = SurrogateSearch(space, categorical=('memspec', 'addressmapping', 'mcconfig',
+                                                     'addressDistribution'), n_init=n_init)
+        batch_size = batch_size or max(1, self.workers)
+
+        labelled, evaluated = [], set()
+        if warm_start:
+            with open(warm_start) as f:
+                previous = json.load(f).get('all_results', [])
+            for r in previous:
+                if completed(r) and all(r.get(p) in space[p] for p in space):
+                    point = {p: r[p] for p in space}
+                    labelled.append((point, r['fitness']))
+                    evaluated.add(search.key(point))
+            print(f"warm start: {len(labelled)} labelled points from {warm_start}")
+
+        print(f"surrogate search: budget {budget}, batch {batch_size}")
+        print("-" * 80)
+
+        # the driver keeps the budget, dedup and patience of the ga path
+        driver = SearchDriver(space, budget=budget, patience=self.patience)
+        best_ever = None
+        progress = []
+
+        while not driver.should_stop():
+            batch = search.propose(labelled, evaluated, min(batch_size, driver.remaining()))
+            if not batch:
+                print("search space exhausted")
+                break
+
+            self.prune_bound = (best_ever['fitness'] * (1 + self.prune_margin)
+                                if best_ever and self.prune_margin is not None else None)
+            jobs = [({**c, 'fitness': None}, f"bo{driver.simulations + j}") for j, c in enumerate(batch)]
+            for ind, sim_id, success in driver.evaluate(jobs, self.evaluate, self.workers):
+                evaluated.add(search.key(ind))
+                self.tested_configs.add(str(search.key(ind)))
+
+                if not success:
+                    print(f"{sim_id} fail")
+                    continue
+
+                # a pruned run's lower bound is already past the incumbent, which
+                # is all the model needs to steer away from it
+                labelled.append((ind, ind['fitness']))
+                self.all_results.append({'evaluation': driver.simulations, **ind})
+                if ind.get('pruned'):
+                    print(f"{sim_id} pruned, lower bound {ind['fitness']:,}")
+                    continue
+
+                print(f"{sim_id} ok   time={ind['fitness']:,}  bw={ind['bandwidth']:.2f}")
+                if best_ever is None or ind['fitness'] < best_ever['fitness']:
+                    best_ever = ind.copy()
+
+            if best_ever:
+                progress.append({'evaluations': driver.simulations, 'best': best_ever['fitness']})
+                print(f"after {driver.simulations} evaluations: best {best_ever['fitness']:,} ps")
+
+        if not best_ever:
+            print("no valid configuration found")
+            return None
+
+        results_file = f"{self.results_dir}/extensive_surrogate_FINAL.json"
+        with open(results_file, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'best_configuration': best_ever,
+                'progress': progress,
+                'all_results': self.all_results,
+                'stats': {
+                    'total_tested': driver.simulations,
+                    'budget': budget,
+                    'search_space': len(search.candidates),
+                    'search': driver.stats()
+                }
+            }, f, indent=2)
+
+        print("\noptimization complete")
+        print(f"best time: {best_ever['fitness']:,} ps")
+        for line in driver.summary():
+            print(line)
+        if self.cache:
+            print(self.cache.summary())
+        print(f"results saved: {results_file}")
+        return best_ever
+
+    def optimize_halving(self, num_candidates=81, eta=3, min_fidelity=1/27):
+        """successive halving over random samples, using a fraction of numRequests as low fidelity"""
+        fidelities = geometric_fidelities(min_fidelity, eta)
+        candidates = [self.create_individual() for _ in range(num_candidates)]
+
+        print(f"successive halving: {num_candidates} candidates, eta: {eta}")
+        print(f"request fidelities: {', '.join(f'{f:.3f}' for f in fidelities)}")
+        print("-" * 80)
+
+        def evaluate_rung(rung_candidates, fidelity, rung):
+            print(f"\nrung {rung}: {len(rung_candidates)} candidates at {fidelity:.3f} of numRequests")
+            jobs = [({**c, 'numRequests': max(1, round(c['numRequests'] * fidelity)), 'fitness': None},
+                     f"sh{rung}c{j}") for j, c in enumerate(rung_candidates)]
+            order = {sim_id: j for j, (_, sim_id) in enumerate(jobs)}
+            fitness = [float('inf')] * len(jobs)
+
+            for ind, sim_id, success in evaluate_population(jobs, self.evaluate, self.workers):
+                fitness[order[sim_id]] = ind['fitness']
+                if success:
+                    print(f"{sim_id} ok   time={ind['fitness']:,}  bw={ind['bandwidth']:.2f}")
+                    self.all_results.append({'rung': rung, 'fidelity': fidelity, **ind})
+                else:
+                    print(f"{sim_id} fail")
+            return fitness
+
+        ranking, history = successive_halving(candidates, fidelities, evaluate_rung, eta=eta)
+        report = fidelity_correlations(history)
+
+        print("\nfidelity ranking agreement:")
+        print_fidelity_report(report)
+
+        best_ever = {**candidates[ranking[0]], 'fitness': history[-1]['scores'][ranking[0]]}
+        results_file = f"{self.results_dir}/extensive_halving_FINAL.json"
+        with open(results_file, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'best_configuration': best_ever,
+                'fidelity_correlation': report,
+                'all_results': self.all_results,
+                'stats': {
+                    'total_tested': sum(len(level['scores']) for level in history),
+                    'candidates': num_candidates,
+                    'eta': eta
+                }
+            }, f, indent=2)
+
+        print("\noptimization complete")
+        print(f"best time: {best_ever['fitness']:,} ps")
+        print(f"results saved: {results_file}")
+        return best_ever
+
 
 if __name__ == "__main__":
-    optimizer = ExtensiveOptimizer()
-    optimizer.optimize(pop_size=12, generations=6)
+    parser = argparse.ArgumentParser(description="extensive dram optimizer")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of dramsys simulations to run concurrently")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always run dramsys instead of reusing cached results")
+    parser.add_argument("--prune-margin", type=float, default=None,
+                        help="kill simulations whose simulated time passes the best fitness by this fraction")
+    parser.add_argument("--strategy", choices=["ga", "halving", "surrogate", "nsga2"], default="ga",
+                        help="genetic algorithm, multi-fidelity successive halving, surrogate-guided search "
+                             "or nsga-ii time/bandwidth pareto search")
+    parser.add_argument("--population", type=int, default=12,
+                        help="ga and nsga-ii: population size")
+    parser.add_argument("--generations", type=int, default=6,
+                        help="ga and nsga-ii: number of generations")
+    parser.add_argument("--n-init", type=int, default=10,
+                        help="surrogate: random points simulated before the model is trusted")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="surrogate: candidates proposed per round (default: --workers)")
+    parser.add_argument("--candidates", type=int, default=81,
+                        help="successive halving: number of sampled configurations")
+    parser.add_argument("--eta", type=int, default=3,
+                        help="successive halving: keep 1/eta of candidates per rung")
+    parser.add_argument("--min-fidelity", type=float, default=1/27,
+                        help="successive halving: fraction of numRequests used on the first rung")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="maximum number of simulations (surrogate default 40); "
+                             "the ga enumerates the space if it fits")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="stop after this many simulations without improving the best fitness")
+    parser.add_argument("--race", type=int, default=None, metavar="MAX_RUNS",
+                        help="re-run contested candidates with new generator seeds, up to MAX_RUNS each")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the ga run saved in results/extensive_checkpoint.json")
+    parser.add_argument("--checkpoint-every", type=int, default=1, metavar="N",
+                        help="save the ga checkpoint every N evaluations instead of after each one "
+                             "(always after every generation)")
+    parser.add_argument("--warm-start", default=None,
+                        help="surrogate: results json whose all_results seed the model")
+    parser.add_argument("--evaluator", choices=["dramsys", "model"], default="dramsys",
+                        help="score with dramsys or the analytical timing model of dram_model.py")
+    parser.add_argument("--freeze", default=None, metavar="FILE",
+                        help="pin the parameters listed under 'freeze' in a param_importance.py report")
+    parser.add_argument("--no-store", action="store_true",
+                        help="do not append the evaluations to the results store (results_store.py)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every phase of every evaluation; prints a table and writes a chrome trace")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help="serve live prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enable()
+    cache = None if args.no_cache else FitnessCache()
+    if args.metrics_port is not None:
+        live_metrics.serve(args.metrics_port, "extensive_optimizer.py", cache)
+    model = DRAMModel() if args.evaluator == "model" else None
+    recorder = None if args.no_store else ResultsStore().start_run('extensive_optimizer.py', vars(args))
+    optimizer = ExtensiveOptimizer(workers=args.workers, cache=cache, prune_margin=args.prune_margin,
+                                   budget=args.budget, patience=args.patience, race_max_runs=args.race,
+                                   model=model, recorder=recorder, checkpoint_every=args.checkpoint_every)
+    if args.freeze:
+        with open(args.freeze) as f:
+            optimizer.freeze(json.load(f)['freeze'])
+    if args.strategy == "nsga2":
+        optimizer.optimize_nsga2(pop_size=args.population, generations=args.generations)
+    elif args.strategy == "surrogate":
+        optimizer.optimize_surrogate(budget=args.budget or 40, n_init=args.n_init, batch_size=args.batch_size,
+                                     warm_start=args.warm_start)
+    elif args.strategy == "halving":
+        optimizer.optimize_halving(num_candidates=args.candidates, eta=args.eta,
+                                   min_fidelity=args.min_fidelity)
+    else:
+        optimizer.optimize(pop_size=args.population, generations=args.generations, resume=args.resume)
+    if recorder:
+        recorder.finish()
+        print(recorder.summary())
+    profiler.finish(f"{optimizer.results_dir}/extensive_optimizer_profile.json")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+persistent fitness cache shared by all optimizers
+results are keyed by the normalized simulation json plus the contents of every
+file it references and of the dramsys binary, so any change to a memspec,
+mapping, mcconfig or trace, or a rebuilt simulator, invalidates the entry
+automatically. at most max_entries results are kept (an entry count, not a
+size), evicting the least recently used.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import contextlib
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/hackathon-project/results/fitness_cache.db")
+
+# fields that only name the run and never change the simulated result
+VOLATILE_SIMULATION_FIELDS = ('simulationid',)
+VOLATILE_INITIATOR_FIELDS = {'generator': ('name',)}
+
+REFERENCED_FILES = ('memspec', 'addressmapping', 'mcconfig', 'simconfig')
+
+
+class FitnessCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._file_digests = {}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS fitness (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS fitness_last_used ON fitness(last_used)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # one short-lived connection per call keeps this safe across threads and
+        # processes; sqlite serializes concurrent writers through its file lock.
+        # the connection's own context manager only commits, so close it too
+        with contextlib.closing(sqlite3.connect(self.path, timeout=60)) as db, db:
+            yield db
+
+    def _file_digest(self, path):
+        """sha256 of a referenced file, memoized on (mtime, size)"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return "missing"
+
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._file_digests.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        self._file_digests[path] = (stamp, digest)
+        return digest
+
+    def key(self, config_dict, config_dir, binary=None):
+        """content-addressed key for a dramsys simulation config run by the binary at that path"""
+        simulation = {k: v for k, v in config_dict['simulation'].items()
+                      if k not in VOLATILE_SIMULATION_FIELDS}
+
+        initiators = []
+        for initiator in simulation.get('tracesetup', []):
+            volatile = VOLATILE_INITIATOR_FIELDS.get(initiator.get('type'), ())
+            initiators.append({k: v for k, v in initiator.items() if k not in volatile})
+        simulation['tracesetup'] = initiators
+
+        contents = {field: self._file_digest(os.path.join(config_dir, simulation[field]))
+                    for field in REFERENCED_FILES if field in simulation}
+        contents['traces'] = [self._file_digest(os.path.join(config_dir, i['name']))
+                              for i in initiators if i.get('type') == 'player']
+        if binary is not None:
+            contents['binary'] = self._file_digest(binary)
+
+        normalized = json.dumps({'simulation': simulation, 'files': contents}, sort_keys=True)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def get(self, key):
+        with self._connect() as db:
+            row = db.execute("SELECT result FROM fitness WHERE key = ?", (key,)).fetchone()
+            if row:
+                db.execute("UPDATE fitness SET last_used = ? WHERE key = ?", (time.time(), key))
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, result):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO fitness VALUES (?, ?, ?, ?)",
+                       (key, json.dumps(result), now, now))
+            db.execute("""
+                DELETE FROM fitness WHERE key IN (
+                    SELECT key FROM fitness ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def get_or_compute(self, key, compute):
+        """
+        return the cached result for key, or run compute() and store it.
+        concurrent callers asking for the same key in this process wait for
+        the first one instead of launching a duplicate simulation.
+        failed results (success false) are returned but never stored.
+        """
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+
+        if not owner:
+            event.wait()
+
+        try:
+            result = self.get(key)
+            if result is not None:
+                return result
+
+            result = compute()
+            if result.get('success'):
+                self.put(key, result)
+            return result
+        finally:
+            if owner:
+                with self._lock:
+                    del self._inflight[key]
+                event.set()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self):
+        return f"cache: {self.hits} hits / {self.hits + self.misses} lookups ({self.hit_rate():.1%})"
+
+    def size(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM fitness").fetchone()[0]
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM fitness")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CACHE_PATH
+
+    cache = FitnessCache(path)
+    if command == "clear":
+        cache.clear()
+        print(f"cleared: {path}")
+    else:
+        print(f"cache: {path}")
+        print(f"entries: {cache.size()}")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+streaming valgrind lackey -> dramsys trace converter
+reads `valgrind --tool=lackey --trace-mem=yes` output from a file, a named
+pipe or stdin in large byte blocks and writes the data accesses as .stl (or
+the binary format of trace_format.py) while valgrind is still running, so
+the raw log never touches the disk. lines are classified and parsed with
+numpy instead of a regex per line.
+
+lackey lines: " L addr,size" load, " S addr,size" store, " M addr,size"
+modify (a read then a write), "I  addr,size" instruction fetch (ignored).
+any other line is program output: it is echoed, and the roi marker lines
+switch recording on and off when --roi is given.
+
+with --cache the accesses go through the cache hierarchy of cache_filter.py
+first, so only misses and writebacks reach the trace.
+"""
+
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from cache_filter import DEFAULT_LEVELS, LINE_SIZE, CacheHierarchy
+from trace_format import TraceWriter, format_stl, parse_fields
+
+ROI_BEGIN = "DRAMSYS_ROI_BEGIN"
+ROI_END = "DRAMSYS_ROI_END"
+
+BLOCK_BYTES = 8 * 1024 * 1024
+
+
+def parse_lackey(block):
+    """
+    (line_index, is_write, addresses, sizes) of the data accesses of a block
+    of complete lackey lines, modify lines expanded to a read and a write,
+    plus the indices and text of the program output lines
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord("\n"))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    last = len(buf) - 1
+
+    first = buf[starts]
+    second = buf[np.minimum(starts + 1, last)]
+    third = buf[np.minimum(starts + 2, last)]
+    access = ((first == ord(" ")) & (third == ord(" ")) & (ends - starts > 4)
+              & ((second == ord("L")) | (second == ord("S")) | (second == ord("M"))))
+
+    commas = np.append(np.flatnonzero(buf == ord(",")), len(buf))
+    lines = np.flatnonzero(access)
+    comma = commas[np.searchsorted(commas, starts[lines])]
+    valid = comma < ends[lines]
+    lines, comma = lines[valid], comma[valid]
+
+    addresses = parse_fields(buf, starts[lines] + 3, comma, 16)
+    sizes = parse_fields(buf, comma + 1, ends[lines], 10)
+    op = second[lines]
+
+    modify = op == ord("M")
+    repeats = 1 + modify
+    is_write = np.repeat(op == ord("S"), repeats)
+    is_write[np.cumsum(repeats)[modify] - 1] = True
+
+    other = np.flatnonzero(~access & (first != ord("I")) & ~((first == ord("=")) & (second == ord("="))))
+    output = [(i, block[starts[i]:ends[i]].decode(errors="replace")) for i in other]
+
+    return (np.repeat(lines, repeats), is_write,
+            np.repeat(addresses, repeats), np.repeat(sizes, repeats), output)
+
+
+class LackeyConverter:
+    def __init__(self, write, interval=5, max_ops=None, skip=0, roi=False, echo=True):
+        """
+        write(timestamps, is_write, addresses, sizes) receives each converted batch.
+        interval: cycles between consecutive ops. skip: recorded ops to drop first.
+        roi: only record between ROI_BEGIN and ROI_END lines in the program output.
+        """
+        self.write = write
+        self.interval = interval
+        self.max_ops = max_ops
+        self.skip = skip
+        self.roi = roi
+        self.echo = echo
+
+        self.recording = not roi
+        self.timestamp = 0
+        self.count = 0
+        self.accesses = 0
+        self.bytes = 0
+
+    @property
+    def done(self):
+        return self.max_ops is not None and self.count >= self.max_ops
+
+    def feed(self, block):
+        """convert a block of complete lines"""
+        self.bytes += len(block)
+        lines, is_write, addresses, sizes, output = parse_lackey(block)
+        self.accesses += len(lines)
+
+        marker_lines, marker_states = [], []
+        for index, text in output:
+            if text.strip() == ROI_BEGIN:
+                marker_lines.append(index)
+                marker_states.append(True)
+            elif text.strip() == ROI_END:
+                marker_lines.append(index)
+                marker_states.append(False)
+            elif self.echo:
+                print(text)
+
+        if self.roi:
+            if marker_lines:
+                states = np.array([self.recording] + marker_states)
+                recording = states[np.searchsorted(marker_lines, lines)]
+                self.recording = marker_states[-1]
+            else:
+                recording = np.full(len(lines), self.recording)
+            is_write, addresses, sizes = is_write[recording], addresses[recording], sizes[recording]
+
+        if self.skip:
+            dropped = min(self.skip, len(addresses))
+            is_write, addresses, sizes = is_write[dropped:], addresses[dropped:], sizes[dropped:]
+            self.skip -= dropped
+
+        if self.max_ops is not None:
+            room = max(0, self.max_ops - self.count)
+            is_write, addresses, sizes = is_write[:room], addresses[:room], sizes[:room]
+
+        n = len(addresses)
+        if n:
+            timestamps = self.timestamp + self.interval * np.arange(n, dtype=np.uint64)
+            self.write(timestamps, is_write, addresses, sizes)
+            self.timestamp += self.interval * n
+            self.count += n
+
+    def run(self, stream, block_bytes=BLOCK_BYTES):
+        """convert a byte stream until eof or the op limit"""
+        rest = b""
+        reported = 0
+        while not self.done:
+            data = stream.read(block_bytes)
+            if not data:
+                break
+            data = rest + data
+            cut = data.rfind(b"\n") + 1
+            rest = data[cut:]
+            if cut:
+                self.feed(data[:cut])
+            if self.count - reported >= 1000000:
+                reported = self.count
+                print(f"  converted {self.count} operations...", file=sys.stderr)
+        if rest and not self.done:
+            self.feed(rest + b"\n")
+
+
+def open_output(path, fmt):
+    """(write, close) for an .stl or binary trace output"""
+    if fmt == "binary":
+        writer = TraceWriter(path)
+        return writer.write, writer.close
+
+    f = open(path, "wb")
+
+    def write(timestamps, is_write, addresses, sizes):
+        f.write(format_stl(timestamps, is_write, addresses))
+
+    return write, f.close
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="convert valgrind lackey output to a dramsys trace")
+    parser.add_argument("input", help="lackey output: a file, a named pipe, or - for stdin")
+    parser.add_argument("output")
+    parser.add_argument("--format", choices=["stl", "binary"], default="stl")
+    parser.add_argument("--interval", type=int, default=5, help="cycles between consecutive ops")
+    parser.add_argument("--max-ops", type=int, default=None,
+                        help="stop after this many ops (closing the pipe ends the valgrind run)")
+    parser.add_argument("--skip", type=int, default=0, help="drop the first N ops that would be recorded")
+    parser.add_argument("--roi", action="store_true",
+                        help=f"record only between {ROI_BEGIN} and {ROI_END} lines of program output")
+    parser.add_argument("--quiet", action="store_true", help="do not echo the traced program's output")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_LEVELS, metavar="LEVELS",
+                        help=f"filter through a cache hierarchy, size:ways per level (default {DEFAULT_LEVELS}); "
+                             "--max-ops and --skip still count cpu accesses")
+    parser.add_argument("--line-size", type=int, default=LINE_SIZE)
+    args = parser.parse_args()
+
+    write, close = open_output(args.output, args.format)
+    hierarchy = None
+    if args.cache:
+        hierarchy = CacheHierarchy.parse(args.cache, args.line_size)
+        write = hierarchy.filtered(write)
+    converter = LackeyConverter(write, args.interval, args.max_ops, args.skip, args.roi, not args.quiet)
+
+    start = time.perf_counter()
+    stream = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    try:
+        converter.run(stream)
+    finally:
+        close()
+        stream.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"\nscanned {converter.bytes / 1e6:.1f} MB of lackey output, {converter.accesses} data accesses",
+          file=sys.stderr)
+    if hierarchy:
+        print("\n".join(hierarchy.summary()), file=sys.stderr)
+        print(f"created trace with {hierarchy.outputs} memory operations "
+              f"from {converter.count} cpu accesses", file=sys.stderr)
+    else:
+        print(f"created trace with {converter.count} memory operations", file=sys.stderr)
+    print(f"total simulated time: {converter.timestamp} cycles", file=sys.stderr)
+    print(f"conversion rate: {converter.bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s", file=sys.stderr)
+    print(f"output: {args.output}", file=sys.stderr)
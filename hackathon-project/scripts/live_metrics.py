@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+live prometheus metrics of a running search
+with --metrics-port the optimizers serve /metrics on 127.0.0.1 in the
+prometheus text format, so a local scrape can alert on stalled or degraded
+runs: throughput, in-flight simulations, outcomes, best fitness, progress and
+eta of the current generation (one evaluate_population batch) and the fitness
+cache hit rate. stdlib only; the server is a daemon thread that dies with the
+run.
+
+disabled, every hook is one global lookup, as in profiler.py.
+"""
+
+import math
+import time
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# completions counted for simulations/minute
+RATE_WINDOW = 300
+
+# the RunMetrics being served; None while metrics are disabled
+_active = None
+
+
+class RunMetrics:
+    def __init__(self, script, cache=None):
+        self.script = script
+        self.cache = cache
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+        self.outcomes = {'success': 0, 'failure': 0}
+        self.timeouts = 0
+        self.pruned = 0
+        self.in_flight = 0
+        self.workers = 0
+        self.best = math.nan
+        self.evaluation_seconds = 0.0
+        self.completions = deque()
+        self.last_completion = math.nan
+
+        self.generation = 0
+        self.generation_jobs = 0
+        self.generation_done = 0
+        self.generation_started = None
+
+    def batch(self, jobs, workers):
+        with self._lock:
+            self.generation += 1
+            self.generation_jobs = jobs
+            self.generation_done = 0
+            self.generation_started = time.time()
+            self.workers = min(workers, jobs) or 1
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self, success, seconds):
+        now = time.time()
+        with self._lock:
+            self.in_flight -= 1
+            self.outcomes['success' if success else 'failure'] += 1
+            self.evaluation_seconds += seconds
+            self.generation_done += 1
+            self.completions.append(now)
+            self.last_completion = now
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def improve(self, fitness):
+        with self._lock:
+            if not fitness >= self.best:
+                self.best = fitness
+
+    def rate(self, now):
+        """simulations per minute over the last RATE_WINDOW seconds (or the run so far)"""
+        while self.completions and self.completions[0] < now - RATE_WINDOW:
+            self.completions.popleft()
+        window = min(RATE_WINDOW, now - self.started)
+        return 60 * len(self.completions) / window if window > 0 else 0.0
+
+    def eta(self, now):
+        """seconds until the current generation finishes, from its pace so far"""
+        remaining = self.generation_jobs - self.generation_done
+        if remaining <= 0:
+            return 0.0
+        if self.generation_done:
+            return (now - self.generation_started) / self.generation_done * remaining
+        finished = sum(self.outcomes.values())
+        if finished:
+            # nothing back yet: the run's mean evaluation time per worker slot
+            return self.evaluation_seconds / finished * math.ceil(remaining / self.workers)
+        return math.nan
+
+    def render(self):
+        """the prometheus text exposition of the current state"""
+        now = time.time()
+        with self._lock:
+            finished = sum(self.outcomes.values())
+            samples = [
+                ('info', 'gauge', "the search being run", [({'script': self.script}, 1)]),
+                ('start_time_seconds', 'gauge', "unix time the run started", [({}, self.started)]),
+                ('simulations_total', 'counter', "evaluations finished, by outcome",
+                 [({'outcome': k}, v) for k, v in self.outcomes.items()]),
+                ('timeouts_total', 'counter', "dramsys runs killed by the timeout", [({}, self.timeouts)]),
+                ('pruned_total', 'counter', "dramsys runs stopped early by the prune bound", [({}, self.pruned)]),
+                ('simulations_per_minute', 'gauge', f"evaluations finished per minute over the last "
+                 f"{RATE_WINDOW} s", [({}, self.rate(now))]),
+                ('in_flight', 'gauge', "evaluations running now", [({}, self.in_flight)]),
+                ('workers', 'gauge', "worker slots of the current generation", [({}, self.workers)]),
+                ('best_fitness_ps', 'gauge', "best total time found so far", [({}, self.best)]),
+                ('generation', 'gauge', "evaluation batches started", [({}, self.generation)]),
+                ('generation_jobs', 'gauge', "evaluations in the current generation", [({}, self.generation_jobs)]),
+                ('generation_done', 'gauge', "evaluations of the current generation finished",
+                 [({}, self.generation_done)]),
+                ('generation_eta_seconds', 'gauge', "estimated seconds until the current generation finishes",
+                 [({}, self.eta(now))]),
+                ('last_completion_time_seconds', 'gauge', "unix time of the last finished evaluation",
+                 [({}, self.last_completion)]),
+                ('evaluation_seconds', 'summary', "wall time of finished evaluations",
+                 []),
+            ]
+            evaluation = (self.evaluation_seconds, finished)
+        if self.cache is not None:
+            hits, misses = self.cache.hits, self.cache.misses
+            samples += [
+                ('cache_hits_total', 'counter', "fitness cache hits", [({}, hits)]),
+                ('cache_misses_total', 'counter', "fitness cache misses", [({}, misses)]),
+                ('cache_hit_ratio', 'gauge', "fitness cache hits per lookup",
+                 [({}, hits / (hits + misses) if hits + misses else math.nan)]),
+            ]
+
+        lines = []
+        for name, kind, help_text, values in samples:
+            metric = f"dram_search_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            if kind == 'summary':
+                lines.append(f"{metric}_sum {_number(evaluation[0])}")
+                lines.append(f"{metric}_count {evaluation[1]}")
+                continue
+            for labels, value in values:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{metric}{{{label_text}}} {_number(value)}" if labels else f"{metric} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value):
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics' or _active is None:
+            self.send_error(404)
+            return
+        body = _active.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # scrapes would drown the optimizer output
+        pass
+
+
+def serve(port, script, cache=None, host="127.0.0.1"):
+    """start collecting and serve /metrics from a daemon thread; returns the server"""
+    global _active
+    _active = RunMetrics(script, cache)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"metrics: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def succeeded(outcome):
+    """
+    whether an evaluate outcome is a success: True, or a finite fitness
+    (dram_optimizer.py returns the total time, inf when the run failed)
+    """
+    if isinstance(outcome, bool):
+        return outcome
+    return isinstance(outcome, (int, float)) and math.isfinite(outcome)
+
+
+def track(evaluate, jobs, workers, is_success=succeeded):
+    """evaluate wrapped to count in-flight and finished evaluations of a new batch"""
+    metrics = _active
+    if metrics is None:
+        return evaluate
+    metrics.batch(jobs, workers)
+
+    def tracked(individual, sim_id):
+        metrics.begin()
+        start = time.perf_counter()
+        outcome = None
+        try:
+            outcome = evaluate(individual, sim_id)
+            return outcome
+        finally:
+            metrics.end(is_success(outcome), time.perf_counter() - start)
+    return tracked
+
+
+def count(name):
+    """bump the timeouts or pruned counter"""
+    if _active is not None:
+        _active.count(name)
+
+
+def improve(fitness):
+    """report a new best fitness"""
+    if _active is not None:
+        _active.improve(fitness)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+load-latency sweep
+replays one trace at increasing injection rates for each configuration and
+finds the rate where the memory stops keeping up. the rate is scaled through
+the player's clkMhz (timestamps are in player cycles), so the trace itself is
+never rewritten.
+
+at every rate r the run reports total time t and avg bw. with s the time of
+the last injection, efficiency s / t stays near 1 while the controller keeps
+up and falls once requests queue; the completion lag t - s (how far the last
+response trails the last request) is the latency signal: about one access
+latency unloaded, growing with the backlog past saturation.
+
+the knee is bracketed by doubling or halving the rate from 1x and then
+bisected in log space, so each configuration costs a handful of runs
+instead of a grid. the peak sustainable bandwidth is the bandwidth at the
+highest rate that still kept up.
+"""
+
+import os
+import json
+import math
+import argparse
+import subprocess
+from datetime import datetime
+
+from dramsys_runner import evaluate_population, run_dramsys
+from fitness_cache import FitnessCache
+from dram_model import DRAMModel
+from trace_format import load_trace
+
+
+class LoadSweep:
+    def __init__(self, trace_file, base_clk=1000, tolerance=0.05, precision=0.05, max_doublings=8,
+                 cache=None, model=None):
+        self.dramsys_path = os.path.expanduser("~/DRAMSys")
+        self.results_dir = os.path.expanduser("~/hackathon-project/results")
+        self.trace_file = trace_file
+        self.base_clk = base_clk
+        self.tolerance = tolerance
+        self.precision = precision
+        self.max_doublings = max_doublings
+        self.cache = cache
+        self.model = model
+
+        timestamps, _, _ = load_trace(os.path.join(self.dramsys_path, "configs", trace_file))
+        self.last_cycle = int(timestamps[-1]) if len(timestamps) else 0
+        self.requests = len(timestamps)
+
+    def measure(self, config, rate, sim_id):
+        """one point of the curve: the config replayed at rate x the base clock"""
+        clk = max(1, round(self.base_clk * rate))
+        sim = json.loads(json.dumps(config))
+        sim['simulation']['simulationid'] = sim_id
+        sim['simulation']['tracesetup'] = [{"type": "player", "clkMhz": clk, "name": self.trace_file}]
+
+        try:
+            if self.model:
+                result = self.model.run(sim)
+            else:
+                result = run_dramsys(self.dramsys_path, sim, f"{sim_id}.json", timeout=600, cache=self.cache)
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"  {sim_id}: {e}")
+            return None
+        if not result['success']:
+            return None
+
+        last_injection = self.last_cycle * 1e6 / clk
+        total_time = result['total_time']
+        return {
+            'rate': clk / self.base_clk,
+            'clkMhz': clk,
+            'total_time': total_time,
+            'bandwidth': result['bandwidth'],
+            'lag': total_time - last_injection,
+            'efficiency': last_injection / total_time if total_time else 0.0,
+        }
+
+    def saturated(self, point):
+        return point['efficiency'] < 1 - self.tolerance
+
+    def sweep(self, config, name):
+        """bracket then bisect the saturation rate of one config; returns the sweep record"""
+        points = []
+
+        def at(rate):
+            point = self.measure(config, rate, f"sweep_{name}_{len(points)}")
+            if point is None:
+                raise RuntimeError(f"{name}: simulation failed at rate {rate:.3f}")
+            points.append(point)
+            return point
+
+        first = at(1.0)
+        low = high = None
+        if self.saturated(first):
+            high = first
+            for _ in range(self.max_doublings):
+                point = at(high['rate'] / 2)
+                if not self.saturated(point):
+                    low = point
+                    break
+                high = point
+        else:
+            low = first
+            for _ in range(self.max_doublings):
+                point = at(low['rate'] * 2)
+                if self.saturated(point):
+                    high = point
+                    break
+                low = point
+
+        if low is not None and high is not None:
+            while high['rate'] / low['rate'] > 1 + self.precision:
+                mid_rate = math.sqrt(low['rate'] * high['rate'])
+                if round(self.base_clk * mid_rate) in (low['clkMhz'], high['clkMhz']):
+                    break
+                point = at(mid_rate)
+                if self.saturated(point):
+                    high = point
+                else:
+                    low = point
+
+        points.sort(key=lambda p: p['rate'])
+        return {
+            'name': name,
+            'config': config['simulation'],
+            'knee_rate': low['rate'] if low else None,
+            'knee_clkMhz': low['clkMhz'] if low else None,
+            'peak_bandwidth': low['bandwidth'] if low else None,
+            'saturated_bandwidth': high['bandwidth'] if high else None,
+            'unloaded_lag': points[0]['lag'],
+            # the knee lies outside the explored range when either end is missing
+            'bracketed': low is not None and high is not None,
+            'points': points,
+        }
+
+    def run(self, configs, workers=1):
+        records = {}
+        jobs = [(config, name) for name, config in configs.items()]
+
+        def evaluate(config, name):
+            try:
+                records[name] = self.sweep(config, name)
+                return True
+            except RuntimeError as e:
+                print(f"  {e}")
+                return False
+
+        for _, name, success in evaluate_population(jobs, evaluate, workers):
+            if success:
+                r = records[name]
+                knee = f"{r['knee_rate']:.2f}x" if r['knee_rate'] else "below range"
+                print(f"  {name}: knee {knee} after {len(r['points'])} runs")
+        return [records[name] for name in configs if name in records]
+
+
+def candidate_configs(memspecs, addressmappings, mcconfigs):
+    """name -> simulation json for every combination"""
+    configs = {}
+    for memspec in memspecs:
+        for addressmapping in addressmappings:
+            for mcconfig in mcconfigs:
+                name = "_".join(os.path.splitext(os.path.basename(p))[0]
+                                for p in (memspec, addressmapping, mcconfig))
+                configs[name] = {"simulation": {
+                    "addressmapping": addressmapping,
+                    "mcconfig": mcconfig,
+                    "memspec": memspec,
+                    "simconfig": "simconfig/example.json",
+                }}
+    return configs
+
+
+def print_table(records):
+    print(f"\n{'configuration':<64} {'knee':>7} {'clkMhz':>7} {'peak bw':>9} {'sat bw':>8} {'lag ps':>10}")
+    for r in sorted(records, key=lambda r: -(r['peak_bandwidth'] or 0)):
+        knee = f"{r['knee_rate']:.2f}x" if r['knee_rate'] else "-"
+        if r['knee_rate'] and not r['bracketed']:
+            knee = ">" + knee
+        peak = f"{r['peak_bandwidth']:.2f}" if r['peak_bandwidth'] is not None else "-"
+        sat = f"{r['saturated_bandwidth']:.2f}" if r['saturated_bandwidth'] is not None else "-"
+        print(f"{r['name']:<64} {knee:>7} {r['knee_clkMhz'] or '-':>7} {peak:>9} {sat:>8} "
+              f"{r['unloaded_lag']:>10,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="find each configuration's saturation point")
+    parser.add_argument("--trace", default="traces/resnet50_synthetic.stl")
+    parser.add_argument("--memspec", nargs="+", default=["memspec/JEDEC_4Gb_DDR4-2400_8bit_A.json"])
+    parser.add_argument("--addressmapping", nargs="+",
+                        default=["addressmapping/am_ddr4_8x4Gbx8_dimm_p1KB_brc.json"])
+    parser.add_argument("--mcconfig", nargs="+", default=["mcconfig/fifo.json", "mcconfig/fr_fcfs.json"])
+    parser.add_argument("--base-clk", type=int, default=1000, help="player clkMhz of rate 1x")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="saturated once the run takes this fraction longer than the injection")
+    parser.add_argument("--precision", type=float, default=0.05,
+                        help="stop bisecting when the bracket is this narrow (relative)")
+    parser.add_argument("--workers", type=int, default=1, help="configurations swept concurrently")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always run dramsys instead of reusing cached results")
+    parser.add_argument("--evaluator", choices=["dramsys", "model"], default="dramsys",
+                        help="score with dramsys or the analytical timing model of dram_model.py")
+    args = parser.parse_args()
+
+    sweep = LoadSweep(args.trace, args.base_clk, args.tolerance, args.precision,
+                      cache=None if args.no_cache else FitnessCache(),
+                      model=DRAMModel() if args.evaluator == "model" else None)
+    configs = candidate_configs(args.memspec, args.addressmapping, args.mcconfig)
+
+    print("-" * 80)
+    print("load-latency sweep")
+    print("-" * 80)
+    print(f"trace: {args.trace} ({sweep.requests} requests)")
+    print(f"configurations: {len(configs)}")
+    print(f"saturation: efficiency below {1 - args.tolerance:.0%}")
+    print("-" * 80)
+
+    records = sweep.run(configs, args.workers)
+    print_table(records)
+
+    results_file = f"{sweep.results_dir}/load_sweep.json"
+    with open(results_file, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'trace': args.trace,
+            'evaluator': args.evaluator,
+            'tolerance': args.tolerance,
+            'sweeps': records,
+        }, f, indent=2)
+    print(f"\nsaved sweep to: {results_file}")
@@ -6,13 +6,26 @@ automatically finds best dram configuration for ai workloads
 
 import os
 import json
-import subprocess
-import re
 import random
+import argparse
 from datetime import datetime
+from functools import partial
+
+from dramsys_runner import apply_result, completed, evaluate_population, run_dramsys
+from fitness_cache import FitnessCache
+from search_driver import SearchDriver
+from successive_halving import (successive_halving, geometric_fidelities, fidelity_correlations,
+                                print_fidelity_report, write_trace_prefix)
+from phase_sampling import evaluate_sampled, load_manifest
+from address_mapping import screen_mappings
+from dram_model import DRAMModel
+from results_store import ResultsStore
+import profiler
+import live_metrics
 
 class DRAMOptimizer:
-    def __init__(self):
+    def __init__(self, workers=1, cache=None, prune_margin=None, budget=None, patience=None,
+                 simpoints=None, model=None, recorder=None):
         self.dramsys_path = os.path.expanduser("~/DRAMSys")
         self.results_dir = os.path.expanduser("~/hackathon-project/results")
 
@@ -39,6 +52,26 @@ class DRAMOptimizer:
         self.population = []
         self.generation = 0
         self.all_results = []
+        self.workers = workers
+        self.cache = cache
+        self.prune_margin = prune_margin
+        self.prune_bound = None
+        self.budget = budget
+        self.patience = patience
+        # phase_sampling.py manifest: score on its representative intervals instead
+        self.simpoints = simpoints
+        # dram_model.DRAMModel used instead of dramsys when set
+        self.model = model
+        # results_store.RunRecorder that every evaluation is appended to
+        self.recorder = recorder
+
+    def search_space(self):
+        """gene name -> options"""
+        return {
+            'memspec': self.memspecs,
+            'addressmapping': self.addressmappings,
+            'mcconfig': self.mcconfigs,
+        }
 
     def create_individual(self):
         return {
@@ -48,8 +81,8 @@ class DRAMOptimizer:
             'fitness': None
         }
 
-    def evaluate_fitness(self, individual, sim_id):
-        config_dict = {
+    def simulation_config(self, individual, sim_id, trace_file):
+        return {
             "simulation": {
                 "addressmapping": individual['addressmapping'],
                 "mcconfig": individual['mcconfig'],
@@ -59,41 +92,36 @@ class DRAMOptimizer:
                 "tracesetup": [{
                     "type": "player",
                     "clkMhz": 1000,
-                    "name": self.trace_file
+                    "name": trace_file
                 }]
             }
         }
 
-        config_file = f"{self.dramsys_path}/configs/opt_{sim_id}.json"
-        with open(config_file, 'w') as f:
-            json.dump(config_dict, f, indent=2)
+    def run_sampled(self, individual, sim_id):
+        """full-trace estimate from the simpoints; a partial run says nothing about
+        the full time, so the prune bound is not applied"""
+        def simulate(trace, k):
+            return run_dramsys(self.dramsys_path, self.simulation_config(individual, f"{sim_id}_sp{k}", trace),
+                               f"opt_{sim_id}_sp{k}.json", timeout=120, cache=self.cache,
+                               recorder=self.recorder)
+        return evaluate_sampled(self.simpoints, simulate)
+
+    @profiler.timed("evaluate", label="sim_id")
+    def evaluate_fitness(self, individual, sim_id, trace_file=None):
+        config_dict = self.simulation_config(individual, sim_id, trace_file or self.trace_file)
+        config_file = f"opt_{sim_id}.json"
 
         try:
-            result = subprocess.run(
-                [f"{self.dramsys_path}/build/bin/DRAMSys", config_file],
-                capture_output=True,
-                text=True,
-                timeout=120
-            )
-
-            total_time = None
-            avg_bw = None
-
-            for line in result.stdout.split('\n'):
-                if 'Total Time:' in line:
-                    m = re.search(r'Total Time:\s+(\d+)', line)
-                    if m:
-                        total_time = int(m.group(1))
-                if 'AVG BW:' in line and 'IDLE' not in line:
-                    m = re.search(r'AVG BW:\s+([\d.]+)', line)
-                    if m:
-                        avg_bw = float(m.group(1))
-
-            individual['fitness'] = total_time if total_time else float('inf')
-            individual['bandwidth'] = avg_bw if avg_bw else 0
-            individual['success'] = total_time is not None
-
-            return individual['success']
+            if self.model:
+                result = self.model.run(config_dict, recorder=self.recorder)
+            elif self.simpoints and trace_file is None:
+                result = self.run_sampled(individual, sim_id)
+            else:
+                result = run_dramsys(self.dramsys_path, config_dict, config_file,
+                                     timeout=120, cache=self.cache, bound=self.prune_bound,
+                                     recorder=self.recorder)
+
+            return apply_result(individual, result)
 
         except Exception:
             individual['fitness'] = float('inf')
@@ -123,39 +151,63 @@ class DRAMOptimizer:
         print(f"population size: {population_size}")
         print(f"generations: {generations}")
         print(f"configuration space: {len(self.memspecs)} x {len(self.addressmappings)} x {len(self.mcconfigs)}")
+        print(f"parallel workers: {self.workers}")
+        if self.simpoints:
+            print(f"fitness: estimated from {self.simpoints['phases']} simpoints "
+                  f"({self.simpoints['cost_fraction']:.1%} of {self.simpoints['source']})")
         print("-"*80)
 
-        print("\ninitializing population...")
-        self.population = [self.create_individual() for _ in range(population_size)]
+        driver = SearchDriver(self.search_space(), budget=self.budget, patience=self.patience,
+                              planned=population_size + (generations - 1) * (population_size - elite_size))
+
+        if driver.fits_budget():
+            print(f"\nspace of {driver.space_size()} fits the budget of {self.budget}: enumerating it")
+            self.population = driver.enumerate()
+            population_size, generations = len(self.population), 1
+        else:
+            print("\ninitializing population...")
+            self.population = [self.create_individual() for _ in range(population_size)]
 
         best_ever = None
 
-        for gen in range(generations):
+        for gen in profiler.iterate("generation", range(generations)):
+            if driver.should_stop():
+                print(f"\nstopping: {driver.stop_reason}")
+                break
+
             self.generation = gen + 1
             print("\n" + "-"*80)
             print(f"generation {self.generation}/{generations}")
             print("-"*80)
 
             successful = 0
-            for i, individual in enumerate(self.population):
-                if individual['fitness'] is None:
-                    sim_id = f"g{gen}i{i}"
-                    print(f"{i+1}/{population_size} ", end='', flush=True)
-
-                    success = self.evaluate_fitness(individual, sim_id)
-
-                    if success:
-                        print(f"time: {individual['fitness']:,} ps, bw: {individual['bandwidth']:.2f} gb/s")
-                        successful += 1
-                        self.all_results.append({
-                            'generation': gen + 1,
-                            'individual': i,
-                            **individual
-                        })
-                    else:
-                        print("fail")
-
-            valid_pop = [ind for ind in self.population if ind['success']]
+            self.prune_bound = (best_ever['fitness'] * (1 + self.prune_margin)
+                                if best_ever and self.prune_margin is not None else None)
+            pending = {f"g{gen}i{i}": i for i, individual in enumerate(self.population)
+                       if individual['fitness'] is None}
+            jobs = [(self.population[i], sim_id) for sim_id, i in pending.items()]
+
+            for individual, sim_id, success in driver.evaluate(jobs, self.evaluate_fitness, self.workers):
+                i = pending[sim_id]
+                if success and individual.get('pruned'):
+                    print(f"{i+1}/{population_size} pruned, lower bound {individual['fitness']:,} ps")
+                    self.all_results.append({
+                        'generation': gen + 1,
+                        'individual': i,
+                        **individual
+                    })
+                elif success:
+                    print(f"{i+1}/{population_size} time: {individual['fitness']:,} ps, bw: {individual['bandwidth']:.2f} gb/s")
+                    successful += 1
+                    self.all_results.append({
+                        'generation': gen + 1,
+                        'individual': i,
+                        **individual
+                    })
+                else:
+                    print(f"{i+1}/{population_size} fail")
+
+            valid_pop = [ind for ind in self.population if completed(ind)]
             if not valid_pop:
                 print("no valid configurations in this generation")
                 continue
@@ -192,6 +244,10 @@ class DRAMOptimizer:
         print("\n" + "-"*80)
         print("optimization complete")
         print("-"*80)
+        for line in driver.summary():
+            print(line)
+        if self.cache:
+            print(self.cache.summary())
 
         if best_ever:
             print("\nbest configuration found:")
@@ -229,7 +285,8 @@ class DRAMOptimizer:
                     'summary': {
                         'total_configurations_tested': len(self.all_results),
                         'generations': generations,
-                        'population_size': population_size
+                        'population_size': population_size,
+                        'search': driver.stats()
                     }
                 }, f, indent=2)
 
@@ -240,6 +297,124 @@ class DRAMOptimizer:
         print("no valid configurations found")
         return None
 
+    def optimize_halving(self, eta=3, min_fidelity=1/27):
+        """successive halving over the whole space, using trace prefixes as low fidelities"""
+        fidelities = geometric_fidelities(min_fidelity, eta)
+        candidates = [
+            {'memspec': m, 'addressmapping': a, 'mcconfig': c, 'fitness': None}
+            for m in self.memspecs for a in self.addressmappings for c in self.mcconfigs
+        ]
+
+        print("\n" + "-"*80)
+        print("smart dram optimizer - successive halving")
+        print("-"*80)
+        print(f"candidates: {len(candidates)}, eta: {eta}")
+        print(f"trace fidelities: {', '.join(f'{f:.3f}' for f in fidelities)}")
+        print("-"*80)
+
+        def evaluate_rung(rung_candidates, fidelity, rung):
+            trace = write_trace_prefix(f"{self.dramsys_path}/configs", self.trace_file, fidelity)
+            print(f"\nrung {rung}: {len(rung_candidates)} candidates on {trace}")
+
+            jobs = [({**c, 'fitness': None}, f"sh{rung}c{j}") for j, c in enumerate(rung_candidates)]
+            order = {sim_id: j for j, (_, sim_id) in enumerate(jobs)}
+            fitness = [float('inf')] * len(jobs)
+
+            evaluate = partial(self.evaluate_fitness, trace_file=trace)
+            for ind, sim_id, success in evaluate_population(jobs, evaluate, self.workers):
+                fitness[order[sim_id]] = ind['fitness']
+                print(f"  {sim_id} " + (f"time: {ind['fitness']:,} ps" if success else "fail"))
+            return fitness
+
+        ranking, history = successive_halving(candidates, fidelities, evaluate_rung, eta=eta)
+        report = fidelity_correlations(history)
+
+        print("\nfidelity ranking agreement:")
+        print_fidelity_report(report)
+
+        best = {**candidates[ranking[0]], 'fitness': history[-1]['scores'][ranking[0]]}
+        print("\nbest configuration found:")
+        print(f"  total time: {best['fitness']:,} ps")
+        print(f"  memory spec: {best['memspec']}")
+        print(f"  address mapping: {best['addressmapping']}")
+        print(f"  mc config: {best['mcconfig']}")
+
+        results_file = f"{self.results_dir}/optimization_halving_results.json"
+        with open(results_file, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'best_configuration': best,
+                'rungs': [{
+                    'rung': level['rung'],
+                    'fidelity': level['fidelity'],
+                    'results': [{**candidates[i], 'fitness': score}
+                                for i, score in level['scores'].items()]
+                } for level in history],
+                'fidelity_correlation': report,
+                'summary': {
+                    'simulations': sum(len(level['scores']) for level in history),
+                    'candidates': len(candidates),
+                    'eta': eta
+                }
+            }, f, indent=2)
+        print(f"\nsaved halving results to: {results_file}")
+
+        return best
+
 if __name__ == "__main__":
-    optimizer = DRAMOptimizer()
-    best = optimizer.optimize(population_size=10, generations=6)
+    parser = argparse.ArgumentParser(description="genetic algorithm dram optimizer")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of dramsys simulations to run concurrently")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always run dramsys instead of reusing cached results")
+    parser.add_argument("--prune-margin", type=float, default=None,
+                        help="kill simulations whose simulated time passes the best fitness by this fraction")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="maximum number of simulations; the space is enumerated if it fits")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="stop after this many simulations without improving the best fitness")
+    parser.add_argument("--strategy", choices=["ga", "halving"], default="ga",
+                        help="genetic algorithm or multi-fidelity successive halving")
+    parser.add_argument("--eta", type=int, default=3,
+                        help="successive halving: keep 1/eta of candidates per rung")
+    parser.add_argument("--min-fidelity", type=float, default=1/27,
+                        help="successive halving: trace fraction used on the first rung")
+    parser.add_argument("--trace", default="traces/resnet50_synthetic.stl",
+                        help="player trace relative to ~/DRAMSys/configs, e.g. a trace_mixer.py mix")
+    parser.add_argument("--simpoints", default=None, metavar="MANIFEST",
+                        help="estimate fitness from the representative intervals of phase_sampling.py")
+    parser.add_argument("--evaluator", choices=["dramsys", "model"], default="dramsys",
+                        help="score with dramsys or the analytical timing model of dram_model.py")
+    parser.add_argument("--screen-mappings", type=int, default=None, metavar="KEEP",
+                        help="only search the KEEP address mappings with the best predicted row locality")
+    parser.add_argument("--no-store", action="store_true",
+                        help="do not append the evaluations to the results store (results_store.py)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every phase of every evaluation; prints a table and writes a chrome trace")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help="serve live prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enable()
+    cache = None if args.no_cache else FitnessCache()
+    if args.metrics_port is not None:
+        live_metrics.serve(args.metrics_port, "optimizer.py", cache)
+    simpoints = load_manifest(args.simpoints) if args.simpoints else None
+    model = DRAMModel() if args.evaluator == "model" else None
+    recorder = None if args.no_store else ResultsStore().start_run("optimizer.py", vars(args))
+    optimizer = DRAMOptimizer(workers=args.workers, cache=cache, prune_margin=args.prune_margin,
+                              budget=args.budget, patience=args.patience, simpoints=simpoints, model=model,
+                              recorder=recorder)
+    optimizer.trace_file = args.trace
+    if args.screen_mappings:
+        optimizer.addressmappings = screen_mappings(optimizer.trace_file, optimizer.addressmappings,
+                                                    args.screen_mappings, f"{optimizer.dramsys_path}/configs")
+    if args.strategy == "halving":
+        best = optimizer.optimize_halving(eta=args.eta, min_fidelity=args.min_fidelity)
+    else:
+        best = optimizer.optimize(population_size=10, generations=6)
+    if recorder:
+        recorder.finish()
+        print(recorder.summary())
+    profiler.finish(f"{optimizer.results_dir}/optimizer_profile.json")
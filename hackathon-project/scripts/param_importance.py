@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+parameter importance of the extensive_optimizer.py search space
+fanova-style variance decomposition: the surrogate_search.py gaussian process
+is fitted to log total time of every accumulated evaluation and predicts the
+whole grid. the variance of that prediction then splits exactly into
+
+  main effect of p      variance of the grid mean at each value of p
+  interaction of p, q   variance of the (p, q) means left after both mains
+
+each reported as a fraction of the total, so what remains is third order and
+up. a design parameter (memspec, address mapping, controller) whose main
+effect plus all its interactions stays below --threshold barely moves total
+time, and is proposed for freezing at the value with the lowest predicted
+mean. the report json is what extensive_optimizer.py --freeze reads.
+workload parameters are never frozen, since pinning them changes the workload
+rather than the design space; the insensitive ones are listed separately.
+
+samples come from the results store (results_store.py) or from optimizer
+results json files; repeated points (generator seeds) are averaged.
+"""
+
+import os
+import json
+import math
+import argparse
+import itertools
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from extensive_optimizer import DESIGN_PARAMS, ExtensiveOptimizer
+from results_store import DEFAULT_STORE_PATH, ResultsStore, stored_results
+from surrogate_search import GaussianProcess, encode
+
+CATEGORICAL = ('memspec', 'addressmapping', 'mcconfig', 'addressDistribution')
+WORKLOAD_PARAMS = ('clkMhz', 'numRequests', 'rwRatio', 'addressDistribution')
+
+
+def store_samples(store, evaluator='dramsys'):
+    """(point, total time) of every successful single-generator evaluation in the store"""
+    rows = store.query("""
+        SELECT c.memspec, c.addressmapping, c.mcconfig, c.workload, e.total_time
+        FROM evaluations e JOIN configs c ON c.id = e.config_id
+        WHERE e.success AND e.total_time > 0 AND e.evaluator = ?
+    """, (evaluator,))
+    for r in rows:
+        setup = json.loads(r['workload'])
+        if len(setup) != 1 or setup[0].get('type') != 'generator':
+            continue
+        point = {'memspec': r['memspec'], 'addressmapping': r['addressmapping'], 'mcconfig': r['mcconfig']}
+        point.update({p: setup[0].get(p) for p in WORKLOAD_PARAMS})
+        yield point, r['total_time']
+
+
+def json_samples(paths):
+    """(point, total time) of every successful generator result in optimizer results files"""
+    for _, record, total_time in stored_results(paths):
+        if 'numRequests' in record:
+            yield record, total_time
+
+
+def collect(samples, space):
+    """unique points inside the space and the mean log total time of each"""
+    logs = defaultdict(list)
+    for point, total_time in samples:
+        key = tuple(point.get(p) for p in space)
+        # low-fidelity (halving) runs and other spaces fall outside the option lists
+        if all(value in options for value, options in zip(key, space.values())):
+            logs[key].append(math.log(total_time))
+    points = [dict(zip(space, key)) for key in logs]
+    return points, np.array([sum(v) / len(v) for v in logs.values()])
+
+
+def grid_prediction(space, points, y):
+    """surrogate prediction of log total time over the full grid, one axis per parameter"""
+    categorical = set(CATEGORICAL)
+    model = GaussianProcess(noise=1e-2).fit(encode(space, categorical, points), y)
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    mean, _ = model.predict(encode(space, categorical, grid))
+    return mean.reshape([len(options) for options in space.values()])
+
+
+def decompose(grid, names):
+    """
+    functional anova of a full grid: (total variance, {p: main variance},
+    {(p, q): interaction variance}, {p: marginal mean per value})
+    """
+    axes = range(grid.ndim)
+    mean = grid.mean()
+    total = grid.var()
+
+    def marginal(*keep):
+        return grid.mean(axis=tuple(a for a in axes if a not in keep)) - mean
+
+    mains = {a: marginal(a) for a in axes}
+    main_var = {names[a]: float((mains[a] ** 2).mean()) for a in axes}
+    pair_var = {}
+    for a, b in itertools.combinations(axes, 2):
+        effect = marginal(a, b) - mains[a][:, None] - mains[b][None, :]
+        pair_var[(names[a], names[b])] = float((effect ** 2).mean())
+    marginals = {names[a]: mains[a] + mean for a in axes}
+    return float(total), main_var, pair_var, marginals
+
+
+def importance(space, points, y, threshold=0.05):
+    """
+    importance report of the samples; freeze holds the design parameters under
+    threshold, insensitive_workload the workload parameters under it
+    """
+    names = list(space)
+    grid = grid_prediction(space, points, y)
+    total, main_var, pair_var, marginals = decompose(grid, names)
+    scale = total or 1.0
+
+    main = {p: v / scale for p, v in main_var.items()}
+    pairs = {pq: v / scale for pq, v in pair_var.items()}
+    total_effect = {p: main[p] + sum(v for pq, v in pairs.items() if p in pq) for p in names}
+    best_value = {p: space[p][int(np.argmin(marginals[p]))] for p in names}
+    below = [p for p in names if total_effect[p] < threshold and len(space[p]) > 1]
+    freeze = {p: best_value[p] for p in below if p in DESIGN_PARAMS}
+
+    return {
+        'samples': len(points),
+        'grid': int(grid.size),
+        'coverage': len(points) / grid.size,
+        'main': main,
+        'total_effect': total_effect,
+        'pairs': {f"{p}*{q}": v for (p, q), v in pairs.items()},
+        'higher_order': max(0.0, 1.0 - sum(main.values()) - sum(pairs.values())),
+        'best_value': best_value,
+        # the range of the predicted marginal means, as a slowdown factor
+        'spread': {p: float(math.exp(marginals[p].max() - marginals[p].min())) for p in names},
+        'threshold': threshold,
+        'freeze': freeze,
+        'insensitive_workload': [p for p in below if p not in DESIGN_PARAMS],
+        'space_size': math.prod(len(o) for o in space.values()),
+        'frozen_space_size': math.prod(1 if p in freeze else len(o) for p, o in space.items()),
+    }
+
+
+def _value(value):
+    return os.path.splitext(os.path.basename(value))[0] if isinstance(value, str) else value
+
+
+def print_report(report, top_pairs=8):
+    print(f"{report['samples']} unique configurations, {report['coverage']:.1%} of the "
+          f"{report['grid']:,}-point grid")
+    print(f"\n{'parameter':<22} {'main':>7} {'total':>7} {'spread':>7}  best value")
+    for p in sorted(report['main'], key=lambda p: -report['total_effect'][p]):
+        mark = "  (freeze)" if p in report['freeze'] else ""
+        print(f"{p:<22} {report['main'][p]:>7.1%} {report['total_effect'][p]:>7.1%} "
+              f"{report['spread'][p]:>6.2f}x  {_value(report['best_value'][p])}{mark}")
+
+    print(f"\n{'interaction':<44} {'share':>7}")
+    for pq, v in sorted(report['pairs'].items(), key=lambda item: -item[1])[:top_pairs]:
+        print(f"{pq:<44} {v:>7.1%}")
+    print(f"{'third order and up':<44} {report['higher_order']:>7.1%}")
+
+    print(f"\nfreezing below {report['threshold']:.0%} total effect: "
+          f"{', '.join(report['freeze']) or 'nothing'}")
+    if report['insensitive_workload']:
+        print(f"workload parameters below it (not frozen): {', '.join(report['insensitive_workload'])}")
+    print(f"search space: {report['space_size']:,} -> {report['frozen_space_size']:,} configurations")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="per-parameter and pairwise importance of the search space")
+    parser.add_argument("--json", nargs="+", default=None, metavar="FILE",
+                        help="read optimizer results files instead of the results store")
+    parser.add_argument("--db", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--evaluator", choices=["dramsys", "model"], default="dramsys",
+                        help="which evaluations of the store to analyse")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="freeze parameters whose main plus interaction share is below this")
+    parser.add_argument("--output", default=os.path.expanduser("~/hackathon-project/results/param_importance.json"))
+    args = parser.parse_args()
+
+    space = ExtensiveOptimizer(verbose=False).search_space()
+    samples = json_samples(args.json) if args.json else store_samples(ResultsStore(args.db), args.evaluator)
+    points, y = collect(samples, space)
+    if len(points) < 2:
+        raise SystemExit(f"only {len(points)} usable evaluations; run extensive_optimizer.py first")
+
+    report = importance(space, points, y, args.threshold)
+    print_report(report)
+
+    with open(args.output, 'w') as f:
+        json.dump({'timestamp': datetime.now().isoformat(), **report}, f, indent=2)
+    print(f"\nsaved report to: {args.output}")
+    print(f"next run: python3 extensive_optimizer.py --freeze {args.output}")
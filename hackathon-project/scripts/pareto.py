@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+nsga-ii building blocks for multi-objective search
+objectives are tuples to minimize, e.g. (total_time, -bandwidth)
+"""
+
+import math
+
+
+def time_bandwidth(individual):
+    """minimize total time, maximize bandwidth"""
+    return (individual['fitness'], -individual['bandwidth'])
+
+
+def dominates(a, b):
+    return all(x <= y for x, y in zip(a, b)) and any(x < y for x, y in zip(a, b))
+
+
+def non_dominated_sort(objectives):
+    """fast non-dominated sort; returns fronts as lists of indices, best first"""
+    n = len(objectives)
+    dominated_by = [[] for _ in range(n)]
+    domination_count = [0] * n
+    fronts = [[]]
+
+    for p in range(n):
+        for q in range(n):
+            if dominates(objectives[p], objectives[q]):
+                dominated_by[p].append(q)
+            elif dominates(objectives[q], objectives[p]):
+                domination_count[p] += 1
+        if domination_count[p] == 0:
+            fronts[0].append(p)
+
+    while fronts[-1]:
+        next_front = []
+        for p in fronts[-1]:
+            for q in dominated_by[p]:
+                domination_count[q] -= 1
+                if domination_count[q] == 0:
+                    next_front.append(q)
+        fronts.append(next_front)
+
+    return fronts[:-1]
+
+
+def crowding_distance(objectives, front):
+    """crowding distance of each index in front; boundary points are infinite"""
+    distance = {i: 0.0 for i in front}
+    if len(front) <= 2:
+        return {i: math.inf for i in front}
+
+    for m in range(len(objectives[front[0]])):
+        ordered = sorted(front, key=lambda i: objectives[i][m])
+        lo, hi = objectives[ordered[0]][m], objectives[ordered[-1]][m]
+        distance[ordered[0]] = distance[ordered[-1]] = math.inf
+        if hi == lo or not math.isfinite(hi - lo):
+            continue
+        for k in range(1, len(ordered) - 1):
+            distance[ordered[k]] += (objectives[ordered[k + 1]][m] - objectives[ordered[k - 1]][m]) / (hi - lo)
+
+    return distance
+
+
+def rank_population(objectives):
+    """(rank, crowding) for every index; lower rank and larger crowding are better"""
+    rank, crowding = {}, {}
+    for r, front in enumerate(non_dominated_sort(objectives)):
+        crowding.update(crowding_distance(objectives, front))
+        rank.update({i: r for i in front})
+    return rank, crowding
+
+
+def select_survivors(objectives, n):
+    """nsga-ii environmental selection: whole fronts first, then by crowding distance"""
+    survivors = []
+    for front in non_dominated_sort(objectives):
+        if len(survivors) + len(front) <= n:
+            survivors.extend(front)
+            continue
+        crowding = crowding_distance(objectives, front)
+        survivors.extend(sorted(front, key=lambda i: -crowding[i])[:n - len(survivors)])
+        break
+    return survivors
+
+
+class ParetoArchive:
+    """non-dominated set of every successful evaluation seen across generations"""
+
+    def __init__(self, objective=time_bandwidth):
+        self.objective = objective
+        self.members = []
+
+    def add(self, individual):
+        point = self.objective(individual)
+        if not all(math.isfinite(v) for v in point):
+            return False
+        for member in self.members:
+            other = self.objective(member)
+            if dominates(other, point) or other == point:
+                return False
+        self.members = [m for m in self.members if not dominates(point, self.objective(m))]
+        self.members.append(dict(individual))
+        return True
+
+    def front(self):
+        return sorted(self.members, key=self.objective)
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+simpoint-style phase sampling
+a trace is split into fixed-size intervals and each interval is described by
+a feature vector: a histogram over address regions, the read/write mix, a
+stride signature (log2 buckets of address deltas) and its issue rate.
+k-means groups intervals into phases and the interval closest to each
+centroid represents its phase, weighted by the phase's share of the ops.
+simulating only the representatives and reweighting their results
+estimates the full-trace total time and bandwidth.
+
+usage:
+  phase_sampling.py sample TRACE [--interval N] [--max-k K]   write representatives + manifest
+  phase_sampling.py estimate MANIFEST RESULTS.json               reweight per-simpoint results
+  phase_sampling.py validate MANIFEST [--config SIM.json]        full run vs sampled runs
+"""
+
+import os
+import sys
+import json
+import glob
+import math
+import time
+import argparse
+
+import numpy as np
+
+from trace_format import format_stl, load_trace
+
+DEFAULT_CONFIG_DIR = os.path.expanduser("~/DRAMSys/configs")
+
+# address regions are aligned 16mb blocks; the busiest 32 get their own
+# histogram bin and the rest share one
+REGION_BITS = 24
+ADDRESS_REGIONS = 32
+# simpoint clusters random projections of its vectors to 15 dimensions:
+# with few intervals, k-means in the full space overfits and bic never levels off
+PROJECTED_DIMS = 15
+# stride buckets: 0, then +/- log2(|delta|) for 1 .. 2^40
+STRIDE_BUCKETS = 41
+
+
+def _bucket_strides(deltas):
+    magnitude = np.minimum(np.log2(np.maximum(np.abs(deltas), 1)).astype(np.int64) + 1, STRIDE_BUCKETS - 1)
+    magnitude[deltas == 0] = 0
+    return np.where(deltas < 0, STRIDE_BUCKETS + magnitude, magnitude)
+
+
+def interval_features(timestamps, is_write, addresses, interval):
+    """
+    (features, starts): one row per interval of `interval` ops. every block
+    (regions, mix, strides, rate) is scaled to the same total weight so none
+    dominates the distances.
+    """
+    n = len(addresses)
+    num_intervals = -(-n // interval)
+    owner = np.arange(n) // interval
+    counts = np.bincount(owner, minlength=num_intervals).astype(float)
+
+    def histogram(bins, size):
+        h = np.bincount(owner * size + bins, minlength=num_intervals * size).reshape(num_intervals, size)
+        return h / counts[:, None]
+
+    blocks, block_of = np.unique(np.asarray(addresses, dtype=np.uint64) >> np.uint64(REGION_BITS),
+                                 return_inverse=True)
+    busiest = np.argsort(-np.bincount(block_of), kind='stable')
+    region_of = np.full(len(blocks), ADDRESS_REGIONS)
+    region_of[busiest[:ADDRESS_REGIONS]] = np.arange(min(ADDRESS_REGIONS, len(blocks)))
+    regions = histogram(region_of[block_of], ADDRESS_REGIONS + 1)
+
+    write_share = np.bincount(owner, weights=np.asarray(is_write, dtype=float), minlength=num_intervals) / counts
+    mix = np.stack([write_share, 1 - write_share], axis=1)
+
+    deltas = np.diff(np.asarray(addresses, dtype=np.int64), prepend=np.int64(addresses[0]) if n else 0)
+    strides = histogram(_bucket_strides(deltas), 2 * STRIDE_BUCKETS)
+
+    stamps = np.asarray(timestamps, dtype=np.float64)
+    span = np.maximum.reduceat(stamps, np.arange(0, n, interval)) - stamps[::interval]
+    rate = span / counts
+    rate = (rate / (rate.mean() or 1.0))[:, None]
+
+    parts = [regions, mix, strides, rate / max(1.0, np.abs(rate).max())]
+    features = np.hstack([b / math.sqrt(b.shape[1]) for b in parts])
+    return features, np.arange(0, n, interval)
+
+
+def kmeans(x, k, rng, iterations=100):
+    """(labels, centroids, sse) of k-means with k-means++ seeding"""
+    centroids = [x[rng.integers(len(x))]]
+    for _ in range(1, k):
+        dist = ((x[:, None, :] - np.array(centroids)[None]) ** 2).sum(-1).min(1)
+        total = dist.sum()
+        centroids.append(x[rng.choice(len(x), p=dist / total)] if total > 0 else x[rng.integers(len(x))])
+    centroids = np.array(centroids)
+
+    for _ in range(iterations):
+        labels = ((x[:, None, :] - centroids[None]) ** 2).sum(-1).argmin(1)
+        moved = np.array([x[labels == c].mean(0) if (labels == c).any() else centroids[c] for c in range(k)])
+        if np.allclose(moved, centroids):
+            break
+        centroids = moved
+
+    labels = ((x[:, None, :] - centroids[None]) ** 2).sum(-1).argmin(1)
+    sse = float(((x - centroids[labels]) ** 2).sum())
+    return labels, centroids, sse
+
+
+def bic(x, labels, k, sse, min_variance=1e-12):
+    """bayesian information criterion of a spherical-gaussian k-means fit (x-means)"""
+    n, d = x.shape
+    if n <= k:
+        return -math.inf
+    variance = max(sse / ((n - k) * d), min_variance)
+    score = 0.0
+    for c in range(k):
+        size = int((labels == c).sum())
+        if size:
+            score += (size * math.log(size) - size * math.log(n)
+                      - size * d / 2 * math.log(2 * math.pi * variance) - (size - 1) * d / 2)
+    return score - 0.5 * k * (d + 1) * math.log(n)
+
+
+def cluster(x, max_k=10, seed=1, threshold=0.9):
+    """
+    k-means for k = 1..max_k, keeping the smallest k whose bic reaches
+    threshold of the spread between the worst and best score (simpoint rule).
+    returns (k, labels)
+    """
+    rng = np.random.default_rng(seed)
+    if x.shape[1] > PROJECTED_DIMS:
+        x = x @ rng.uniform(-1, 1, (x.shape[1], PROJECTED_DIMS))
+    # spread below 1% of the whole trace's is noise; without a floor, repeated
+    # identical phases drive the variance to 0 and bic grows with every split
+    floor = 0.01 * x.var(0).mean()
+    fits = []
+    for k in range(1, min(max_k, len(x)) + 1):
+        labels, _, sse = kmeans(x, k, rng)
+        fits.append((k, labels, bic(x, labels, k, sse, floor)))
+
+    scores = [score for *_, score in fits]
+    lo, hi = min(scores), max(scores)
+    for k, labels, score in fits:
+        if hi == lo or score >= lo + threshold * (hi - lo):
+            return k, labels
+    return fits[-1][:2]
+
+
+def write_interval(path, timestamps, is_write, addresses):
+    """an interval as a standalone .stl trace, rebased to start at time 0"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(format_stl(np.asarray(timestamps) - timestamps[0], is_write, addresses))
+    os.replace(tmp, path)
+
+
+def sample(trace_file, config_dir=DEFAULT_CONFIG_DIR, interval=10000, max_k=10, seed=1):
+    """
+    pick representative intervals of a trace (relative to config_dir) and
+    write them next to it; returns the manifest, also saved as
+    <stem>.simpoints.json
+    """
+    src = os.path.join(config_dir, trace_file)
+    timestamps, is_write, addresses = load_trace(src)
+    n = len(addresses)
+    if n == 0:
+        raise ValueError(f"empty trace: {src}")
+    interval = min(interval, n)
+
+    features, starts = interval_features(timestamps, is_write, addresses, interval)
+    k, labels = cluster(features, max_k, seed)
+
+    stem = os.path.splitext(trace_file)[0]
+    for stale in glob.glob(os.path.join(config_dir, glob.escape(stem) + ".sp*.stl")):
+        os.remove(stale)
+
+    points = []
+    for c in range(k):
+        members = np.flatnonzero(labels == c)
+        if len(members) == 0:
+            continue
+        centroid = features[members].mean(0)
+        rep = int(members[((features[members] - centroid) ** 2).sum(1).argmin()])
+        start, end = int(starts[rep]), int(min(starts[rep] + interval, n))
+        cluster_ops = int(sum(min(s + interval, n) - s for s in starts[members]))
+
+        name = f"{stem}.sp{len(points)}.stl"
+        write_interval(os.path.join(config_dir, name), timestamps[start:end], is_write[start:end],
+                       addresses[start:end])
+        points.append({
+            'trace': name,
+            'interval': rep,
+            'start_op': start,
+            'ops': end - start,
+            'phase_intervals': len(members),
+            'weight': cluster_ops / n,
+            # representative ops stand for this many ops of the full trace
+            'scale': cluster_ops / (end - start),
+        })
+
+    manifest = {
+        'source': trace_file,
+        'config_dir': config_dir,
+        'total_ops': n,
+        'interval': interval,
+        'intervals': len(starts),
+        'phases': len(points),
+        'sampled_ops': sum(p['ops'] for p in points),
+        'labels': labels.tolist(),
+        'simpoints': points,
+    }
+    manifest['cost_fraction'] = manifest['sampled_ops'] / n
+
+    manifest_file = os.path.join(config_dir, f"{stem}.simpoints.json")
+    with open(manifest_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    manifest['file'] = manifest_file
+    return manifest
+
+
+def load_manifest(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def estimate(manifest, results):
+    """
+    full-trace (total_time, bandwidth) from per-simpoint results, each a dict
+    with total_time and bandwidth: times scale by the ops each simpoint
+    represents and bandwidth is averaged over the scaled time
+    """
+    scaled = [r['total_time'] * p['scale'] for p, r in zip(manifest['simpoints'], results)]
+    total_time = sum(scaled)
+    bandwidth = (sum(r['bandwidth'] * t for r, t in zip(results, scaled)) / total_time) if total_time else 0
+    return total_time, bandwidth
+
+
+def evaluate_sampled(manifest, simulate):
+    """
+    run simulate(trace_name, index) -> run_dramsys-style result for every
+    simpoint and combine them; fails if any simpoint fails
+    """
+    results = []
+    for i, point in enumerate(manifest['simpoints']):
+        result = simulate(point['trace'], i)
+        if not result.get('success') or not result.get('total_time'):
+            return {'total_time': None, 'bandwidth': None, 'success': False}
+        results.append(result)
+
+    total_time, bandwidth = estimate(manifest, results)
+    return {'total_time': int(total_time), 'bandwidth': bandwidth, 'success': True}
+
+
+def print_manifest(manifest):
+    print(f"trace: {manifest['source']}")
+    print(f"ops: {manifest['total_ops']}  interval: {manifest['interval']}  intervals: {manifest['intervals']}")
+    print(f"phases: {manifest['phases']}  sampled ops: {manifest['sampled_ops']} "
+          f"({manifest['cost_fraction']:.1%} of a full replay)")
+    print(f"{'simpoint':<40} {'interval':>9} {'weight':>8} {'scale':>8}")
+    for p in manifest['simpoints']:
+        print(f"{p['trace']:<40} {p['interval']:>9} {p['weight']:>8.3f} {p['scale']:>8.1f}")
+
+
+def validate(manifest, config_file, dramsys_path="~/DRAMSys", timeout=600):
+    """run the full trace and every simpoint under one config and report the estimate error"""
+    from dramsys_runner import run_dramsys
+
+    dramsys_path = os.path.expanduser(dramsys_path)
+    with open(config_file) as f:
+        base = json.load(f)
+
+    def simulate(trace, tag):
+        config = json.loads(json.dumps(base))
+        config['simulation']['simulationid'] = f"simpoint_validate_{tag}"
+        config['simulation']['tracesetup'][0]['name'] = trace
+        start = time.perf_counter()
+        result = run_dramsys(dramsys_path, config, f"simpoint_validate_{tag}.json", timeout=timeout)
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    full = simulate(manifest['source'], "full")
+    if not full['success']:
+        print("full-trace simulation failed")
+        return None
+
+    runs = [simulate(p['trace'], f"sp{i}") for i, p in enumerate(manifest['simpoints'])]
+    if not all(r['success'] for r in runs):
+        print("a simpoint simulation failed")
+        return None
+
+    total_time, bandwidth = estimate(manifest, runs)
+    report = {
+        'full_total_time': full['total_time'],
+        'estimated_total_time': total_time,
+        'total_time_error': (total_time - full['total_time']) / full['total_time'],
+        'full_bandwidth': full['bandwidth'],
+        'estimated_bandwidth': bandwidth,
+        'bandwidth_error': (bandwidth - full['bandwidth']) / full['bandwidth'] if full['bandwidth'] else None,
+        'cost_fraction_ops': manifest['cost_fraction'],
+        'cost_fraction_wall': sum(r['seconds'] for r in runs) / full['seconds'],
+    }
+
+    print(f"total time: full {full['total_time']:,} ps, estimated {total_time:,.0f} ps "
+          f"({report['total_time_error']:+.2%})")
+    if report['bandwidth_error'] is not None:
+        print(f"avg bw: full {full['bandwidth']:.2f} gb/s, estimated {bandwidth:.2f} gb/s "
+              f"({report['bandwidth_error']:+.2%})")
+    print(f"cost: {report['cost_fraction_ops']:.1%} of the ops, "
+          f"{report['cost_fraction_wall']:.1%} of the full-run wall time")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="simpoint-style phase sampling of dramsys traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("sample", help="pick and write representative intervals")
+    p.add_argument("trace", help="trace path relative to --config-dir (.stl or binary)")
+    p.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR)
+    p.add_argument("--interval", type=int, default=10000, help="ops per interval")
+    p.add_argument("--max-k", type=int, default=10, help="most phases to consider")
+    p.add_argument("--seed", type=int, default=1)
+
+    p = sub.add_parser("estimate", help="reweight per-simpoint results into a full-trace estimate")
+    p.add_argument("manifest")
+    p.add_argument("results", help="json list of {total_time, bandwidth}, one per simpoint")
+
+    p = sub.add_parser("validate", help="compare the estimate with a full-trace simulation")
+    p.add_argument("manifest")
+    p.add_argument("--config", default=os.path.join(DEFAULT_CONFIG_DIR, "ai-baseline-ddr4.json"),
+                   help="dramsys simulation json whose player trace is replaced")
+    p.add_argument("--output", default=None, help="also save the report as json")
+
+    args = parser.parse_args()
+
+    if args.command == "sample":
+        manifest = sample(args.trace, args.config_dir, args.interval, args.max_k, args.seed)
+        print_manifest(manifest)
+        print(f"manifest: {manifest['file']}")
+    elif args.command == "estimate":
+        manifest = load_manifest(args.manifest)
+        with open(args.results) as f:
+            results = json.load(f)
+        if len(results) != len(manifest['simpoints']):
+            sys.exit(f"expected {len(manifest['simpoints'])} results, got {len(results)}")
+        total_time, bandwidth = estimate(manifest, results)
+        print(f"estimated total time: {total_time:,.0f} ps")
+        print(f"estimated avg bw: {bandwidth:.2f} gb/s")
+    else:
+        report = validate(load_manifest(args.manifest), args.config)
+        if report and args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+per-phase timing of the optimizer harness
+wall and thread cpu time of every phase of every evaluation (workspace
+setup, config write, process spawn, startup, simulation, output parsing,
+cleanup, cache and store bookkeeping) and of every ga generation. the
+optimizers enable it with --profile; finish() prints a summary table and
+writes a chrome trace (chrome://tracing or ui.perfetto.dev) with one row
+per worker thread.
+
+disabled, every hook is one global lookup: span() returns a shared null
+context and iterate() the iterable itself, so the harness runs as before.
+
+  startup     spawn until the first line dramsys prints (loading configs)
+  simulate    spawn until dramsys exits, startup included
+  population  one batch of evaluations; a generation's self time (the
+              generation minus its batch) is the ga bookkeeping
+"""
+
+import os
+import json
+import time
+import resource
+import threading
+import functools
+import contextlib
+import inspect
+
+_NULL_SPAN = contextlib.nullcontext()
+
+# the Profiler collecting spans; None while profiling is disabled
+_active = None
+
+
+class Profiler:
+    def __init__(self):
+        self.events = []
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.children_started = self._children_cpu()
+
+    @staticmethod
+    def _children_cpu():
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    def add(self, name, start, wall, cpu, args=None):
+        # list.append is atomic, so worker threads need no lock
+        self.events.append((name, start, wall, cpu, threading.get_ident(), args))
+
+    def child_wall(self):
+        """wall time of the spans nested directly inside each span of the same thread"""
+        nested = [0.0] * len(self.events)
+        threads = {}
+        for i, event in enumerate(self.events):
+            threads.setdefault(event[4], []).append(i)
+        for indices in threads.values():
+            # outer spans first when two start together
+            indices.sort(key=lambda i: (self.events[i][1], -self.events[i][2]))
+            stack = []
+            for i in indices:
+                start, wall = self.events[i][1:3]
+                while stack and stack[-1][0] <= start:
+                    stack.pop()
+                if stack:
+                    nested[stack[-1][1]] += wall
+                stack.append((start + wall, i))
+        return nested
+
+    def summary(self):
+        """phase -> {count, wall, self, cpu, mean, max}, in order of first appearance"""
+        phases = {}
+        for (name, _, wall, cpu, _, _), nested in zip(self.events, self.child_wall()):
+            p = phases.setdefault(name, {'count': 0, 'wall': 0.0, 'self': 0.0, 'cpu': 0.0, 'max': 0.0})
+            p['count'] += 1
+            p['wall'] += wall
+            p['self'] += max(0.0, wall - nested)
+            p['cpu'] += cpu or 0.0
+            p['max'] = max(p['max'], wall)
+        for p in phases.values():
+            p['mean'] = p['wall'] / p['count']
+        return phases
+
+    def print_summary(self):
+        elapsed = time.perf_counter() - self.started
+        threads = len({event[4] for event in self.events}) or 1
+        print(f"\n{'phase':<14} {'count':>6} {'wall s':>9} {'self s':>9} {'mean ms':>9} {'max ms':>9} "
+              f"{'cpu s':>8} {'share':>6}")
+        for name, p in self.summary().items():
+            # self time is the phase minus the phases nested in it; its share is
+            # of the time all threads were available
+            print(f"{name:<14} {p['count']:>6} {p['wall']:>9.3f} {p['self']:>9.3f} {p['mean'] * 1e3:>9.2f} "
+                  f"{p['max'] * 1e3:>9.2f} {p['cpu']:>8.3f} {p['self'] / (elapsed * threads):>6.1%}")
+        print(f"run: {elapsed:.3f} s wall on {threads} thread(s), harness cpu "
+              f"{time.process_time() - self.cpu_started:.3f} s, dramsys cpu "
+              f"{self._children_cpu() - self.children_started:.3f} s")
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        tids = {}
+        events = []
+        for name, start, wall, cpu, thread, args in self.events:
+            tid = tids.setdefault(thread, len(tids))
+            event = {'name': name, 'cat': 'harness', 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': round((start - self.started) * 1e6, 1), 'dur': round(wall * 1e6, 1),
+                     'args': dict(args or {})}
+            if cpu is not None:
+                event['args']['cpu_ms'] = round(cpu * 1e3, 3)
+            events.append(event)
+        for thread, tid in tids.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': 'main' if thread == threading.main_thread().ident else f"worker {tid}"}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'args', 'start', 'cpu')
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.cpu = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start
+        self.profiler.add(self.name, self.start, wall, time.thread_time() - self.cpu, self.args)
+        return False
+
+
+def enable():
+    global _active
+    _active = Profiler()
+    return _active
+
+
+def span(name, **args):
+    """context manager timing one phase"""
+    if _active is None:
+        return _NULL_SPAN
+    return _Span(_active, name, args)
+
+
+def now():
+    """start time for interval(), or None while disabled"""
+    return time.perf_counter() if _active is not None else None
+
+
+def interval(name, start, **args):
+    """record a phase from a now() time until now, without cpu time"""
+    if _active is not None and start is not None:
+        _active.add(name, start, time.perf_counter() - start, None, args)
+
+
+def timed(name, label=None):
+    """decorator timing every call as a span; label names an argument shown in the trace"""
+    def decorate(function):
+        position = list(inspect.signature(function).parameters).index(label) if label else None
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return function(*args, **kwargs)
+            value = kwargs.get(label, args[position] if position is not None and position < len(args) else None)
+            with _Span(_active, name, {label: str(value)} if label else None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def iterate(name, iterable):
+    """the items of iterable, each loop body timed as one span (e.g. a ga generation)"""
+    if _active is None:
+        return iterable
+    return _iterate(_active, name, iterable)
+
+
+def _iterate(profiler, name, iterable):
+    for item in iterable:
+        # closing the generator on break still records the last body
+        with _Span(profiler, name, {name: item}):
+            yield item
+
+
+def finish(trace_file):
+    """print the summary and write the chrome trace; no-op while disabled"""
+    if _active is None:
+        return
+    _active.print_summary()
+    _active.write_chrome_trace(trace_file)
+    print(f"chrome trace saved to: {trace_file}")
+
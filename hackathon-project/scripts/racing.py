@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+statistical racing for noisy fitness
+generator traffic is random, so a single run can rank a candidate by luck.
+the racer re-runs only candidates whose confidence interval leaves it unclear
+whether they belong in the top k, using a different generator seed for each
+run, and drops candidates as soon as they are statistically out of the race.
+"""
+
+import math
+
+from dramsys_runner import evaluate_population
+
+# two-sided 95% student t critical values by degrees of freedom
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+        8: 2.306, 9: 2.262, 10: 2.228, 15: 2.131, 20: 2.086, 30: 2.042}
+
+
+def t_critical(df):
+    for d in sorted(T_95):
+        if df <= d:
+            return T_95[d]
+    return 1.96
+
+
+class Racer:
+    def __init__(self, evaluate, key, workers=1, top_k=1, max_runs=8, driver=None):
+        """
+        evaluate(individual, sim_id) -> success; it must honour individual['seed'].
+        key(individual) -> hashable genotype, so samples carry across generations.
+        driver: the run's SearchDriver; every repeat is charged to its budget.
+        """
+        self.evaluate = evaluate
+        self.key = key
+        self.workers = workers
+        self.top_k = top_k
+        self.max_runs = max_runs
+        self.samples = {}
+        self.extra_runs = 0
+        self.driver = driver
+
+    def state(self):
+        return {'samples': [[list(k), v] for k, v in self.samples.items()], 'extra_runs': self.extra_runs}
+
+    def load_state(self, state):
+        self.samples = {tuple(k): v for k, v in state['samples']}
+        self.extra_runs = state['extra_runs']
+
+    def pooled_cv(self):
+        """pooled coefficient of variation over every candidate with repeats"""
+        cvs = []
+        for values in self.samples.values():
+            if len(values) >= 2:
+                mean = sum(values) / len(values)
+                sd = math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+                cvs.append(sd / mean if mean else 0.0)
+        return sum(cvs) / len(cvs) if cvs else None
+
+    def interval(self, key, pooled):
+        """(mean, half width of the 95% confidence interval)"""
+        values = self.samples[key]
+        n = len(values)
+        mean = sum(values) / n
+        if n >= 3:
+            sd = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+            return mean, t_critical(n - 1) * sd / math.sqrt(n)
+        if pooled is None:
+            return mean, math.inf
+        return mean, 1.96 * pooled * mean / math.sqrt(n)
+
+    def contested(self, keys):
+        """split keys into (contested, dominated) for the top-k race"""
+        pooled = self.pooled_cv()
+        if pooled is None:
+            # no noise estimate yet: repeat the candidates around the boundary
+            ranked = sorted(keys, key=lambda k: sum(self.samples[k]) / len(self.samples[k]))
+            return ranked[:self.top_k + 1], []
+
+        bounds = {k: self.interval(k, pooled) for k in keys}
+        uppers = sorted(m + h for m, h in bounds.values())
+        lowers = sorted(m - h for m, h in bounds.values())
+        upper_k = uppers[min(self.top_k, len(uppers)) - 1]
+        lower_next = lowers[self.top_k] if len(lowers) > self.top_k else math.inf
+
+        dominated = [k for k, (m, h) in bounds.items() if m - h > upper_k]
+        contested = [k for k, (m, h) in bounds.items()
+                     if m - h <= upper_k and m + h >= lower_next]
+        return contested, dominated
+
+    def race(self, candidates, tag):
+        """
+        race successful candidates for the top k; each gets 'fitness' set to
+        its mean, plus 'fitness_ci', 'runs' and 'samples'
+        """
+        by_key = {}
+        for ind in candidates:
+            key = self.key(ind)
+            self.samples.setdefault(key, [ind['fitness']])
+            by_key.setdefault(key, []).append(ind)
+
+        active = list(by_key)
+        while len(active) > self.top_k:
+            contested, dominated = self.contested(active)
+            active = [k for k in active if k not in dominated]
+            rerun = [k for k in contested if len(self.samples[k]) < self.max_runs]
+            if self.driver is not None and self.driver.remaining() is not None:
+                rerun = rerun[:self.driver.remaining()]
+            if not rerun:
+                break
+
+            jobs = []
+            for j, key in enumerate(rerun):
+                seed = len(self.samples[key])
+                ind = by_key[key][0]
+                jobs.append(({**ind, 'seed': seed, 'fitness': None}, f"{tag}r{j}s{seed}"))
+
+            for run, _, success in evaluate_population(jobs, self.evaluate, self.workers):
+                self.extra_runs += 1
+                if self.driver is not None:
+                    self.driver.charge()
+                if success and not run.get('pruned'):
+                    self.samples[self.key(run)].append(run['fitness'])
+                else:
+                    # a failed repeat cannot be raced further
+                    active = [k for k in active if k != self.key(run)]
+
+        pooled = self.pooled_cv()
+        for key, inds in by_key.items():
+            mean, half = self.interval(key, pooled)
+            for ind in inds:
+                ind['fitness'] = mean
+                ind['fitness_ci'] = half
+                ind['runs'] = len(self.samples[key])
+                ind['samples'] = list(self.samples[key])
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+performance regression benchmark
+runs a pinned matrix of configurations (test_multiple_configs.py's four plus
+the ga winner) against a fixed set of traces and compares every result with
+a stored baseline. meant to be run after upgrading dramsys or regenerating
+traces; exits non-zero when something looks wrong:
+
+  regression     total time slower or bandwidth lower than the baseline
+                 by more than the tolerance, or a run that used to succeed fails
+  suspicious tie two entries that differ in memspec, address mapping or
+                 controller give exactly the same total time (the fifo vs
+                 fr-fcfs 1.00x of final_comparison.sh)
+  nondeterminism two entries with the same configuration disagree
+
+the fitness cache is never used: its key covers the dramsys binary but not the
+libraries it loads, and a replayed hit would hide nondeterminism. the first run (or --update-baseline) stores the baseline; the sha256 of every
+trace is kept with it, so a changed trace is reported next to the numbers.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import subprocess
+from datetime import datetime
+from itertools import combinations
+
+from dramsys_runner import evaluate_population, run_dramsys
+from dram_model import DRAMModel
+from results_store import ResultsStore
+from test_multiple_configs import TEST_CONFIGS
+
+# best_config_optimized.json of the reference ga run
+GA_WINNER = {
+    'name': 'ga_winner',
+    'memspec': 'memspec/JEDEC_4Gb_DDR4-2400_8bit_A.json',
+    'addressmapping': 'addressmapping/am_ddr4_8x4Gbx8_dimm_p1KB_brc.json',
+    'mcconfig': 'mcconfig/fr_fcfs.json'
+}
+MATRIX = TEST_CONFIGS + [GA_WINNER]
+DEFAULT_TRACES = ["traces/resnet50_synthetic.stl"]
+CONFIG_FIELDS = ('memspec', 'addressmapping', 'mcconfig')
+
+DEFAULT_BASELINE = os.path.expanduser("~/hackathon-project/results/regression_baseline.json")
+
+
+def trace_digest(path):
+    """sha256 of a trace file, or None when it is missing"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def bench_config(entry, trace_file):
+    return {
+        "simulation": {
+            "addressmapping": entry['addressmapping'],
+            "mcconfig": entry['mcconfig'],
+            "memspec": entry['memspec'],
+            "simconfig": "simconfig/example.json",
+            "simulationid": f"bench_{entry['name']}",
+            "tracesetup": [{
+                "type": "player",
+                "clkMhz": 1000,
+                "name": trace_file
+            }]
+        }
+    }
+
+
+def run_matrix(dramsys_path, matrix, traces, workers=1, model=None, recorder=None):
+    """key "name@trace" -> result record for every (entry, trace) pair"""
+    results = {}
+
+    def evaluate(job, key):
+        entry, trace_file = job
+        config = bench_config(entry, trace_file)
+        try:
+            if model:
+                result = model.run(config, recorder=recorder)
+            else:
+                result = run_dramsys(dramsys_path, config, f"bench_{entry['name']}.json", timeout=600,
+                                     recorder=recorder)
+        except (subprocess.TimeoutExpired, subprocess.SubprocessError, OSError) as e:
+            print(f"  {key}: {e}")
+            result = {'total_time': None, 'bandwidth': None, 'success': False}
+        results[key] = {
+            'name': entry['name'],
+            'trace': trace_file,
+            **{field: entry[field] for field in CONFIG_FIELDS},
+            'total_time': result['total_time'],
+            'bandwidth': result['bandwidth'],
+            'success': result['success'],
+        }
+        return result['success']
+
+    jobs = [((entry, trace), f"{entry['name']}@{trace}") for trace in traces for entry in matrix]
+    for _, key, success in evaluate_population(jobs, evaluate, workers):
+        r = results[key]
+        print(f"  {key}: " + (f"{r['total_time']:,} ps, {r['bandwidth']:.2f} gb/s" if success else "failed"))
+    return {key: results[key] for _, key in jobs}
+
+
+def find_ties(results):
+    """
+    (kind, a, b, detail) for every suspicious pair on the same trace: different
+    configurations with the same total time, or one configuration with two
+    different results
+    """
+    findings = []
+    done = [r for r in results.values() if r['success']]
+    for a, b in combinations(done, 2):
+        if a['trace'] != b['trace']:
+            continue
+        differing = [field for field in CONFIG_FIELDS if a[field] != b[field]]
+        same_result = a['total_time'] == b['total_time'] and a['bandwidth'] == b['bandwidth']
+        if differing and a['total_time'] == b['total_time']:
+            findings.append(('suspicious tie', a, b, f"differ in {', '.join(differing)}"))
+        elif not differing and not same_result:
+            findings.append(('nondeterminism', a, b, "same configuration"))
+    return findings
+
+
+def compare(results, baseline, time_tolerance, bandwidth_tolerance):
+    """(key, status, detail) per entry: ok, improved, regression, failed, failing, new or missing"""
+    rows = []
+    reference = baseline['results']
+    for key, r in results.items():
+        b = reference.get(key)
+        if b is None:
+            rows.append((key, 'new', "not in the baseline"))
+        elif not r['success']:
+            rows.append((key, 'failed', "used to succeed") if b['success'] else
+                        (key, 'failing', "failed in the baseline too"))
+        elif not b['success']:
+            rows.append((key, 'improved', "failed in the baseline"))
+        else:
+            time_change = r['total_time'] / b['total_time'] - 1
+            bandwidth_change = r['bandwidth'] / b['bandwidth'] - 1 if b['bandwidth'] else 0.0
+            detail = f"time {time_change:+.2%}, bw {bandwidth_change:+.2%}"
+            if time_change > time_tolerance or bandwidth_change < -bandwidth_tolerance:
+                rows.append((key, 'regression', detail))
+            elif time_change < -time_tolerance or bandwidth_change > bandwidth_tolerance:
+                rows.append((key, 'improved', detail))
+            else:
+                rows.append((key, 'ok', detail))
+    for key in reference:
+        if key not in results:
+            rows.append((key, 'missing', "in the baseline but not run"))
+    return rows
+
+
+def save(path, results, traces, evaluator):
+    with open(path, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'evaluator': evaluator,
+            'traces': traces,
+            'results': results,
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pinned-matrix performance regression benchmark")
+    parser.add_argument("--trace", nargs="+", default=DEFAULT_TRACES,
+                        help="traces relative to ~/DRAMSys/configs")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.02,
+                        help="relative total time increase counted as a regression")
+    parser.add_argument("--bw-tolerance", type=float, default=0.02,
+                        help="relative bandwidth drop counted as a regression")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of dramsys simulations to run concurrently")
+    parser.add_argument("--evaluator", choices=["dramsys", "model"], default="dramsys",
+                        help="benchmark dramsys or the analytical timing model of dram_model.py")
+    parser.add_argument("--no-store", action="store_true",
+                        help="do not append the evaluations to the results store (results_store.py)")
+    args = parser.parse_args()
+
+    dramsys_path = os.path.expanduser("~/DRAMSys")
+    results_dir = os.path.expanduser("~/hackathon-project/results")
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('evaluator', 'dramsys') != args.evaluator:
+            print(f"baseline {args.baseline} was measured with {baseline['evaluator']}, not {args.evaluator}")
+            sys.exit(2)
+
+    traces = {trace: trace_digest(os.path.join(dramsys_path, "configs", trace)) for trace in args.trace}
+
+    print("-" * 80)
+    print("regression benchmark")
+    print("-" * 80)
+    print(f"matrix: {', '.join(entry['name'] for entry in MATRIX)}")
+    for trace, digest in traces.items():
+        changed = baseline and baseline['traces'].get(trace) not in (None, digest)
+        print(f"trace: {trace} ({digest[:12] if digest else 'missing'}"
+              + (", changed since the baseline)" if changed else ")"))
+    print(f"baseline: {args.baseline}" + ("" if baseline else " (will be created)"))
+    print("-" * 80)
+
+    recorder = None if args.no_store else ResultsStore().start_run("regression_bench.py", vars(args))
+    model = DRAMModel(os.path.join(dramsys_path, 'configs')) if args.evaluator == "model" else None
+    results = run_matrix(dramsys_path, MATRIX, args.trace, args.workers, model, recorder)
+    if recorder:
+        recorder.finish()
+
+    save(f"{results_dir}/regression_latest.json", results, traces, args.evaluator)
+
+    problems = 0
+    if baseline:
+        rows = compare(results, baseline, args.time_tolerance, args.bw_tolerance)
+        print(f"\n{'entry':<56} {'status':<11} detail")
+        for key, status, detail in rows:
+            print(f"{key:<56} {status:<11} {detail}")
+        problems += sum(status in ('regression', 'failed') for _, status, _ in rows)
+    else:
+        problems += sum(not r['success'] for r in results.values())
+
+    findings = find_ties(results)
+    if findings:
+        print()
+        for kind, a, b, detail in findings:
+            print(f"{kind}: {a['name']} and {b['name']} on {a['trace']} "
+                  f"({a['total_time']:,} ps vs {b['total_time']:,} ps, {detail})")
+        problems += len(findings)
+
+    if not baseline:
+        save(args.baseline, results, traces, args.evaluator)
+        print(f"\nbaseline saved to: {args.baseline}")
+    if recorder:
+        print(recorder.summary())
+
+    print(f"\n{problems} problem(s)" if problems else "\nno regressions")
+    sys.exit(1 if problems else 0)
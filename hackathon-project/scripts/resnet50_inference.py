@@ -48,6 +48,8 @@ def run_inference(model, input_tensor, device='cpu', num_iterations=10):
     print(f"running {num_iterations} iterations...")
     times = []
 
+    # region-of-interest markers for lackey_to_stl.py --roi
+    print("DRAMSYS_ROI_BEGIN", flush=True)
     with torch.no_grad():
         for i in range(num_iterations):
             start = time.time()
@@ -57,6 +59,7 @@ def run_inference(model, input_tensor, device='cpu', num_iterations=10):
             end = time.time()
             times.append(end - start)
             print(f"  iteration {i+1}/{num_iterations}: {(end-start)*1000:.2f} ms")
+    print("DRAMSYS_ROI_END", flush=True)
 
     return times, output
 
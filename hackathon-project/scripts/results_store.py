@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+append-only results store shared by all optimizers
+every evaluation is written to sqlite as it finishes, so nothing is lost
+when a run dies and no run overwrites another. tables:
+
+  runs         one row per optimizer invocation (or imported json file)
+  configs      unique (memspec, addressmapping, mcconfig, workload)
+  evaluations  one row per simulation: run, config, seed, time, bandwidth
+  metrics      any other numeric result field, as (evaluation, name, value)
+
+the workload is the tracesetup without run-specific fields (generator
+names, seeds), so repeated runs of one configuration share a configs row.
+
+usage:
+  results_store.py import FILE.json ...             load existing optimizer results
+  results_store.py runs                             list runs
+  results_store.py best [-n N] [--per FIELD]        best N evaluations per memspec, ...
+  results_store.py history MEMSPEC [MAPPING] [MC]   every evaluation of matching configs
+  results_store.py compare RUN [RUN ...]            runs side by side
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+
+DEFAULT_STORE_PATH = os.path.expanduser("~/hackathon-project/results/results.db")
+
+# tracesetup fields that only label a run or vary between its repeats
+VOLATILE_INITIATOR_FIELDS = ('name', 'seed')
+GROUP_FIELDS = ('memspec', 'addressmapping', 'mcconfig', 'workload')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    script TEXT NOT NULL,
+    args TEXT,
+    source TEXT,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS configs (
+    id INTEGER PRIMARY KEY,
+    memspec TEXT NOT NULL,
+    addressmapping TEXT NOT NULL,
+    mcconfig TEXT NOT NULL,
+    workload TEXT NOT NULL,
+    UNIQUE (memspec, addressmapping, mcconfig, workload)
+);
+CREATE TABLE IF NOT EXISTS evaluations (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    config_id INTEGER NOT NULL REFERENCES configs(id),
+    label TEXT,
+    seed INTEGER,
+    evaluator TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    total_time INTEGER,
+    bandwidth REAL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    evaluation_id INTEGER NOT NULL REFERENCES evaluations(id),
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (evaluation_id, name)
+);
+CREATE INDEX IF NOT EXISTS evaluations_run ON evaluations(run_id);
+CREATE INDEX IF NOT EXISTS evaluations_config_time ON evaluations(config_id, total_time);
+CREATE INDEX IF NOT EXISTS evaluations_time ON evaluations(success, total_time);
+CREATE INDEX IF NOT EXISTS configs_memspec ON configs(memspec);
+CREATE INDEX IF NOT EXISTS configs_addressmapping ON configs(addressmapping);
+CREATE INDEX IF NOT EXISTS configs_mcconfig ON configs(mcconfig);
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics(name, value);
+"""
+
+
+def workload_of(config_dict):
+    """(workload json, seed) of a simulation json"""
+    setup = config_dict['simulation'].get('tracesetup', [])
+    seed = next((i['seed'] for i in setup if 'seed' in i), None)
+    workload = [{k: v for k, v in i.items() if k not in VOLATILE_INITIATOR_FIELDS or i.get('type') == 'player'}
+                for i in setup]
+    return json.dumps(workload, sort_keys=True), seed
+
+
+class ResultsStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._config_ids = {}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        # short-lived connections, as in fitness_cache.py: safe across threads
+        # and processes, sqlite serializes the writers
+        return sqlite3.connect(self.path, timeout=60)
+
+    def start_run(self, script, args=None, source=None, started=None):
+        """a RunRecorder that appends evaluations to a new run"""
+        with self._connect() as db:
+            run_id = db.execute("INSERT INTO runs (script, args, source, started) VALUES (?, ?, ?, ?)",
+                                (script, json.dumps(args, default=str) if args else None, source,
+                                 started or time.time())).lastrowid
+        return RunRecorder(self, run_id)
+
+    def _config_id(self, db, memspec, addressmapping, mcconfig, workload):
+        key = (memspec, addressmapping, mcconfig, workload)
+        with self._lock:
+            if key in self._config_ids:
+                return self._config_ids[key]
+        db.execute("INSERT OR IGNORE INTO configs (memspec, addressmapping, mcconfig, workload) "
+                   "VALUES (?, ?, ?, ?)", key)
+        config_id = db.execute("SELECT id FROM configs WHERE memspec = ? AND addressmapping = ? "
+                               "AND mcconfig = ? AND workload = ?", key).fetchone()[0]
+        with self._lock:
+            self._config_ids[key] = config_id
+        return config_id
+
+    def add(self, run_id, config_dict, result, evaluator='dramsys', created=None):
+        """append one evaluation; result is a run_dramsys-style dict"""
+        sim = config_dict['simulation']
+        workload, seed = workload_of(config_dict)
+        metrics = [(k, float(v)) for k, v in result.items()
+                   if k not in ('total_time', 'bandwidth', 'success')
+                   and isinstance(v, (int, float)) and v is not None]
+
+        with self._connect() as db:
+            config_id = self._config_id(db, sim['memspec'], sim['addressmapping'], sim['mcconfig'], workload)
+            evaluation_id = db.execute(
+                "INSERT INTO evaluations (run_id, config_id, label, seed, evaluator, success, total_time, "
+                "bandwidth, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, config_id, sim.get('simulationid'), seed, evaluator, bool(result.get('success')),
+                 result.get('total_time'), result.get('bandwidth'), created or time.time())).lastrowid
+            db.executemany("INSERT INTO metrics VALUES (?, ?, ?)",
+                           [(evaluation_id, name, value) for name, value in metrics])
+        return evaluation_id
+
+    def query(self, sql, params=()):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            return db.execute(sql, params).fetchall()
+
+    def runs(self):
+        return self.query("""
+            SELECT r.id, r.script, r.source, r.started, r.finished, COUNT(e.id) AS evaluations,
+                   SUM(e.success) AS successes, MIN(CASE WHEN e.success THEN e.total_time END) AS best_time
+            FROM runs r LEFT JOIN evaluations e ON e.run_id = r.id
+            GROUP BY r.id ORDER BY r.id
+        """)
+
+    def best(self, n=5, per='memspec', evaluator=None):
+        """the n fastest configs (best evaluation each) within every value of per"""
+        if per not in GROUP_FIELDS + ('config',):
+            raise ValueError(f"cannot group by {per}")
+        group = "c.id" if per == 'config' else f"c.{per}"
+        where = "AND e.evaluator = ?" if evaluator else ""
+        return self.query(f"""
+            SELECT * FROM (
+                SELECT {group} AS grp, c.memspec, c.addressmapping, c.mcconfig, c.workload,
+                       best.total_time, best.bandwidth, best.evaluations,
+                       ROW_NUMBER() OVER (PARTITION BY {group} ORDER BY best.total_time) AS position
+                FROM (
+                    SELECT e.config_id, MIN(e.total_time) AS total_time, MAX(e.bandwidth) AS bandwidth,
+                           COUNT(*) AS evaluations
+                    FROM evaluations e
+                    WHERE e.success AND e.total_time IS NOT NULL {where}
+                    GROUP BY e.config_id
+                ) best JOIN configs c ON c.id = best.config_id
+            ) WHERE position <= ? ORDER BY grp, position
+        """, ((evaluator,) if evaluator else ()) + (n,))
+
+    def history(self, memspec, addressmapping=None, mcconfig=None):
+        """every evaluation of the configs matching the given (substring) fields, oldest first"""
+        clauses, params = ["c.memspec LIKE ?"], [f"%{memspec}%"]
+        for field, value in (('addressmapping', addressmapping), ('mcconfig', mcconfig)):
+            if value:
+                clauses.append(f"c.{field} LIKE ?")
+                params.append(f"%{value}%")
+        return self.query(f"""
+            SELECT e.created, e.run_id, r.script, e.label, e.seed, e.evaluator, e.success,
+                   e.total_time, e.bandwidth, c.memspec, c.addressmapping, c.mcconfig, c.workload
+            FROM evaluations e JOIN configs c ON c.id = e.config_id JOIN runs r ON r.id = e.run_id
+            WHERE {' AND '.join(clauses)} ORDER BY e.created, e.id
+        """, params)
+
+    def compare(self, run_ids):
+        """per run summary, and the best time of every config evaluated by more than one of the runs"""
+        marks = ",".join("?" * len(run_ids))
+        summary = self.query(f"""
+            SELECT e.run_id, r.script, COUNT(*) AS evaluations, SUM(e.success) AS successes,
+                   MIN(CASE WHEN e.success THEN e.total_time END) AS best_time,
+                   AVG(CASE WHEN e.success THEN e.total_time END) AS mean_time
+            FROM evaluations e JOIN runs r ON r.id = e.run_id
+            WHERE e.run_id IN ({marks}) GROUP BY e.run_id ORDER BY e.run_id
+        """, run_ids)
+        shared = self.query(f"""
+            SELECT c.id, c.memspec, c.addressmapping, c.mcconfig, c.workload, e.run_id,
+                   MIN(e.total_time) AS total_time
+            FROM evaluations e JOIN configs c ON c.id = e.config_id
+            WHERE e.run_id IN ({marks}) AND e.success
+              AND e.config_id IN (
+                  SELECT config_id FROM evaluations WHERE run_id IN ({marks}) AND success
+                  GROUP BY config_id HAVING COUNT(DISTINCT run_id) > 1)
+            GROUP BY c.id, e.run_id ORDER BY c.id, e.run_id
+        """, run_ids * 2)
+        return summary, shared
+
+    def import_json(self, path, trace_file="traces/resnet50_synthetic.stl"):
+        """
+        load the evaluations of an existing optimizer results file as a run of
+        its own; a file whose contents were imported before is skipped.
+        returns the number of evaluations added
+        """
+        with open(path, 'rb') as f:
+            raw = f.read()
+        source = f"{os.path.abspath(path)}#{hashlib.sha256(raw).hexdigest()[:16]}"
+        if self.query("SELECT 1 FROM runs WHERE source = ?", (source,)):
+            return 0
+
+        data = json.loads(raw)
+        records = stored_records(data)
+        if not records:
+            return 0
+
+        started = os.path.getmtime(path)
+        if isinstance(data, dict) and 'timestamp' in data:
+            try:
+                started = datetime.fromisoformat(data['timestamp']).timestamp()
+            except ValueError:
+                pass
+
+        recorder = self.start_run(os.path.basename(path), source=source, started=started)
+        for record in records:
+            result = {
+                'total_time': record.get('total_time_ps', record.get('fitness')),
+                'bandwidth': record.get('bandwidth', record.get('avg_bandwidth_gbps')),
+                'success': bool(record.get('success')),
+            }
+            if not isinstance(result['total_time'], (int, float)) or result['total_time'] == float('inf'):
+                result['total_time'], result['success'] = None, False
+            if record.get('pruned'):
+                result = {**result, 'success': False, 'pruned': 1, 'lower_bound': result['total_time']}
+                result['total_time'] = None
+            self.add(recorder.run_id, record_config(record, trace_file), result, created=started)
+        recorder.finish()
+        return len(records)
+
+
+class RunRecorder:
+    """appends the evaluations of one run; passed to run_dramsys and DRAMModel.run"""
+
+    def __init__(self, store, run_id):
+        self.store = store
+        self.run_id = run_id
+        self.started = time.time()
+        self.count = 0
+
+    def record(self, config_dict, result, evaluator='dramsys'):
+        try:
+            self.store.add(self.run_id, config_dict, result, evaluator)
+            self.count += 1
+        except sqlite3.Error as e:
+            # losing a log row must never cost the simulation it describes
+            print(f"  results store: {e}")
+
+    def finish(self):
+        with self.store._connect() as db:
+            db.execute("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), self.run_id))
+
+    def summary(self):
+        return f"results store: run {self.run_id}, {self.count} evaluations ({self.store.path})"
+
+
+def stored_records(data):
+    """every evaluation record (a dict naming a memspec) in a results json"""
+    records = data if isinstance(data, list) else [
+        r for value in data.values() if isinstance(value, list) for r in value]
+    return [r for r in records if isinstance(r, dict) and 'memspec' in r]
+
+
+def stored_results(paths):
+    """(file, record, total time) of every successful dramsys result stored in the given json files"""
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        for record in stored_records(data):
+            if not record.get('success'):
+                continue
+            total_time = record.get('total_time_ps', record.get('fitness'))
+            if isinstance(total_time, (int, float)) and 0 < total_time < float('inf') and not record.get('pruned'):
+                yield os.path.basename(path), record, total_time
+
+
+def record_config(record, trace_file):
+    """the simulation json a stored result was produced with"""
+    if 'numRequests' in record:
+        setup = {
+            "type": "generator",
+            "clkMhz": record['clkMhz'],
+            "numRequests": record['numRequests'],
+            "rwRatio": record['rwRatio'],
+            "addressDistribution": record['addressDistribution'],
+            "minAddress": 0,
+            "maxAddress": 4294967295,
+            **({"seed": record['seed']} if 'seed' in record else {})
+        }
+    else:
+        setup = {"type": "player", "clkMhz": 1000, "name": trace_file}
+    return {"simulation": {
+        "addressmapping": record['addressmapping'],
+        "mcconfig": record['mcconfig'],
+        "memspec": record['memspec'],
+        "simulationid": record.get('config_name'),
+        "tracesetup": [setup]
+    }}
+
+
+def _short(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _workload(workload):
+    setup = json.loads(workload)
+    parts = []
+    for i in setup:
+        if i.get('type') == 'player':
+            parts.append(f"{os.path.basename(i.get('name', '?'))}@{i.get('clkMhz')}")
+        else:
+            parts.append(f"{i.get('addressDistribution')} n={i.get('numRequests')} rw={i.get('rwRatio')} "
+                         f"@{i.get('clkMhz')}")
+    return "+".join(parts)
+
+
+def _time(value):
+    return f"{value:,.0f}" if value is not None else "-"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="query the optimizer results store")
+    parser.add_argument("--db", default=DEFAULT_STORE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="load existing results json files")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--trace", default="traces/resnet50_synthetic.stl",
+                   help="trace the player-based results were simulated with")
+
+    sub.add_parser("runs", help="list runs")
+
+    p = sub.add_parser("best", help="fastest configs per group")
+    p.add_argument("-n", type=int, default=3)
+    p.add_argument("--per", choices=GROUP_FIELDS + ('config',), default="memspec")
+    p.add_argument("--evaluator", choices=["dramsys", "model"], default=None)
+
+    p = sub.add_parser("history", help="every evaluation of one configuration")
+    p.add_argument("memspec")
+    p.add_argument("addressmapping", nargs="?")
+    p.add_argument("mcconfig", nargs="?")
+
+    p = sub.add_parser("compare", help="compare runs")
+    p.add_argument("run_ids", nargs="+", type=int)
+
+    args = parser.parse_args()
+    store = ResultsStore(args.db)
+
+    if args.command == "import":
+        for path in args.files:
+            print(f"{path}: {store.import_json(path, args.trace)} evaluations")
+
+    elif args.command == "runs":
+        print(f"{'run':>4} {'script':<34} {'started':<17} {'evals':>6} {'ok':>6} {'best time ps':>15}")
+        for r in store.runs():
+            started = time.strftime("%Y-%m-%d %H:%M", time.localtime(r['started']))
+            print(f"{r['id']:>4} {r['script']:<34} {started:<17} {r['evaluations']:>6} "
+                  f"{r['successes'] or 0:>6} {_time(r['best_time']):>15}")
+
+    elif args.command == "best":
+        group = None
+        for r in store.best(args.n, args.per, args.evaluator):
+            if r['grp'] != group:
+                group = r['grp']
+                print(f"\n{args.per}: {_short(str(group)) if args.per != 'workload' else _workload(group)}")
+            print(f"  {r['position']}. {_time(r['total_time']):>15} ps {r['bandwidth'] or 0:>7.2f} gb/s  "
+                  f"{_short(r['memspec'])} {_short(r['addressmapping'])} {_short(r['mcconfig'])} "
+                  f"[{_workload(r['workload'])}] x{r['evaluations']}")
+
+    elif args.command == "history":
+        rows = store.history(args.memspec, args.addressmapping, args.mcconfig)
+        for r in rows:
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r['created']))
+            outcome = f"{_time(r['total_time']):>15} ps {r['bandwidth'] or 0:>7.2f} gb/s" if r['success'] \
+                else f"{'failed':>29}"
+            print(f"{when} run {r['run_id']:>3} {r['evaluator']:<7} {outcome}  "
+                  f"{_short(r['memspec'])} {_short(r['addressmapping'])} {_short(r['mcconfig'])} "
+                  f"[{_workload(r['workload'])}]" + (f" seed {r['seed']}" if r['seed'] is not None else ""))
+        print(f"{len(rows)} evaluations")
+
+    else:
+        summary, shared = store.compare(args.run_ids)
+        print(f"{'run':>4} {'script':<34} {'evals':>6} {'ok':>6} {'best time ps':>15} {'mean time ps':>15}")
+        for r in summary:
+            print(f"{r['run_id']:>4} {r['script']:<34} {r['evaluations']:>6} {r['successes'] or 0:>6} "
+                  f"{_time(r['best_time']):>15} {_time(r['mean_time']):>15}")
+        by_config = {}
+        for r in shared:
+            by_config.setdefault(r['id'], (r, {}))[1][r['run_id']] = r['total_time']
+        if by_config:
+            print("\nconfigs evaluated in more than one run (best time ps):")
+            print(f"{'config':<70}" + "".join(f" {'run ' + str(i):>14}" for i in args.run_ids))
+            for r, times in by_config.values():
+                name = f"{_short(r['memspec'])} {_short(r['addressmapping'])} {_short(r['mcconfig'])}"
+                print(f"{name:<70}" + "".join(f" {_time(times.get(i)):>14}" for i in args.run_ids))
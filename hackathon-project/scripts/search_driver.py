@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+budget-aware evaluation driver shared by the ga optimizers
+- never simulates the same genotype twice in one run
+- enumerates the space exhaustively when it fits in the budget
+- stops once the best fitness has not improved for `patience` simulations
+"""
+
+import math
+import itertools
+
+from dramsys_runner import evaluate_population
+import live_metrics
+
+RESULT_FIELDS = ('fitness', 'bandwidth', 'success', 'pruned')
+FAILED = {'fitness': math.inf, 'bandwidth': 0, 'success': False}
+
+
+def _fields(individual):
+    """attribute dict of an individual, whether a plain dict or a dataclass"""
+    return individual if isinstance(individual, dict) else vars(individual)
+
+
+class SearchDriver:
+    def __init__(self, space, budget=None, patience=None, planned=None):
+        """
+        space: gene name -> options. budget: max simulations for the run.
+        patience: stop after this many simulations without improvement.
+        planned: simulations the plain search would have run, for the savings report.
+        """
+        self.space = space
+        self.budget = budget
+        self.patience = patience
+        self.planned = planned
+
+        self.results = {}
+        self.simulations = 0
+        self.duplicates = 0
+        self.replicates = 0
+        self.best = math.inf
+        self.since_improvement = 0
+        self.stop_reason = None
+        self.exhaustive = False
+
+    def genotype(self, individual):
+        fields = _fields(individual)
+        return tuple(fields[g] for g in self.space)
+
+    def space_size(self):
+        return math.prod(len(options) for options in self.space.values())
+
+    def fits_budget(self):
+        return self.budget is not None and self.space_size() <= self.budget
+
+    def enumerate(self):
+        """every individual of the space, for exhaustive search"""
+        self.exhaustive = True
+        return [{**dict(zip(self.space, values)), 'fitness': None}
+                for values in itertools.product(*self.space.values())]
+
+    def remaining(self):
+        """simulations left in the budget, or None without one"""
+        return None if self.budget is None else max(0, self.budget - self.simulations)
+
+    def charge(self, simulations=1):
+        """count simulations run outside evaluate() (racing replicates) against the budget"""
+        self.simulations += simulations
+        self.replicates += simulations
+
+    def should_stop(self):
+        if self.budget is not None and self.simulations >= self.budget:
+            self.stop_reason = f"budget of {self.budget} simulations used"
+        elif self.patience is not None and self.since_improvement >= self.patience:
+            self.stop_reason = f"no improvement in {self.since_improvement} simulations"
+        return self.stop_reason is not None
+
+    def _record(self, individual, outcome):
+        fields = _fields(individual)
+        self.results[self.genotype(individual)] = (
+            {k: fields[k] for k in RESULT_FIELDS if k in fields}, outcome
+        )
+
+        fitness = fields.get('fitness')
+        if fitness is not None and fitness < self.best and not fields.get('pruned'):
+            self.best = fitness
+            self.since_improvement = 0
+            live_metrics.improve(fitness)
+        else:
+            self.since_improvement += 1
+
+    def evaluate(self, jobs, evaluate, workers=1, on_record=None):
+        """
+        like evaluate_population, but genotypes already simulated in this run
+        (or earlier in the same batch) reuse that result without a simulation.
+        jobs beyond the remaining budget are marked failed and not yielded.
+        on_record(individual, sim_id, outcome) is called once a simulated
+        result is in state(), e.g. to checkpoint.
+        """
+        unique, repeats = [], []
+        seen = set()
+        for individual, sim_id in jobs:
+            key = self.genotype(individual)
+            if key in self.results or key in seen:
+                repeats.append((individual, sim_id))
+            else:
+                seen.add(key)
+                unique.append((individual, sim_id))
+
+        if self.budget is not None:
+            remaining = self.remaining()
+            for individual, _ in unique[remaining:]:
+                _fields(individual).update(FAILED)
+            unique = unique[:remaining]
+
+        for individual, sim_id, outcome in evaluate_population(unique, evaluate, workers):
+            self.simulations += 1
+            yield individual, sim_id, outcome
+            # recorded after the caller has handled the result, so fields it
+            # sets from the outcome (dataclass fitness) are included
+            self._record(individual, outcome)
+            if on_record:
+                on_record(individual, sim_id, outcome)
+
+        for individual, sim_id in repeats:
+            result = self.results.get(self.genotype(individual))
+            if result is None:
+                # its first occurrence was cut by the budget
+                _fields(individual).update(FAILED)
+                continue
+            fields, outcome = result
+            self.duplicates += 1
+            _fields(individual).update(fields)
+            yield individual, sim_id, outcome
+
+    def summary(self):
+        lines = [
+            f"simulations run: {self.simulations}",
+            f"saved by exact dedup: {self.duplicates}",
+        ]
+        if self.replicates:
+            lines.append(f"racing replicates: {self.replicates}")
+        if self.stop_reason:
+            lines.append(f"stopped early: {self.stop_reason}")
+        if self.planned is not None:
+            # the plain search's plan has no racing replicates either
+            candidates = self.simulations - self.replicates
+            rest = max(0, self.planned - candidates - self.duplicates)
+            if self.exhaustive:
+                lines.append(f"saved by exhaustive enumeration: {rest}")
+            elif self.stop_reason:
+                lines.append(f"saved by stopping early: {rest}")
+            lines.append(f"total saved vs plain search: {max(0, self.planned - candidates)} "
+                         f"of {self.planned} simulations")
+        return lines
+
+    def state(self):
+        """json-serializable progress, for checkpointing"""
+        return {
+            'results': [[list(key), fields, outcome] for key, (fields, outcome) in self.results.items()],
+            'simulations': self.simulations,
+            'duplicates': self.duplicates,
+            'replicates': self.replicates,
+            'best': self.best,
+            'since_improvement': self.since_improvement,
+            'exhaustive': self.exhaustive,
+        }
+
+    def load_state(self, state):
+        self.results = {tuple(key): (fields, outcome) for key, fields, outcome in state['results']}
+        self.simulations = state['simulations']
+        self.duplicates = state['duplicates']
+        self.replicates = state.get('replicates', 0)
+        self.best = state['best']
+        self.since_improvement = state['since_improvement']
+        self.exhaustive = state['exhaustive']
+
+    def stats(self):
+        return {
+            'simulations': self.simulations,
+            'duplicates_reused': self.duplicates,
+            'racing_replicates': self.replicates,
+            'stop_reason': self.stop_reason,
+            'exhaustive': self.exhaustive,
+            'planned': self.planned,
+            'space_size': self.space_size(),
+            'budget': self.budget,
+            'patience': self.patience,
+        }
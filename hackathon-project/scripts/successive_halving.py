@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+multi-fidelity successive halving search
+candidates are first scored on a cheap low-fidelity run (a trace prefix or a
+small request count); only the best 1/eta of each rung is promoted to the next,
+longer fidelity, and only the finalists are simulated at full length.
+"""
+
+import os
+import math
+
+
+def geometric_fidelities(min_fidelity, eta=3):
+    """fidelity schedule min_fidelity, min_fidelity*eta, ... ending at 1.0"""
+    rungs = max(0, math.floor(math.log(1 / min_fidelity, eta) + 1e-9))
+    return [eta ** -(rungs - r) for r in range(rungs + 1)]
+
+
+def rank(values):
+    """average ranks (1-based), ties share the mean of their positions"""
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    return ranks
+
+
+def spearman(xs, ys):
+    """spearman rank correlation, none when undefined"""
+    if len(xs) < 2:
+        return None
+    rx, ry = rank(xs), rank(ys)
+    mx, my = sum(rx) / len(rx), sum(ry) / len(ry)
+    cov = sum((a - mx) * (b - my) for a, b in zip(rx, ry))
+    var = math.sqrt(sum((a - mx) ** 2 for a in rx) * sum((b - my) ** 2 for b in ry))
+    return cov / var if var else None
+
+
+def successive_halving(candidates, fidelities, evaluate_rung, eta=3, min_finalists=3):
+    """
+    run successive halving over candidates.
+    evaluate_rung(rung_candidates, fidelity, rung) returns one fitness per
+    candidate (lower is better). returns (final ranking as candidate indices,
+    per-rung history with the scores of every candidate evaluated there).
+    """
+    survivors = list(range(len(candidates)))
+    history = []
+    ranked = survivors
+
+    for rung, fidelity in enumerate(fidelities):
+        fitness = evaluate_rung([candidates[i] for i in survivors], fidelity, rung)
+        scores = dict(zip(survivors, fitness))
+        history.append({'rung': rung, 'fidelity': fidelity, 'scores': scores})
+
+        ranked = sorted(survivors, key=lambda i: scores[i])
+        if rung < len(fidelities) - 1:
+            keep = max(min_finalists, math.ceil(len(ranked) / eta))
+            survivors = ranked[:keep]
+
+    return ranked, history
+
+
+def fidelity_correlations(history):
+    """
+    spearman correlation between each rung's ranking and the full-length
+    ranking, measured on the candidates that reached full length
+    """
+    final = history[-1]['scores']
+    report = []
+    for level in history:
+        common = [i for i in final if i in level['scores']]
+        report.append({
+            'rung': level['rung'],
+            'fidelity': level['fidelity'],
+            'evaluated': len(level['scores']),
+            'compared': len(common),
+            'spearman': spearman([level['scores'][i] for i in common],
+                                 [final[i] for i in common])
+        })
+    return report
+
+
+def print_fidelity_report(report):
+    print(f"{'rung':>4}  {'fidelity':>8}  {'evaluated':>9}  {'spearman vs full':>16}")
+    for r in report:
+        rho = f"{r['spearman']:.3f} (n={r['compared']})" if r['spearman'] is not None else "n/a"
+        print(f"{r['rung']:>4}  {r['fidelity']:>8.3f}  {r['evaluated']:>9}  {rho:>16}")
+
+
+def write_trace_prefix(config_dir, trace_file, fraction):
+    """
+    write the first `fraction` of a player trace next to it and return its
+    path relative to config_dir. existing prefixes are reused while newer
+    than the source trace.
+    """
+    if fraction >= 1:
+        return trace_file
+
+    src = os.path.join(config_dir, trace_file)
+    with open(src, 'rb') as f:
+        total = sum(1 for _ in f)
+    count = max(1, int(total * fraction))
+
+    stem, ext = os.path.splitext(trace_file)
+    prefix_file = f"{stem}.prefix{count}{ext}"
+    dst = os.path.join(config_dir, prefix_file)
+
+    if not os.path.exists(dst) or os.path.getmtime(dst) < os.path.getmtime(src):
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        with open(src, 'rb') as fin, open(tmp, 'wb') as fout:
+            for i, line in enumerate(fin):
+                if i >= count:
+                    break
+                fout.write(line)
+        os.replace(tmp, dst)
+
+    return prefix_file
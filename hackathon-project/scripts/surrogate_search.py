@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+surrogate-guided (bayesian optimization) search
+a gaussian process is fitted to every labelled configuration and dramsys is
+only run on the candidates with the highest expected improvement.
+"""
+
+import math
+import random
+import itertools
+
+import numpy as np
+
+
+def encode(space, categorical, individuals):
+    """
+    one-hot encode categorical parameters and map ordinal ones to [0, 1] by
+    their position in the sorted option list
+    """
+    columns = []
+    for param, options in space.items():
+        if param in categorical:
+            columns.append([[1.0 if ind[param] == o else 0.0 for o in options] for ind in individuals])
+        else:
+            ordered = sorted(options)
+            scale = max(1, len(ordered) - 1)
+            columns.append([[ordered.index(ind[param]) / scale] for ind in individuals])
+    return np.hstack([np.array(c, dtype=float).reshape(len(individuals), -1) for c in columns])
+
+
+def _rbf(a, b, lengthscale):
+    sq = ((a[:, None, :] - b[None, :, :]) ** 2).sum(-1)
+    return np.exp(-0.5 * sq / lengthscale ** 2)
+
+
+class GaussianProcess:
+    """zero-mean gp with an rbf kernel; the lengthscale is picked by marginal likelihood"""
+
+    def __init__(self, noise=1e-3, lengthscales=(0.5, 1.0, 2.0, 4.0)):
+        self.noise = noise
+        self.lengthscales = lengthscales
+
+    def fit(self, x, y):
+        self.x = x
+        self.y_mean = y.mean()
+        self.y_std = y.std() or 1.0
+        z = (y - self.y_mean) / self.y_std
+
+        best = None
+        for ls in self.lengthscales:
+            k = _rbf(x, x, ls) + self.noise * np.eye(len(x))
+            chol = np.linalg.cholesky(k)
+            alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, z))
+            log_likelihood = -0.5 * z @ alpha - np.log(np.diag(chol)).sum()
+            if best is None or log_likelihood > best[0]:
+                best = (log_likelihood, ls, chol, alpha)
+
+        _, self.lengthscale, self.chol, self.alpha = best
+        return self
+
+    def predict(self, x):
+        ks = _rbf(x, self.x, self.lengthscale)
+        mean = ks @ self.alpha
+        v = np.linalg.solve(self.chol, ks.T)
+        var = np.maximum(1.0 - (v ** 2).sum(0), 1e-12)
+        return self.y_mean + self.y_std * mean, self.y_std * np.sqrt(var)
+
+
+_erf = np.vectorize(math.erf)
+
+
+def expected_improvement(mean, std, best, xi=0.01):
+    """expected improvement below `best` for a minimization objective"""
+    improvement = best - mean - xi
+    z = improvement / std
+    cdf = 0.5 * (1 + _erf(z / math.sqrt(2)))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+    return improvement * cdf + std * pdf
+
+
+class SurrogateSearch:
+    def __init__(self, space, categorical, n_init=10):
+        self.space = space
+        self.categorical = set(categorical)
+        self.n_init = n_init
+        self.candidates = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+        self.encoded = encode(space, self.categorical, self.candidates)
+
+    def key(self, ind):
+        return tuple(ind[p] for p in self.space)
+
+    def propose(self, labelled, evaluated, batch_size):
+        """
+        pick the next batch of unevaluated candidates. labelled is a list of
+        (individual, fitness) with finite fitness; evaluated holds keys of every
+        configuration already simulated (including failures).
+        """
+        pool = [i for i, c in enumerate(self.candidates) if self.key(c) not in evaluated]
+        if not pool:
+            return []
+
+        if len(labelled) < self.n_init:
+            picks = random.sample(pool, min(batch_size, len(pool)))
+            return [dict(self.candidates[i]) for i in picks]
+
+        x = encode(self.space, self.categorical, [ind for ind, _ in labelled])
+        y = np.log(np.array([fitness for _, fitness in labelled], dtype=float))
+        model = GaussianProcess().fit(x, y)
+
+        mean, std = model.predict(self.encoded[pool])
+        acquisition = expected_improvement(mean, std, y.min())
+        order = np.argsort(-acquisition)[:batch_size]
+        return [dict(self.candidates[pool[i]]) for i in order]
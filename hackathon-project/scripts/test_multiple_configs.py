@@ -7,10 +7,42 @@ simple alternative to full optimization runs
 import os
 import sys
 import json
-import subprocess
-import re
 
-def run_dramsys_simulation(config_name, memspec, addressmapping, mcconfig, trace_file):
+from dramsys_runner import run_dramsys
+from fitness_cache import FitnessCache
+from results_store import ResultsStore
+import profiler
+
+TEST_CONFIGS = [
+    {
+        'name': 'baseline_ddr4_2400',
+        'memspec': 'memspec/JEDEC_4Gb_DDR4-2400_8bit_A.json',
+        'addressmapping': 'addressmapping/am_ddr4_8x4Gbx8_dimm_p1KB_brc.json',
+        'mcconfig': 'mcconfig/fr_fcfs.json'
+    },
+    {
+        'name': 'fast_ddr4_3200',
+        'memspec': 'memspec/JEDEC_4Gb_DDR4-3200_8bit_A.json',
+        'addressmapping': 'addressmapping/am_ddr4_8x4Gbx8_dimm_p1KB_brc.json',
+        'mcconfig': 'mcconfig/fr_fcfs.json'
+    },
+    {
+        'name': 'ddr4_2400_fifo',
+        'memspec': 'memspec/JEDEC_4Gb_DDR4-2400_8bit_A.json',
+        'addressmapping': 'addressmapping/am_ddr4_8x4Gbx8_dimm_p1KB_brc.json',
+        'mcconfig': 'mcconfig/fifo.json'
+    },
+    {
+        'name': 'lpddr4_fast',
+        'memspec': 'memspec/JEDEC_LPDDR4_8Gb_die_x16_3200.json',
+        'addressmapping': 'addressmapping/am_lpddr4_8Gbx16_brc.json',
+        'mcconfig': 'mcconfig/fr_fcfs.json'
+    }
+]
+
+@profiler.timed("evaluate", label="config_name")
+def run_dramsys_simulation(config_name, memspec, addressmapping, mcconfig, trace_file, cache=None,
+                           recorder=None):
     """run one dramsys simulation"""
 
     dramsys_path = os.path.expanduser("~/DRAMSys")
@@ -29,9 +61,7 @@ def run_dramsys_simulation(config_name, memspec, addressmapping, mcconfig, trace
         }
     }
 
-    config_file = f"{dramsys_path}/configs/test_{config_name}.json"
-    with open(config_file, 'w') as f:
-        json.dump(config_dict, f, indent=2)
+    config_file = f"test_{config_name}.json"
 
     print("\n" + "-"*70)
     print(f"testing: {config_name}")
@@ -41,34 +71,17 @@ def run_dramsys_simulation(config_name, memspec, addressmapping, mcconfig, trace
     print("-"*70)
 
     try:
-        result = subprocess.run(
-            [f"{dramsys_path}/build/bin/DRAMSys", config_file],
-            capture_output=True,
-            text=True,
-            timeout=300
-        )
-
-        total_time = None
-        avg_bw = None
-
-        for line in result.stdout.split('\n'):
-            if 'Total Time:' in line:
-                m = re.search(r'Total Time:\s+(\d+)', line)
-                if m:
-                    total_time = int(m.group(1))
-            if 'AVG BW:' in line and 'IDLE' not in line:
-                m = re.search(r'AVG BW:\s+([\d.]+)', line)
-                if m:
-                    avg_bw = float(m.group(1))
+        result = run_dramsys(dramsys_path, config_dict, config_file, timeout=300, cache=cache,
+                             recorder=recorder)
 
         return {
             'config_name': config_name,
             'memspec': memspec,
             'addressmapping': addressmapping,
             'mcconfig': mcconfig,
-            'total_time_ps': total_time,
-            'avg_bandwidth_gbps': avg_bw,
-            'success': total_time is not None
+            'total_time_ps': result['total_time'],
+            'avg_bandwidth_gbps': result['bandwidth'],
+            'success': result['success']
         }
 
     except Exception as e:
@@ -80,47 +93,27 @@ def run_dramsys_simulation(config_name, memspec, addressmapping, mcconfig, trace
         }
 
 def main():
-    test_configs = [
-        {
-            'name': 'baseline_ddr4_2400',
-            'memspec': 'memspec/JEDEC_4Gb_DDR4-2400_8bit_A.json',
-            'addressmapping': 'addressmapping/am_ddr4_8x4Gbx8_dimm_p1KB_brc.json',
-            'mcconfig': 'mcconfig/fr_fcfs.json'
-        },
-        {
-            'name': 'fast_ddr4_3200',
-            'memspec': 'memspec/JEDEC_4Gb_DDR4-3200_8bit_A.json',
-            'addressmapping': 'addressmapping/am_ddr4_8x4Gbx8_dimm_p1KB_brc.json',
-            'mcconfig': 'mcconfig/fr_fcfs.json'
-        },
-        {
-            'name': 'ddr4_2400_fifo',
-            'memspec': 'memspec/JEDEC_4Gb_DDR4-2400_8bit_A.json',
-            'addressmapping': 'addressmapping/am_ddr4_8x4Gbx8_dimm_p1KB_brc.json',
-            'mcconfig': 'mcconfig/fifo.json'
-        },
-        {
-            'name': 'lpddr4_fast',
-            'memspec': 'memspec/JEDEC_LPDDR4_8Gb_die_x16_3200.json',
-            'addressmapping': 'addressmapping/am_lpddr4_8Gbx16_brc.json',
-            'mcconfig': 'mcconfig/fr_fcfs.json'
-        }
-    ]
-
+    if '--profile' in sys.argv:
+        profiler.enable()
     trace_file = "traces/resnet50_synthetic.stl"
+    cache = None if '--no-cache' in sys.argv else FitnessCache()
+    recorder = None if '--no-store' in sys.argv else ResultsStore().start_run(
+        "test_multiple_configs.py", sys.argv[1:])
     results = []
 
     print("\n" + "-"*70)
     print("dram configuration comparison for ai workload")
     print("-"*70)
 
-    for config in test_configs:
+    for config in TEST_CONFIGS:
         result = run_dramsys_simulation(
             config['name'],
             config['memspec'],
             config['addressmapping'],
             config['mcconfig'],
-            trace_file
+            trace_file,
+            cache,
+            recorder
         )
         results.append(result)
 
@@ -161,6 +154,12 @@ def main():
             print("-"*70)
 
     print(f"\ndetailed results saved to: {results_file}")
+    if cache:
+        print(cache.summary())
+    if recorder:
+        recorder.finish()
+        print(recorder.summary())
+    profiler.finish(os.path.expanduser('~/hackathon-project/results/test_multiple_configs_profile.json'))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+compact binary trace format and fast converters to and from dramsys .stl
+
+layout (little endian):
+  header, 64 bytes: magic "DRAMTRC\0", version u32, reserved u32, op count
+  u64, then the byte offsets of the three columns as u64
+  timestamps  u64[count]
+  addresses   u64[count]
+  ops         u8[count]   bit 0 = write, bits 1-7 = log2(access size) + 1,
+                          0 when the size is unknown
+
+about 17 bytes per op. the columns are read zero-copy through numpy.memmap,
+so analyses load a 100m-op trace without parsing anything.
+"""
+
+import os
+import sys
+import time
+import struct
+
+import numpy as np
+
+MAGIC = b"DRAMTRC\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQQQ")
+HEADER_SIZE = 64
+
+# ops per converter batch, and bytes of .stl text parsed at once
+CHUNK_OPS = 1 << 20
+BLOCK_BYTES = 32 * 1024 * 1024
+
+# ascii of every 4-digit decimal group ("0000".."9999") and every byte in
+# hex ("00".."ff"), one table element per group so lookups copy whole words
+DECIMAL_GROUPS = np.frombuffer(b"".join(b"%04d" % i for i in range(10000)), dtype=np.uint32)
+HEX_PAIRS = np.frombuffer(b"".join(b"%02x" % i for i in range(256)), dtype=np.uint16)
+
+
+def _width(top, base):
+    width = 1
+    while base ** width <= top:
+        width += 1
+    return width
+
+
+def _leading_mask(values, base, width, mask):
+    """clear the leading padding of a right-aligned width-digit field in mask"""
+    if _width(int(values.min()), base) == width:
+        return
+    thresholds = np.array([base ** p for p in range(1, width)], dtype=np.uint64)
+    num_digits = 1 + np.searchsorted(thresholds, values, side='right')
+    mask[:] = np.arange(width) >= (width - num_digits)[:, None]
+
+
+def _decimal_field(values, out, mask):
+    """write right-aligned decimal digits of values into out, 4 digits per division"""
+    width = out.shape[1]
+    groups = -(-width // 4)
+    digits = np.empty((len(values), groups), dtype=np.uint32)
+    rest = values
+    for g in range(groups - 1, -1, -1):
+        rest, group = np.divmod(rest, np.uint64(10000))
+        digits[:, g] = DECIMAL_GROUPS[group]
+    out[:] = digits.view(np.uint8)[:, groups * 4 - width:]
+    _leading_mask(values, 10, width, mask)
+
+
+def _hex_field(values, out, mask):
+    """write right-aligned lowercase hex digits of values into out"""
+    width = out.shape[1]
+    num_bytes = (width + 1) // 2
+    big_endian = values.astype('>u8').view(np.uint8).reshape(-1, 8)[:, 8 - num_bytes:]
+    digits = HEX_PAIRS[big_endian].view(np.uint8)
+    out[:] = digits[:, 2 * num_bytes - width:]
+    _leading_mask(values, 16, width, mask)
+
+
+def format_stl(timestamps, is_write, addresses):
+    """
+    render rows as dramsys .stl lines ("ts:\\tread\\t0xaddr\\n") in bulk:
+    every row is laid out in a fixed-width byte matrix and the padding is
+    masked out, which keeps the row order when flattened
+    """
+    timestamps = np.asarray(timestamps, dtype=np.uint64)
+    addresses = np.asarray(addresses, dtype=np.uint64)
+    is_write = np.asarray(is_write, dtype=bool)
+    n = len(timestamps)
+    if n == 0:
+        return b""
+
+    ts_width = _width(int(timestamps.max()), 10)
+    addr_width = _width(int(addresses.max()), 16)
+    op_at = ts_width + 2
+    addr_at = op_at + 8
+
+    rows = np.empty((n, addr_at + addr_width + 1), dtype=np.uint8)
+    mask = np.ones(rows.shape, dtype=bool)
+
+    _decimal_field(timestamps, rows[:, :ts_width], mask[:, :ts_width])
+    rows[:, ts_width:op_at] = np.frombuffer(b":\t", dtype=np.uint8)
+    rows[:, op_at:op_at + 5] = np.frombuffer(b"read\0", dtype=np.uint8)
+    rows[is_write, op_at:op_at + 5] = np.frombuffer(b"write", dtype=np.uint8)
+    mask[:, op_at + 4] = is_write
+    rows[:, op_at + 5:addr_at] = np.frombuffer(b"\t0x", dtype=np.uint8)
+    _hex_field(addresses, rows[:, addr_at:-1], mask[:, addr_at:-1])
+    rows[:, -1] = ord("\n")
+
+    return rows[mask].tobytes()
+
+
+# value of each ascii hex/decimal digit, 255 for anything else
+DIGIT_VALUES = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate(b"0123456789abcdef"):
+    DIGIT_VALUES[_c] = _i
+    DIGIT_VALUES[bytes([_c]).upper()[0]] = _i
+
+
+def parse_fields(buf, starts, ends, base):
+    """
+    integer value of every buf[starts[i]:ends[i]] digit run, all at once:
+    the runs are gathered right-aligned into a fixed-width digit matrix and
+    folded column by column
+    """
+    values = np.zeros(len(starts), dtype=np.uint64)
+    width = int((ends - starts).max()) if len(starts) else 0
+    if width == 0:
+        return values
+
+    index = ends[:, None] + np.arange(-width, 0)
+    digits = DIGIT_VALUES[buf[np.maximum(index, 0)]]
+    digits[index < starts[:, None]] = 0
+    if (digits >= base).any():
+        bad = np.argmax((digits >= base).any(axis=1))
+        raise ValueError(f"malformed number in .stl line: {bytes(buf[starts[bad]:ends[bad]])!r}")
+
+    base = np.uint64(base)
+    for column in digits.T:
+        values = values * base + column
+    return values
+
+
+def parse_stl(block):
+    """
+    (timestamps, is_write, addresses) of a block of complete .stl lines,
+    "ts:\\tread|write\\taddress[\\t...]", without a python loop per line
+    """
+    if b"#" in block:
+        block = b"\n".join(line for line in block.split(b"\n") if not line.lstrip().startswith(b"#"))
+    if not block.endswith(b"\n"):
+        block += b"\n"
+
+    buf = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord("\n"))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    ends = ends - ((ends > starts) & (buf[ends - 1] == ord("\r")))
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        empty = np.zeros(0, dtype=np.uint64)
+        return empty, np.zeros(0, dtype=bool), empty
+
+    tabs = np.append(np.flatnonzero(buf == ord("\t")), len(buf))
+
+    def next_tab(after):
+        return tabs[np.minimum(np.searchsorted(tabs, after), len(tabs) - 1)]
+
+    first_tab = next_tab(starts)
+    second_tab = next_tab(first_tab + 1)
+    malformed = (second_tab >= ends) | (buf[first_tab - 1] != ord(":"))
+    if malformed.any():
+        bad = np.argmax(malformed)
+        raise ValueError(f"malformed .stl line: {bytes(buf[starts[bad]:ends[bad]])!r}")
+    third_tab = next_tab(second_tab + 1)
+
+    timestamps = parse_fields(buf, starts, first_tab - 1, 10)
+    is_write = buf[first_tab + 1] == ord("w")
+
+    address_start = second_tab + 1
+    prefixed = (buf[address_start] == ord("0")) & ((buf[address_start + 1] | 0x20) == ord("x"))
+    address_start = address_start + 2 * prefixed
+    addresses = parse_fields(buf, address_start, np.minimum(third_tab, ends), 16)
+
+    return timestamps, is_write, addresses
+
+
+def iter_stl(path, block_bytes=BLOCK_BYTES):
+    """parsed (timestamps, is_write, addresses) batches of an .stl file"""
+    with open(path, "rb") as f:
+        rest = b""
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                break
+            data = rest + data
+            cut = data.rfind(b"\n") + 1
+            rest = data[cut:]
+            if cut:
+                yield parse_stl(data[:cut])
+        if rest.strip():
+            yield parse_stl(rest)
+
+
+def pack_ops(is_write, sizes=None):
+    """op byte column from write flags and optional access sizes (rounded up to a power of two)"""
+    ops = np.asarray(is_write, dtype=np.uint8)
+    if sizes is not None:
+        sizes = np.asarray(sizes, dtype=np.uint64)
+        code = np.where(sizes > 0, np.ceil(np.log2(np.maximum(sizes, 1))).astype(np.uint8) + 1, 0)
+        ops = ops | (code.astype(np.uint8) << 1)
+    return ops
+
+
+def is_binary_trace(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class Trace:
+    """memory-mapped columns of a binary trace"""
+
+    def __init__(self, path, mode="r"):
+        with open(path, "rb") as f:
+            magic, version, _, count, *offsets = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"not a binary trace: {path}")
+        if version != VERSION:
+            raise ValueError(f"unsupported trace version {version}: {path}")
+
+        self.path = path
+        self.count = count
+        columns = []
+        for offset, dtype in zip(offsets, ("<u8", "<u8", "u1")):
+            if count:
+                columns.append(np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(count,)))
+            else:
+                columns.append(np.zeros(0, dtype=dtype))
+        self.timestamps, self.addresses, self.ops = columns
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def is_write(self):
+        return (self.ops & 1).astype(bool)
+
+    @property
+    def sizes(self):
+        """access size in bytes per op, 0 where unknown"""
+        code = (self.ops >> 1).astype(np.uint64)
+        return np.where(code > 0, np.uint64(1) << (code - np.uint64(1)), 0)
+
+    def chunks(self, size=CHUNK_OPS):
+        """(timestamps, is_write, addresses) in batches, without loading the whole trace"""
+        for start in range(0, self.count, size):
+            stop = start + size
+            yield (np.asarray(self.timestamps[start:stop]),
+                   (self.ops[start:stop] & 1).astype(bool),
+                   np.asarray(self.addresses[start:stop]))
+
+    def flush(self):
+        for column in (self.timestamps, self.addresses, self.ops):
+            if isinstance(column, np.memmap):
+                column.flush()
+
+
+def _write_header(f, count):
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, VERSION, 0, count, HEADER_SIZE,
+                        HEADER_SIZE + 8 * count, HEADER_SIZE + 16 * count).ljust(HEADER_SIZE, b"\0"))
+
+
+def create_trace(path, count):
+    """
+    preallocate a trace of count ops and return it mapped read-write, so
+    several processes can fill disjoint ranges in place
+    """
+    with open(path, "wb") as f:
+        _write_header(f, count)
+        f.truncate(HEADER_SIZE + 17 * count)
+    return Trace(path, mode="r+")
+
+
+class TraceWriter:
+    """
+    append batches to a binary trace whose length is not known up front.
+    timestamps go straight to the file; addresses and ops are spooled next
+    to it and appended on close.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.file = open(path, "wb")
+        self.file.write(b"\0" * HEADER_SIZE)
+        self.spools = [open(f"{path}.{name}.tmp", "w+b") for name in ("addresses", "ops")]
+
+    def write(self, timestamps, is_write, addresses, sizes=None):
+        self.file.write(np.asarray(timestamps, dtype="<u8").tobytes())
+        self.spools[0].write(np.asarray(addresses, dtype="<u8").tobytes())
+        self.spools[1].write(pack_ops(is_write, sizes).tobytes())
+        self.count += len(timestamps)
+
+    def close(self):
+        for spool in self.spools:
+            spool.seek(0)
+            while True:
+                data = spool.read(BLOCK_BYTES)
+                if not data:
+                    break
+                self.file.write(data)
+            spool.close()
+            os.remove(spool.name)
+        _write_header(self.file, self.count)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def load_trace(path):
+    """
+    (timestamps, is_write, addresses) of a binary or .stl trace; binary
+    columns stay memory-mapped
+    """
+    if is_binary_trace(path):
+        trace = Trace(path)
+        return trace.timestamps, trace.is_write, trace.addresses
+
+    batches = list(iter_stl(path))
+    if not batches:
+        empty = np.zeros(0, dtype=np.uint64)
+        return empty, np.zeros(0, dtype=bool), empty
+    return tuple(np.concatenate(column) for column in zip(*batches))
+
+
+def iter_trace(path):
+    """(timestamps, is_write, addresses) batches of a binary or .stl trace, in order"""
+    if is_binary_trace(path):
+        return Trace(path).chunks()
+    return iter_stl(path)
+
+
+def stl_to_binary(stl_path, trace_path):
+    count = 0
+    with TraceWriter(trace_path) as writer:
+        for timestamps, is_write, addresses in iter_stl(stl_path):
+            writer.write(timestamps, is_write, addresses)
+            count += len(timestamps)
+    return count
+
+
+def binary_to_stl(trace_path, stl_path):
+    trace = Trace(trace_path)
+    with open(stl_path, "wb") as f:
+        for timestamps, is_write, addresses in trace.chunks():
+            f.write(format_stl(timestamps, is_write, addresses))
+    return len(trace)
+
+
+def print_info(path):
+    start = time.perf_counter()
+    timestamps, is_write, addresses = load_trace(path)
+    writes = int(np.count_nonzero(is_write))
+    elapsed = time.perf_counter() - start
+
+    print(f"trace: {path}")
+    print(f"format: {'binary' if is_binary_trace(path) else 'stl'}")
+    print(f"ops: {len(timestamps)}")
+    if len(timestamps):
+        print(f"reads: {len(timestamps) - writes}  writes: {writes}")
+        print(f"time span: {int(timestamps[0])} - {int(timestamps[-1])}")
+        print(f"address range: 0x{int(addresses.min()):x} - 0x{int(addresses.max()):x}")
+    print(f"load + scan time: {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    usage = "usage: trace_format.py to-binary IN.stl OUT.trace | to-stl IN.trace OUT.stl | info TRACE"
+    if len(sys.argv) < 3 or sys.argv[1] not in ("to-binary", "to-stl", "info"):
+        print(usage)
+        sys.exit(1)
+
+    command = sys.argv[1]
+    start = time.perf_counter()
+    if command == "info":
+        print_info(sys.argv[2])
+    else:
+        if len(sys.argv) < 4:
+            print(usage)
+            sys.exit(1)
+        convert = stl_to_binary if command == "to-binary" else binary_to_stl
+        count = convert(sys.argv[2], sys.argv[3])
+        print(f"converted {count} ops in {time.perf_counter() - start:.2f}s: {sys.argv[3]}")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+multi-tenant trace mixer
+merges several traces (.stl or binary) into one by timestamp, so dramsys
+sees co-located streams contending for the same dimms. every stream can be
+moved to its own address range, started later and sped up or slowed down.
+
+the merge streams in constant memory: each input holds one block, and a heap
+keyed by the last timestamp of every block says which input runs dry first.
+everything up to that timestamp is final in all inputs, so it is merged with
+one stable sort and written, and only that input reads its next block.
+ties keep stream order, so the output is deterministic.
+
+stream specs are PATH[,key=value...] with keys
+  addr=OFFSET   added to every address (0x.. accepted)
+  time=CYCLES   added to every timestamp
+  rate=FACTOR   injection rate multiplier (timestamps are divided by it)
+a PATH of "random" or "sequential" generates a synthetic stream instead,
+with ops=, gap= (cycles between requests), span= (bytes, e.g. 1G),
+writes= (write fraction) and seed=.
+
+with --initiators every stream is written to its own trace and a dramsys
+tracesetup list with one player per stream is printed instead.
+"""
+
+import os
+import json
+import heapq
+import argparse
+
+import numpy as np
+
+from cache_filter import parse_size
+from trace_format import CHUNK_OPS, TraceWriter, format_stl, iter_trace
+
+SYNTHETIC = ('random', 'sequential')
+
+
+def synthetic_blocks(kind, ops=100000, gap=4, span=1 << 30, writes=0.0, seed=0, line=64):
+    """blocks of a uniform-random or sequential line stream, one request every gap cycles"""
+    rng = np.random.default_rng(seed)
+    lines = max(1, span // line)
+    for start in range(0, ops, CHUNK_OPS):
+        index = np.arange(start, min(start + CHUNK_OPS, ops), dtype=np.uint64)
+        if kind == 'random':
+            slot = rng.integers(0, lines, size=len(index), dtype=np.uint64)
+        else:
+            slot = index % np.uint64(lines)
+        yield index * np.uint64(gap), rng.random(len(index)) < writes, slot * np.uint64(line)
+
+
+class Stream:
+    def __init__(self, source, addr=0, time=0, rate=1.0, options=None):
+        if rate <= 0:
+            raise ValueError(f"{source}: rate must be positive")
+        self.source = source
+        self.addr = addr
+        self.time = time
+        self.rate = rate
+        self.options = options or {}
+        self.ops = 0
+
+    @classmethod
+    def parse(cls, spec, index=0):
+        source, *pairs = spec.split(',')
+        fields = dict(pair.split('=', 1) for pair in pairs)
+        stream = cls(source, addr=int(fields.pop('addr', '0'), 0), time=int(fields.pop('time', '0'), 0),
+                     rate=float(fields.pop('rate', '1')))
+        if source in SYNTHETIC:
+            options = {'seed': index}
+            for key, value in fields.items():
+                if key == 'span':
+                    options[key] = parse_size(value)
+                elif key == 'writes':
+                    options[key] = float(value)
+                elif key in ('ops', 'gap', 'seed'):
+                    options[key] = int(value, 0)
+                else:
+                    raise ValueError(f"{spec}: unknown key {key}")
+            stream.options = options
+        elif fields:
+            raise ValueError(f"{spec}: unknown keys {', '.join(fields)}")
+        return stream
+
+    def raw_blocks(self):
+        if self.source in SYNTHETIC:
+            return synthetic_blocks(self.source, **self.options)
+        return iter_trace(self.source)
+
+    def blocks(self):
+        """
+        transformed non-empty blocks; raises if the input is not time-ordered.
+        the ops sharing a block's last timestamp are held back for the next
+        block, so every block starts strictly after the previous one ends
+        """
+        last = 0
+        carry = None
+        for timestamps, is_write, addresses in self.raw_blocks():
+            if len(timestamps) == 0:
+                continue
+            if self.rate != 1.0:
+                timestamps = (np.asarray(timestamps, dtype=np.float64) / self.rate).astype(np.uint64)
+            timestamps = np.asarray(timestamps, dtype=np.uint64) + np.uint64(self.time)
+            if timestamps[0] < last or (np.diff(timestamps.view(np.int64)) < 0).any():
+                raise ValueError(f"{self.source}: timestamps are not in order")
+            last = timestamps[-1]
+            self.ops += len(timestamps)
+            addresses = np.asarray(addresses, dtype=np.uint64) + np.uint64(self.addr)
+            block = (timestamps, np.asarray(is_write, dtype=bool), addresses)
+
+            if carry is not None:
+                block = tuple(np.concatenate(pair) for pair in zip(carry, block))
+            tail = int(np.searchsorted(block[0], last, side='left'))
+            carry = tuple(column[tail:] for column in block)
+            if tail:
+                yield tuple(column[:tail] for column in block)
+        if carry is not None:
+            yield carry
+
+
+def merge(streams, write):
+    """k-way merge of the streams by timestamp into write(timestamps, is_write, addresses)"""
+    sources = [s.blocks() for s in streams]
+    buffers = [None] * len(streams)
+    heap = []
+
+    def refill(i):
+        block = next(sources[i], None)
+        buffers[i] = block
+        if block is not None:
+            heapq.heappush(heap, (int(block[0][-1]), i))
+
+    for i in range(len(streams)):
+        refill(i)
+
+    total = 0
+    while heap:
+        horizon, i = heapq.heappop(heap)
+        parts = []
+        for j, block in enumerate(buffers):
+            if block is None:
+                continue
+            cut = len(block[0]) if j == i else int(np.searchsorted(block[0], horizon, side='right'))
+            if cut:
+                parts.append(tuple(column[:cut] for column in block))
+                buffers[j] = tuple(column[cut:] for column in block)
+        if not parts:
+            refill(i)
+            continue
+
+        timestamps, is_write, addresses = (np.concatenate(column) for column in zip(*parts))
+        order = np.argsort(timestamps, kind='stable')
+        write(timestamps[order], is_write[order], addresses[order])
+        total += len(order)
+        refill(i)
+    return total
+
+
+def mix(streams, output, binary=False):
+    """merge the streams into one trace; returns the number of ops written"""
+    if binary:
+        with TraceWriter(output) as writer:
+            return merge(streams, writer.write)
+    with open(output, 'wb') as f:
+        return merge(streams, lambda t, w, a: f.write(format_stl(t, w, a)))
+
+
+def write_initiators(streams, output, clk_mhz=1000, config_dir=None):
+    """
+    one transformed trace per stream next to output, and the tracesetup list
+    that plays them as separate dramsys initiators
+    """
+    stem = os.path.splitext(output)[0]
+    setup = []
+    for i, stream in enumerate(streams):
+        path = f"{stem}.s{i}.stl"
+        mix([stream], path)
+        name = os.path.relpath(path, config_dir) if config_dir else path
+        setup.append({"type": "player", "clkMhz": clk_mhz, "name": name})
+    return setup
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="merge traces into one multi-tenant trace")
+    parser.add_argument("output")
+    parser.add_argument("streams", nargs="+", help="PATH[,addr=..][,time=..][,rate=..] or random/sequential,...")
+    parser.add_argument("--format", choices=["stl", "binary"], default="stl")
+    parser.add_argument("--initiators", action="store_true",
+                        help="write one trace per stream and print a multi-player tracesetup instead")
+    parser.add_argument("--config-dir", default=os.path.expanduser("~/DRAMSys/configs"),
+                        help="trace names in the tracesetup are relative to this")
+    args = parser.parse_args()
+
+    streams = [Stream.parse(spec, i) for i, spec in enumerate(args.streams)]
+
+    if args.initiators:
+        setup = write_initiators(streams, args.output, config_dir=args.config_dir)
+        print(json.dumps({"tracesetup": setup}, indent=2))
+    else:
+        total = mix(streams, args.output, binary=args.format == "binary")
+        for stream in streams:
+            print(f"  {stream.source}: {stream.ops} ops (addr +{stream.addr:#x}, time +{stream.time}, "
+                  f"rate x{stream.rate:g})")
+        print(f"mixed {total} ops into {args.output}")
@@ -3,13 +3,27 @@
 traffic generator optimizer - workload parameter tuning
 tests: clkmhz, numrequests, rwration, addressdistribution
 """
-import os, json, subprocess, re, random
+import os, json, random, argparse
 from datetime import datetime
 
+from dramsys_runner import apply_result, completed, run_dramsys
+from fitness_cache import FitnessCache
+from dram_model import DRAMModel
+from results_store import ResultsStore
+from search_driver import SearchDriver
+from racing import Racer
+import profiler
+import live_metrics
+
 class TrafficGenOptimizer:
-    def __init__(self):
+    def __init__(self, workers=1, cache=None, prune_margin=None, budget=None, patience=None,
+                 race_max_runs=None, model=None, recorder=None):
         self.dramsys_path = os.path.expanduser("~/DRAMSys")
         self.results_dir = os.path.expanduser("~/hackathon-project/results")
+        # dram_model.DRAMModel used instead of dramsys when set
+        self.model = model
+        # results_store.RunRecorder that every evaluation is appended to
+        self.recorder = recorder
 
         # best hardware from previous optimization
         self.best_hardware = {
@@ -25,6 +39,23 @@ class TrafficGenOptimizer:
         self.addr_dist_options = ["random", "sequential"]
 
         self.all_results = []
+        self.workers = workers
+        self.cache = cache
+        self.prune_margin = prune_margin
+        self.prune_bound = None
+        self.budget = budget
+        self.patience = patience
+        self.race_max_runs = race_max_runs
+
+    def search_space(self):
+        """workload gene name -> options; the hardware genes are fixed"""
+        return {
+            **{k: [v] for k, v in self.best_hardware.items()},
+            'clkMhz': self.clk_options,
+            'numRequests': self.num_req_options,
+            'rwRatio': self.rw_ratio_options,
+            'addressDistribution': self.addr_dist_options,
+        }
 
     def create_individual(self):
         return {
@@ -36,6 +67,7 @@ class TrafficGenOptimizer:
             'fitness': None
         }
 
+    @profiler.timed("evaluate", label="sim_id")
     def evaluate(self, ind, sim_id):
         config = {
             "simulation": {
@@ -52,34 +84,22 @@ class TrafficGenOptimizer:
                     "rwRatio": ind['rwRatio'],
                     "addressDistribution": ind['addressDistribution'],
                     "minAddress": 0,
-                    "maxAddress": 4294967295
+                    "maxAddress": 4294967295,
+                    **({"seed": ind['seed']} if 'seed' in ind else {})
                 }]
             }
         }
 
-        cfg_file = f"{self.dramsys_path}/configs/tgen_{sim_id}.json"
-        with open(cfg_file, 'w') as f:
-            json.dump(config, f, indent=2)
+        cfg_file = f"tgen_{sim_id}.json"
 
         try:
-            result = subprocess.run(
-                [f"{self.dramsys_path}/build/bin/DRAMSys", cfg_file],
-                capture_output=True, text=True, timeout=120
-            )
-
-            total_time, avg_bw = None, None
-            for line in result.stdout.split('\n'):
-                if 'Total Time:' in line:
-                    m = re.search(r'Total Time:\s+(\d+)', line)
-                    if m: total_time = int(m.group(1))
-                if 'AVG BW:' in line and 'IDLE' not in line:
-                    m = re.search(r'AVG BW:\s+([\d.]+)', line)
-                    if m: avg_bw = float(m.group(1))
-
-            ind['fitness'] = total_time if total_time else float('inf')
-            ind['bandwidth'] = avg_bw if avg_bw else 0
-            ind['success'] = total_time is not None
-            return ind['success']
+            if self.model:
+                result = self.model.run(config, recorder=self.recorder)
+            else:
+                result = run_dramsys(self.dramsys_path, config, cfg_file, timeout=120,
+                                     cache=self.cache, bound=self.prune_bound, recorder=self.recorder)
+
+            return apply_result(ind, result)
         except:
             ind['fitness'], ind['bandwidth'], ind['success'] = float('inf'), 0, False
             return False
@@ -109,26 +129,56 @@ class TrafficGenOptimizer:
         print(f"search space: {len(self.clk_options)} x {len(self.num_req_options)} x {len(self.rw_ratio_options)} x {len(self.addr_dist_options)} = {len(self.clk_options)*len(self.num_req_options)*len(self.rw_ratio_options)*len(self.addr_dist_options)} configs")
         print("-"*80)
 
-        population = [self.create_individual() for _ in range(pop_size)]
+        driver = SearchDriver(self.search_space(), budget=self.budget, patience=self.patience,
+                              planned=pop_size + (generations - 1) * (pop_size - 2))
+        if driver.fits_budget():
+            print(f"space of {driver.space_size()} fits the budget of {self.budget}: enumerating it")
+            population = driver.enumerate()
+            pop_size, generations = len(population), 1
+        else:
+            population = [self.create_individual() for _ in range(pop_size)]
+        racer = (Racer(self.evaluate, key=driver.genotype, workers=self.workers,
+                       top_k=2, max_runs=self.race_max_runs, driver=driver)
+                 if self.race_max_runs else None)
         best_ever = None
 
-        for gen in range(generations):
+        for gen in profiler.iterate("generation", range(generations)):
+            if driver.should_stop():
+                print(f"\nstopping: {driver.stop_reason}")
+                break
+
             print("\n" + "-"*80)
             print(f"generation {gen+1}/{generations}")
             print("-"*80)
 
-            for i, ind in enumerate(population):
-                if ind['fitness'] is None:
-                    sim_id = f"g{gen}i{i}"
-                    print(f"[{i+1}/{pop_size}] clk:{ind['clkMhz']}mhz, req:{ind['numRequests']}, rw:{ind['rwRatio']:.2f}, {ind['addressDistribution'][:3]}... ", end='', flush=True)
+            self.prune_bound = (best_ever['fitness'] * (1 + self.prune_margin)
+                                if best_ever and self.prune_margin is not None else None)
+            pending = {f"g{gen}i{i}": i for i, ind in enumerate(population) if ind['fitness'] is None}
+            jobs = [(population[i], sim_id) for sim_id, i in pending.items()]
 
-                    if self.evaluate(ind, sim_id):
-                        print(f"ok {ind['fitness']:,}ps, {ind['bandwidth']:.2f}gb/s")
-                        self.all_results.append({'gen': gen+1, 'ind': i, **ind})
-                    else:
-                        print("fail")
+            for ind, sim_id, success in driver.evaluate(jobs, self.evaluate, self.workers):
+                i = pending[sim_id]
+                print(f"[{i+1}/{pop_size}] clk:{ind['clkMhz']}mhz, req:{ind['numRequests']}, rw:{ind['rwRatio']:.2f}, {ind['addressDistribution'][:3]}... ", end='')
+                if success and ind.get('pruned'):
+                    print(f"pruned, lower bound {ind['fitness']:,}ps")
+                    self.all_results.append({'gen': gen+1, 'ind': i, **ind})
+                elif success:
+                    print(f"ok {ind['fitness']:,}ps, {ind['bandwidth']:.2f}gb/s")
+                    self.all_results.append({'gen': gen+1, 'ind': i, **ind})
+                else:
+                    print("fail")
 
-            valid = [i for i in population if i['success']]
+            if racer:
+                raced = [ind for ind in population if completed(ind)]
+                runs_before = [ind.get('runs', 1) for ind in raced]
+                extra_before = racer.extra_runs
+                racer.race(raced, f"g{gen}")
+                print(f"racing: {racer.extra_runs - extra_before} extra runs")
+                for ind, runs in zip(raced, runs_before):
+                    if ind['runs'] > runs:
+                        self.all_results.append({'gen': gen+1, 'raced': True, **ind})
+
+            valid = [i for i in population if completed(i)]
             if not valid:
                 print("no valid configs")
                 continue
@@ -162,12 +212,53 @@ class TrafficGenOptimizer:
             print(f"numrequests: {best_ever['numRequests']}")
             print(f"rwration: {best_ever['rwRatio']}")
             print(f"addressdistribution: {best_ever['addressDistribution']}")
+            for line in driver.summary():
+                print(line)
+            if self.cache:
+                print(self.cache.summary())
 
             with open(f"{self.results_dir}/traffic_gen_optimization.json", 'w') as f:
-                json.dump({'timestamp': datetime.now().isoformat(), 'best': best_ever, 'all': self.all_results}, f, indent=2)
+                json.dump({'timestamp': datetime.now().isoformat(), 'best': best_ever, 'all': self.all_results,
+                           'search': driver.stats()}, f, indent=2)
             print(f"\nsaved to: {self.results_dir}/traffic_gen_optimization.json")
             return best_ever
 
 if __name__ == "__main__":
-    opt = TrafficGenOptimizer()
+    parser = argparse.ArgumentParser(description="traffic generator optimizer")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of dramsys simulations to run concurrently")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always run dramsys instead of reusing cached results")
+    parser.add_argument("--prune-margin", type=float, default=None,
+                        help="kill simulations whose simulated time passes the best fitness by this fraction")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="maximum number of simulations; the space is enumerated if it fits")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="stop after this many simulations without improving the best fitness")
+    parser.add_argument("--race", type=int, default=None, metavar="MAX_RUNS",
+                        help="re-run contested candidates with new generator seeds, up to MAX_RUNS each")
+    parser.add_argument("--evaluator", choices=["dramsys", "model"], default="dramsys",
+                        help="score with dramsys or the analytical timing model of dram_model.py")
+    parser.add_argument("--no-store", action="store_true",
+                        help="do not append the evaluations to the results store (results_store.py)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every phase of every evaluation; prints a table and writes a chrome trace")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help="serve live prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enable()
+    cache = None if args.no_cache else FitnessCache()
+    if args.metrics_port is not None:
+        live_metrics.serve(args.metrics_port, "traffic_gen_optimizer.py", cache)
+    model = DRAMModel() if args.evaluator == "model" else None
+    recorder = None if args.no_store else ResultsStore().start_run('traffic_gen_optimizer.py', vars(args))
+    opt = TrafficGenOptimizer(workers=args.workers, cache=cache, prune_margin=args.prune_margin,
+                              budget=args.budget, patience=args.patience, race_max_runs=args.race,
+                              model=model, recorder=recorder)
     opt.optimize(pop_size=8, generations=4)
+    if recorder:
+        recorder.finish()
+        print(recorder.summary())
+    profiler.finish(f"{opt.results_dir}/traffic_gen_optimizer_profile.json")
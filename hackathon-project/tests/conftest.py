@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the scripts are standalone modules, imported the way they import each other
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
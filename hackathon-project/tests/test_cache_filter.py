@@ -0,0 +1,92 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from cache_filter import CacheHierarchy, CacheLevel, parse_size
+
+
+class ReferenceLevel:
+    """one access at a time: an ordered dict of line -> dirty per set, lru first"""
+
+    def __init__(self, size, ways, line_size=64):
+        self.sets = [OrderedDict() for _ in range(size // (ways * line_size))]
+        self.ways = ways
+        self.hits = 0
+        self.writebacks = 0
+
+    def access(self, line, is_write):
+        """memory events caused by one access: [(line, is_write)], writeback first"""
+        lines = self.sets[line % len(self.sets)]
+        if line in lines:
+            self.hits += 1
+            lines.move_to_end(line)
+            lines[line] |= is_write
+            return []
+        events = []
+        if len(lines) == self.ways:
+            victim, dirty = lines.popitem(last=False)
+            if dirty:
+                self.writebacks += 1
+                events.append((victim, True))
+        lines[line] = is_write
+        return events + [(line, False)]
+
+
+def reference_filter(levels, timestamps, is_write, addresses, sizes, line_size=64):
+    events = []
+    for t, w, a, s in zip(timestamps, is_write, addresses, sizes):
+        for line in range(a // line_size, (a + max(s, 1) - 1) // line_size + 1):
+            events.append((t, line, w))
+    for level in levels:
+        events = [(t, out, out_write) for t, line, w in events for out, out_write in level.access(line, w)]
+    return ([t for t, _, _ in events], [w for _, _, w in events], [line * line_size for _, line, _ in events])
+
+
+def random_accesses(n, seed, span=1 << 16):
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(n, dtype=np.uint64) * 4
+    # mostly a hot region, so every level sees hits, misses and evictions
+    hot = rng.random(n) < 0.6
+    addresses = np.where(hot, rng.integers(0, 2048, size=n), rng.integers(0, span, size=n)).astype(np.uint64)
+    sizes = rng.choice([1, 4, 8, 64], size=n).astype(np.uint64)
+    return timestamps, rng.random(n) < 0.4, addresses, sizes
+
+
+@pytest.mark.parametrize('spec', ["1K:2", "1K:2,4K:4", "512:1,2K:4,8K:8"])
+def test_filter_matches_a_reference_lru_write_back_model(spec):
+    hierarchy = CacheHierarchy.parse(spec)
+    reference = [ReferenceLevel(level.size, level.ways) for level in hierarchy.levels]
+
+    for batch in range(3):
+        timestamps, is_write, addresses, sizes = random_accesses(4000, seed=batch)
+        got = hierarchy.filter(timestamps, is_write, addresses, sizes)
+        expected = reference_filter(reference, timestamps.tolist(), is_write.tolist(),
+                                    addresses.tolist(), sizes.tolist())
+
+        assert got[0].tolist() == expected[0]
+        assert got[1].tolist() == expected[1]
+        assert got[2].tolist() == expected[2]
+
+    for level, ref in zip(hierarchy.levels, reference):
+        assert level.hits == ref.hits
+        assert level.writebacks == ref.writebacks
+
+
+def test_dirty_eviction_is_written_back_before_the_fill():
+    level = CacheLevel('l1', 128, 2)
+    hierarchy = CacheHierarchy([level])
+    # one set, two ways: the third line evicts the dirty first one
+    timestamps, is_write, addresses = hierarchy.filter([0, 1, 2], [True, False, False], [0, 64, 128])
+
+    assert addresses.tolist() == [0, 64, 0, 128]
+    assert is_write.tolist() == [False, False, True, False]
+    assert timestamps.tolist() == [0, 1, 2, 2]
+
+
+def test_parse_size():
+    assert parse_size("32K") == 32 * 1024
+    assert parse_size("1mb") == 1024 ** 2
+    assert parse_size("512") == 512
+    with pytest.raises(ValueError):
+        CacheLevel('l1', 1000, 3)
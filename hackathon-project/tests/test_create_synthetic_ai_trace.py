@@ -0,0 +1,26 @@
+import pytest
+
+from create_synthetic_ai_trace import CHUNK_OPS, generate_ai_workload_trace
+
+# enough ops for three chunks, so --jobs 3 really shards
+OPS = 2 * CHUNK_OPS + 1000
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_output_is_identical_for_any_number_of_jobs(tmp_path, binary):
+    single, sharded = tmp_path / 'jobs1.trace', tmp_path / 'jobs3.trace'
+    generate_ai_workload_trace(str(single), OPS, seed=1, jobs=1, binary=binary)
+    generate_ai_workload_trace(str(sharded), OPS, seed=1, jobs=3, binary=binary)
+
+    assert single.read_bytes() == sharded.read_bytes()
+    assert not list(tmp_path.glob('*.part*'))
+
+
+def test_seed_determines_the_trace(tmp_path):
+    first, second, other = tmp_path / 'a.stl', tmp_path / 'b.stl', tmp_path / 'c.stl'
+    generate_ai_workload_trace(str(first), 5000, seed=7)
+    generate_ai_workload_trace(str(second), 5000, seed=7)
+    generate_ai_workload_trace(str(other), 5000, seed=8)
+
+    assert first.read_bytes() == second.read_bytes()
+    assert first.read_bytes() != other.read_bytes()
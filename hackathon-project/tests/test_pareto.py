@@ -0,0 +1,65 @@
+import math
+
+import pytest
+
+from pareto import ParetoArchive, crowding_distance, non_dominated_sort, rank_population, select_survivors
+
+# (total time, -bandwidth)
+POINTS = [
+    (1, -1),   # front 0
+    (2, -3),   # front 0
+    (3, -4),   # front 0
+    (2, -1),   # front 1, dominated by 0
+    (3, -3),   # front 1, dominated by 1
+    (4, -1),   # front 2, dominated by 3
+]
+
+
+def test_non_dominated_sort_layers_the_fronts():
+    fronts = non_dominated_sort(POINTS)
+    assert [sorted(f) for f in fronts] == [[0, 1, 2], [3, 4], [5]]
+
+
+def test_equal_points_share_a_front():
+    assert non_dominated_sort([(1, 1), (1, 1), (2, 2)]) == [[0, 1], [2]]
+
+
+def test_crowding_distance():
+    points = [(0, 4), (1, 2), (3, 1), (4, 0)]
+    distance = crowding_distance(points, [0, 1, 2, 3])
+
+    assert distance[0] == distance[3] == math.inf
+    # normalised neighbour gaps summed over both objectives, each spanning 4
+    assert distance[1] == pytest.approx((3 - 0) / 4 + (4 - 1) / 4)
+    assert distance[2] == pytest.approx((4 - 1) / 4 + (2 - 0) / 4)
+
+
+def test_small_fronts_are_all_boundary():
+    assert crowding_distance(POINTS, [3, 4]) == {3: math.inf, 4: math.inf}
+
+
+def test_rank_population():
+    rank, crowding = rank_population(POINTS)
+    assert rank == {0: 0, 1: 0, 2: 0, 3: 1, 4: 1, 5: 2}
+    assert crowding[0] == crowding[2] == math.inf
+    assert math.isfinite(crowding[1])
+
+
+def test_select_survivors_fills_whole_fronts_then_by_crowding():
+    points = [(0, 4), (1, 2), (3, 1), (4, 0), (5, 5)]
+    assert sorted(select_survivors(points, 4)) == [0, 1, 2, 3]
+    # the interior points tie on crowding; the boundary points always stay
+    assert {0, 3} <= set(select_survivors(points, 3))
+    assert sorted(select_survivors(points, 2)) == [0, 3]
+
+
+def test_archive_keeps_only_the_non_dominated_set():
+    archive = ParetoArchive()
+    assert archive.add({'fitness': 10, 'bandwidth': 1})
+    assert archive.add({'fitness': 5, 'bandwidth': 1})
+    assert archive.add({'fitness': 8, 'bandwidth': 3})
+    assert not archive.add({'fitness': 9, 'bandwidth': 2})
+    assert not archive.add({'fitness': 5, 'bandwidth': 1})
+    assert not archive.add({'fitness': math.inf, 'bandwidth': 9})
+
+    assert [m['fitness'] for m in archive.front()] == [5, 8]
@@ -0,0 +1,82 @@
+import pytest
+
+from racing import Racer
+from search_driver import SearchDriver
+
+# relative noise of the n-th run (seed n) of every candidate
+NOISE = [0.0, 0.01, -0.01, 0.005, -0.005, 0.002, -0.002, 0.0]
+
+
+def noisy(means, runs):
+    def evaluate(ind, sim_id):
+        runs.append(ind['name'])
+        ind['fitness'] = means[ind['name']] * (1 + NOISE[ind['seed']])
+        ind['success'] = True
+        return True
+    return evaluate
+
+
+def candidates(means):
+    return [{'name': name, 'fitness': mean} for name, mean in means.items()]
+
+
+def test_clear_losers_are_eliminated_without_reruns():
+    means = {'a': 100, 'b': 150, 'c': 200}
+    runs = []
+    racer = Racer(noisy(means, runs), key=lambda ind: (ind['name'],), max_runs=8)
+
+    pool = candidates(means)
+    racer.race(pool, 'g0')
+
+    # no noise estimate at first: the top two are repeated once, after which
+    # the intervals separate and nothing else is re-run
+    assert sorted(runs) == ['a', 'b']
+    assert [ind['runs'] for ind in pool] == [2, 2, 1]
+    assert racer.extra_runs == 2
+    assert min(pool, key=lambda ind: ind['fitness'])['name'] == 'a'
+
+
+def test_close_candidates_are_raced_up_to_max_runs():
+    means = {'a': 100, 'b': 100.1, 'c': 200}
+    runs = []
+    racer = Racer(noisy(means, runs), key=lambda ind: (ind['name'],), max_runs=4)
+
+    pool = candidates(means)
+    racer.race(pool, 'g0')
+
+    assert 'c' not in runs
+    assert pool[0]['runs'] == pool[1]['runs'] == 4
+    assert pool[2]['runs'] == 1
+    assert pool[0]['samples'] == pytest.approx([100, 101, 99, 100.5])
+
+
+def test_failed_repeat_leaves_the_race():
+    means = {'a': 100, 'b': 100.1}
+    runs = []
+
+    def evaluate(ind, sim_id):
+        runs.append(ind['name'])
+        if ind['name'] == 'b':
+            ind['success'] = False
+            return False
+        return noisy(means, [])(ind, sim_id)
+
+    racer = Racer(evaluate, key=lambda ind: (ind['name'],), max_runs=8)
+    racer.race(candidates(means), 'g0')
+
+    assert runs == ['a', 'b']
+    assert racer.samples[('b',)] == [100.1]
+
+
+def test_reruns_are_charged_and_trimmed_to_the_budget():
+    means = {'a': 100, 'b': 100.1, 'c': 200}
+    runs = []
+    driver = SearchDriver({'name': list(means)}, budget=6)
+    driver.simulations = 3
+    racer = Racer(noisy(means, runs), key=lambda ind: (ind['name'],), max_runs=8, driver=driver)
+
+    racer.race(candidates(means), 'g0')
+
+    assert len(runs) == 3
+    assert driver.simulations == 6 and driver.replicates == 3
+    assert driver.remaining() == 0
@@ -0,0 +1,114 @@
+import math
+
+from search_driver import SearchDriver
+
+SPACE = {'memspec': ['a', 'b', 'c'], 'policy': ['open', 'closed']}
+
+
+def individual(memspec, policy='open'):
+    return {'memspec': memspec, 'policy': policy, 'fitness': None}
+
+
+def run(driver, individuals, fitness, workers=1):
+    """drive a batch; fitness maps a genotype to its simulated total time"""
+    simulated = []
+
+    def evaluate(ind, sim_id):
+        simulated.append(sim_id)
+        ind['fitness'] = fitness[driver.genotype(ind)]
+        ind['success'] = True
+        return True
+
+    jobs = [(ind, f"sim{i}") for i, ind in enumerate(individuals)]
+    yielded = list(driver.evaluate(jobs, evaluate, workers))
+    return simulated, yielded
+
+
+def test_duplicates_are_simulated_once():
+    driver = SearchDriver(SPACE)
+    fitness = {('a', 'open'): 10, ('b', 'open'): 20}
+    batch = [individual('a'), individual('b'), individual('a')]
+
+    simulated, yielded = run(driver, batch, fitness)
+
+    assert simulated == ['sim0', 'sim1']
+    assert len(yielded) == 3
+    assert batch[2]['fitness'] == 10 and batch[2]['success']
+    assert driver.simulations == 2 and driver.duplicates == 1
+
+    # a later generation reuses the earlier result too
+    again = individual('b')
+    simulated, _ = run(driver, [again], fitness)
+    assert simulated == [] and again['fitness'] == 20
+    assert driver.duplicates == 2
+
+
+def test_budget_cuts_the_batch_and_fails_the_rest():
+    driver = SearchDriver(SPACE, budget=2)
+    fitness = {(m, 'open'): i for i, m in enumerate('abc')}
+    batch = [individual('a'), individual('b'), individual('c'), individual('c')]
+
+    simulated, yielded = run(driver, batch, fitness, workers=2)
+
+    assert sorted(simulated) == ['sim0', 'sim1']
+    assert len(yielded) == 2
+    for cut in batch[2:]:
+        assert cut['fitness'] == math.inf and not cut['success']
+    assert driver.remaining() == 0
+    assert driver.should_stop()
+    assert 'budget' in driver.stop_reason
+
+
+def test_charged_replicates_count_against_the_budget():
+    driver = SearchDriver(SPACE, budget=3)
+    driver.charge(2)
+    simulated, _ = run(driver, [individual('a'), individual('b')], {('a', 'open'): 1, ('b', 'open'): 2})
+
+    assert simulated == ['sim0']
+    assert driver.simulations == 3 and driver.replicates == 2
+
+
+def test_patience_stops_after_simulations_without_improvement():
+    driver = SearchDriver(SPACE, patience=2)
+    fitness = {('a', 'open'): 10, ('b', 'open'): 5, ('c', 'open'): 7, ('a', 'closed'): 6}
+
+    run(driver, [individual('a'), individual('b')], fitness)
+    assert driver.best == 5 and not driver.should_stop()
+
+    run(driver, [individual('c')], fitness)
+    assert not driver.should_stop()
+    run(driver, [individual('a', 'closed')], fitness)
+    assert driver.should_stop()
+    assert driver.since_improvement == 2
+
+
+def test_pruned_runs_never_become_the_best():
+    driver = SearchDriver(SPACE, patience=1)
+
+    def evaluate(ind, sim_id):
+        ind.update(fitness=1, success=True, pruned=True)
+        return True
+
+    list(driver.evaluate([(individual('a'), 'sim0')], evaluate))
+
+    assert driver.best == math.inf
+    assert driver.should_stop()
+
+
+def test_small_spaces_are_enumerated():
+    driver = SearchDriver(SPACE, budget=6)
+    assert driver.fits_budget()
+    genotypes = {driver.genotype(ind) for ind in driver.enumerate()}
+    assert len(genotypes) == 6 and driver.exhaustive
+
+
+def test_state_round_trip():
+    driver = SearchDriver(SPACE, budget=10)
+    run(driver, [individual('a'), individual('a')], {('a', 'open'): 3})
+
+    restored = SearchDriver(SPACE, budget=10)
+    restored.load_state(driver.state())
+    simulated, _ = run(restored, [individual('a')], {('a', 'open'): 3})
+
+    assert simulated == []
+    assert restored.simulations == 1 and restored.best == 3
@@ -0,0 +1,49 @@
+import pytest
+
+from successive_halving import geometric_fidelities, successive_halving
+
+
+def test_geometric_fidelities_end_at_full_length():
+    assert geometric_fidelities(1 / 27, eta=3) == pytest.approx([1 / 27, 1 / 9, 1 / 3, 1])
+    assert geometric_fidelities(1.0) == [1]
+
+
+def test_each_rung_promotes_the_best_third():
+    # candidate i scores i at every fidelity, so lower indices always win
+    calls = []
+
+    def evaluate_rung(rung_candidates, fidelity, rung):
+        calls.append((sorted(rung_candidates), fidelity))
+        return list(rung_candidates)
+
+    ranking, history = successive_halving(list(range(27)), [1 / 9, 1 / 3, 1], evaluate_rung,
+                                          eta=3, min_finalists=1)
+
+    assert [len(c) for c, _ in calls] == [27, 9, 3]
+    assert calls[1][0] == list(range(9))
+    assert calls[2][0] == list(range(3))
+    assert ranking == [0, 1, 2]
+    assert [h['fidelity'] for h in history] == [1 / 9, 1 / 3, 1]
+
+
+def test_promotion_follows_the_rung_scores_not_the_input_order():
+    scores = {'a': 5, 'b': 1, 'c': 4, 'd': 2, 'e': 3, 'f': 6}
+
+    def evaluate_rung(rung_candidates, fidelity, rung):
+        return [scores[c] for c in rung_candidates]
+
+    ranking, history = successive_halving(list(scores), [0.5, 1], evaluate_rung, eta=3, min_finalists=1)
+
+    # ceil(6 / 3) = 2 survivors: b and d
+    assert set(history[1]['scores']) == {1, 3}
+    assert ranking == [1, 3]
+
+
+def test_min_finalists_keeps_enough_for_the_last_rung():
+    def evaluate_rung(rung_candidates, fidelity, rung):
+        return list(rung_candidates)
+
+    ranking, history = successive_halving(list(range(6)), [0.1, 1], evaluate_rung, eta=3, min_finalists=4)
+
+    assert len(history[1]['scores']) == 4
+    assert ranking == [0, 1, 2, 3]
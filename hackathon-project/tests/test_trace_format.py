@@ -0,0 +1,72 @@
+import numpy as np
+
+from trace_format import (Trace, TraceWriter, binary_to_stl, format_stl, iter_stl, load_trace,
+                          stl_to_binary)
+
+
+def random_trace(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = np.cumsum(rng.integers(0, 20, size=n, dtype=np.uint64))
+    addresses = rng.integers(0, 1 << 40, size=n, dtype=np.uint64)
+    # short and long fields in the same block
+    timestamps[0], addresses[0] = 0, 0
+    addresses[1] = 0xf
+    return timestamps, rng.random(n) < 0.3, addresses
+
+
+def reference_stl(timestamps, is_write, addresses):
+    return b"".join(f"{t}:\t{'write' if w else 'read'}\t0x{a:x}\n".encode()
+                    for t, w, a in zip(timestamps.tolist(), is_write.tolist(), addresses.tolist()))
+
+
+def test_format_stl_matches_the_text_format():
+    columns = random_trace()
+    assert format_stl(*columns) == reference_stl(*columns)
+
+
+def test_stl_binary_round_trip_is_lossless(tmp_path):
+    stl, trace, back = tmp_path / 'a.stl', tmp_path / 'a.trace', tmp_path / 'b.stl'
+    timestamps, is_write, addresses = random_trace()
+    stl.write_bytes(format_stl(timestamps, is_write, addresses))
+
+    assert stl_to_binary(str(stl), str(trace)) == len(timestamps)
+    loaded = Trace(str(trace))
+    np.testing.assert_array_equal(loaded.timestamps, timestamps)
+    np.testing.assert_array_equal(loaded.addresses, addresses)
+    np.testing.assert_array_equal(loaded.is_write, is_write)
+
+    assert binary_to_stl(str(trace), str(back)) == len(timestamps)
+    assert back.read_bytes() == stl.read_bytes()
+
+
+def test_stl_blocks_split_mid_line(tmp_path):
+    stl = tmp_path / 'a.stl'
+    columns = random_trace(500)
+    stl.write_bytes(format_stl(*columns))
+
+    batches = list(iter_stl(str(stl), block_bytes=1000))
+    assert len(batches) > 1
+    for expected, got in zip(columns, (np.concatenate(c) for c in zip(*batches))):
+        np.testing.assert_array_equal(got, expected)
+
+
+def test_stl_variants_parse(tmp_path):
+    stl = tmp_path / 'a.stl'
+    stl.write_bytes(b"# comment\n0:\tread\t0xABC\r\n5:\twrite\t10\t64\n\n7:\tread\t0x0\n")
+    timestamps, is_write, addresses = load_trace(str(stl))
+
+    assert timestamps.tolist() == [0, 5, 7]
+    assert is_write.tolist() == [False, True, False]
+    assert addresses.tolist() == [0xabc, 0x10, 0]
+
+
+def test_writer_keeps_access_sizes(tmp_path):
+    path = str(tmp_path / 'a.trace')
+    with TraceWriter(path) as writer:
+        writer.write([0, 1], [True, False], [64, 128], sizes=[8, 3])
+        writer.write([2], [False], [256])
+
+    trace = Trace(path)
+    assert len(trace) == 3
+    assert trace.sizes.tolist() == [8, 4, 0]
+    assert trace.is_write.tolist() == [True, False, False]
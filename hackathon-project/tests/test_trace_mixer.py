@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from trace_format import format_stl, load_trace
+from trace_mixer import Stream, merge, mix
+
+
+class BlockStream(Stream):
+    """a stream over given (timestamps, is_write, addresses) blocks"""
+
+    def __init__(self, blocks, **kwargs):
+        super().__init__('blocks', **kwargs)
+        self.given = blocks
+
+    def raw_blocks(self):
+        return iter(self.given)
+
+
+def random_blocks(seed, ops=3000, block=200):
+    rng = np.random.default_rng(seed)
+    # small gaps, so timestamps repeat within a stream, across its block
+    # boundaries and across streams
+    timestamps = np.cumsum(rng.integers(0, 3, size=ops)).astype(np.uint64)
+    is_write = rng.random(ops) < 0.3
+    addresses = rng.integers(0, 1 << 30, size=ops, dtype=np.uint64)
+    sizes = np.diff(np.sort(rng.choice(np.arange(1, ops), size=ops // block, replace=False)), prepend=0,
+                    append=ops)
+    bounds = np.cumsum(np.concatenate(([0], sizes)))
+    return [(timestamps[lo:hi], is_write[lo:hi], addresses[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def reference_mix(streams):
+    """every op of every stream sorted by (timestamp, stream, position in stream)"""
+    rows = []
+    for s, stream in enumerate(streams):
+        position = 0
+        for timestamps, is_write, addresses in stream.given:
+            for t, w, a in zip(timestamps.tolist(), is_write.tolist(), addresses.tolist()):
+                t = int(np.float64(t) / stream.rate) if stream.rate != 1.0 else t
+                rows.append((t + stream.time, s, position, w, a + stream.addr))
+                position += 1
+    rows.sort()
+    return [r[0] for r in rows], [r[3] for r in rows], [r[4] for r in rows]
+
+
+def collect(streams):
+    out = []
+    total = merge(streams, lambda t, w, a: out.append((t, w, a)))
+    merged = tuple(np.concatenate(column).tolist() for column in zip(*out))
+    assert total == len(merged[0])
+    return merged
+
+
+def test_merge_orders_by_time_and_ties_by_stream():
+    streams = [BlockStream(random_blocks(0)),
+               BlockStream(random_blocks(1), addr=1 << 32, time=50),
+               BlockStream(random_blocks(2), addr=2 << 32, rate=2.0)]
+
+    assert collect(streams) == reference_mix(streams)
+    assert [s.ops for s in streams] == [3000, 3000, 3000]
+
+
+def test_ties_across_block_boundaries_keep_stream_order():
+    first = BlockStream([(np.array([0, 5], dtype=np.uint64), np.array([False, False]), np.array([1, 2], dtype=np.uint64)),
+                         (np.array([5, 9], dtype=np.uint64), np.array([False, False]), np.array([3, 4], dtype=np.uint64))])
+    second = BlockStream([(np.array([5], dtype=np.uint64), np.array([True]), np.array([10], dtype=np.uint64))])
+
+    timestamps, is_write, addresses = collect([first, second])
+
+    assert timestamps == [0, 5, 5, 5, 9]
+    assert addresses == [1, 2, 3, 10, 4]
+
+
+def test_mix_writes_the_merged_trace(tmp_path):
+    a, b = tmp_path / 'a.stl', tmp_path / 'b.stl'
+    a.write_bytes(format_stl([0, 10, 20], [False, False, True], [0x100, 0x140, 0x180]))
+    b.write_bytes(format_stl([5, 10, 15], [True, False, False], [0x0, 0x40, 0x80]))
+
+    out = tmp_path / 'mix.stl'
+    streams = [Stream.parse(str(a)), Stream.parse(f"{b},addr=0x1000,time=1")]
+    assert mix(streams, str(out)) == 6
+
+    timestamps, is_write, addresses = load_trace(str(out))
+    assert timestamps.tolist() == [0, 6, 10, 11, 16, 20]
+    assert addresses.tolist() == [0x100, 0x1000, 0x140, 0x1040, 0x1080, 0x180]
+    assert is_write.tolist() == [False, True, False, False, False, True]
+
+
+def test_out_of_order_input_is_rejected():
+    stream = BlockStream([(np.array([5, 3], dtype=np.uint64), np.array([False, False]),
+                           np.array([0, 0], dtype=np.uint64))])
+    with pytest.raises(ValueError, match="not in order"):
+        collect([stream])